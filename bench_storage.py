@@ -0,0 +1,282 @@
+"""
+Бенчмарк операций хранилища Google Sheets
+Измеряет скорость операций, количество запросов к API и пик памяти
+на листе в памяти с 1k, 10k и 100k строк
+
+Примеры:
+    python bench_storage.py
+    python bench_storage.py --sizes 1000,10000 --json bench.json
+    python bench_storage.py --baseline bench.json --threshold 0.3
+"""
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from services.google_sheets import GoogleSheetsService
+from utils.fake_sheets import FakeWorksheet
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+STATUSES = ('pending', 'approved', 'rejected')
+
+# Операция получает сервис, генератор случайных чисел и максимальный ID
+Operation = Callable[[GoogleSheetsService, random.Random, int], Any]
+
+OPERATIONS: Dict[str, Operation] = {
+    'add_problem': lambda service, rng, max_id: service.add_problem("Новая проблема для бенчмарка"),
+    # Статус меняется только у проблем в ожидании модерации (каждая десятая);
+    # повторный выбор той же проблемы - дешевый отказ без записи
+    'update_status': lambda service, rng, max_id: service.update_status(
+        rng.randint(1, max(max_id // 10, 1)) * 10, rng.choice(STATUSES[1:])
+    ),
+    'update_likes': lambda service, rng, max_id: service.update_likes(
+        rng.randint(1, max_id), rng.randint(0, 1000)
+    ),
+    'get_problem_by_id': lambda service, rng, max_id: service.get_problem_by_id(rng.randint(1, max_id)),
+    'get_pending_problems': lambda service, rng, max_id: service.get_pending_problems(),
+    'get_pending_page': lambda service, rng, max_id: service.get_pending_page(),
+    'get_stats': lambda service, rng, max_id: service.get_stats(),
+}
+
+# Операции записи: время и запросы считаются вместе с записью очереди в таблицу
+WRITE_OPERATIONS = {'add_problem', 'update_status', 'update_likes'}
+
+
+def create_worksheet(size: int, latency: float) -> FakeWorksheet:
+    """
+    Лист с проблемами во всех статусах (каждая десятая ожидает модерации)
+    
+    Args:
+        size: Количество строк
+        latency: Задержка каждого вызова API в секундах
+    """
+    rows = []
+    for problem_id in range(1, size + 1):
+        status = 'pending' if problem_id % 10 == 0 else 'rejected' if problem_id % 10 == 1 else 'approved'
+        rows.append([problem_id, f"Проблема {problem_id}", problem_id % 100, status, '2024-01-01 00:00:00'])
+    return FakeWorksheet(rows, latency=latency)
+
+
+def api_calls(worksheet: FakeWorksheet) -> int:
+    """Общее количество вызовов API листа"""
+    return sum(worksheet.calls.values())
+
+
+def drain(service: GoogleSheetsService):
+    """Запись всей очереди изменений в таблицу"""
+    while service.drain_outbox(100):
+        pass
+
+
+def run_operation(service: GoogleSheetsService, worksheet: FakeWorksheet, name: str,
+                  ops: int, max_seconds: float, max_id: int, seed: int) -> Dict[str, Any]:
+    """
+    Замер одной операции
+    
+    Время измеряется без tracemalloc, пик памяти - отдельным коротким
+    прогоном, чтобы трассировка не искажала скорость. Медленные операции
+    останавливаются через max_seconds, поэтому фактическое число вызовов
+    может быть меньше ops.
+    
+    Returns:
+        Результат с ключами ops, seconds, ops_per_sec, api_calls_per_op и peak_kib
+    """
+    operation = OPERATIONS[name]
+    rng = random.Random(seed)
+    
+    calls_before = api_calls(worksheet)
+    started = time.perf_counter()
+    deadline = started + max_seconds
+    done = 0
+    while done < ops:
+        operation(service, rng, max_id)
+        done += 1
+        if time.perf_counter() > deadline:
+            break
+    if name in WRITE_OPERATIONS:
+        drain(service)
+    seconds = time.perf_counter() - started
+    calls = api_calls(worksheet) - calls_before
+    
+    tracemalloc.start()
+    for _ in range(min(done, 100)):
+        operation(service, rng, max_id)
+    if name in WRITE_OPERATIONS:
+        drain(service)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'ops': done,
+        'seconds': round(seconds, 6),
+        'ops_per_sec': round(done / seconds, 1) if seconds > 0 else None,
+        'api_calls_per_op': round(calls / done, 4),
+        'peak_kib': round(peak / 1024, 1)
+    }
+
+
+def create_service(worksheet: FakeWorksheet) -> GoogleSheetsService:
+    """Сервис без периодического обновления индекса"""
+    return GoogleSheetsService('credentials.json', 'bench', cache_ttl=0, worksheet=worksheet)
+
+
+def run_size(size: int, ops: int, max_seconds: float, latency: float,
+             operations: List[str], seed: int) -> List[Dict[str, Any]]:
+    """
+    Все операции на листе заданного размера
+    
+    Первая строка результата - загрузка индекса при создании сервиса
+    (пик памяти - размер индекса).
+    """
+    # Память индекса - на отдельном листе, чтобы tracemalloc не замедлял замер времени
+    worksheet = create_worksheet(size, 0.0)
+    tracemalloc.start()
+    create_service(worksheet).outbox.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    worksheet = create_worksheet(size, latency)
+    started = time.perf_counter()
+    service = create_service(worksheet)
+    seconds = time.perf_counter() - started
+    
+    results = [{
+        'size': size,
+        'operation': 'load_index',
+        'ops': 1,
+        'seconds': round(seconds, 6),
+        'ops_per_sec': round(1 / seconds, 1) if seconds > 0 else None,
+        'api_calls_per_op': api_calls(worksheet),
+        'peak_kib': round(peak / 1024, 1)
+    }]
+    
+    for name in operations:
+        result = run_operation(service, worksheet, name, ops, max_seconds, size, seed)
+        results.append({'size': size, 'operation': name, **result})
+    
+    service.outbox.close()
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """
+    Сравнение с предыдущим запуском
+    
+    Args:
+        results: Текущие результаты
+        baseline: Результаты из файла --baseline
+        threshold: Допустимое относительное замедление (0.3 - на 30%)
+    
+    Returns:
+        Описания регрессий
+    """
+    previous = {(row['size'], row['operation']): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get((row['size'], row['operation']))
+        if old is None:
+            continue
+        
+        name = f"{row['operation']} ({row['size']} строк)"
+        if old['ops_per_sec'] and row['ops_per_sec'] and row['ops_per_sec'] < old['ops_per_sec'] * (1 - threshold):
+            regressions.append(f"{name}: {row['ops_per_sec']} оп/с вместо {old['ops_per_sec']}")
+        # Количество запросов к API детерминировано - любое увеличение считается регрессией
+        if row['api_calls_per_op'] > old['api_calls_per_op']:
+            regressions.append(
+                f"{name}: {row['api_calls_per_op']} запросов на операцию вместо {old['api_calls_per_op']}"
+            )
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]):
+    """Вывод результатов таблицей"""
+    print(f"{'строк':>7}  {'операция':<22} {'оп/с':>12} {'мкс/оп':>12} {'API/оп':>8} {'пик, КиБ':>10}")
+    for row in results:
+        ops_per_sec = f"{row['ops_per_sec']:,.1f}" if row['ops_per_sec'] else '-'
+        print(
+            f"{row['size']:>7}  {row['operation']:<22} {ops_per_sec:>12} "
+            f"{row['seconds'] / row['ops'] * 1e6:>12,.1f} "
+            f"{row['api_calls_per_op']:>8} {row['peak_kib']:>10,.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Запуск бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк операций хранилища Google Sheets")
+    parser.add_argument(
+        '--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+        help="размеры листа через запятую (по умолчанию 1000,10000,100000)"
+    )
+    parser.add_argument('--ops', type=int, default=1000, help="количество вызовов каждой операции")
+    parser.add_argument(
+        '--max-seconds', type=float, default=2.0,
+        help="максимальное время замера одной операции (по умолчанию 2 с)"
+    )
+    parser.add_argument(
+        '--operations', default=','.join(OPERATIONS),
+        help="операции через запятую (по умолчанию все)"
+    )
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка каждого вызова API в секундах")
+    parser.add_argument('--seed', type=int, default=1, help="зерно генератора случайных ID")
+    parser.add_argument('--json', metavar='PATH', help="сохранить результаты в JSON ('-' - вывести в stdout)")
+    parser.add_argument('--baseline', metavar='PATH', help="JSON предыдущего запуска для поиска регрессий")
+    parser.add_argument(
+        '--threshold', type=float, default=0.3,
+        help="допустимое замедление относительно --baseline (по умолчанию 0.3)"
+    )
+    args = parser.parse_args(argv)
+    
+    # Логи операций не должны влиять на замеры
+    logging.basicConfig(level=logging.WARNING)
+    
+    sizes = [int(size) for size in args.sizes.split(',')]
+    operations = [name for name in args.operations.split(',') if name]
+    unknown = [name for name in operations if name not in OPERATIONS]
+    if unknown:
+        parser.error(f"неизвестные операции: {', '.join(unknown)}")
+    
+    results = []
+    for size in sizes:
+        # В режиме --json - вывод в stdout только JSON
+        if args.json != '-':
+            print(f"🔄 Лист с {size} строками...", file=sys.stderr)
+        results.extend(run_size(size, args.ops, args.max_seconds, args.latency, operations, args.seed))
+    
+    report = {
+        'python': platform.python_version(),
+        'ops': args.ops,
+        'max_seconds': args.max_seconds,
+        'latency': args.latency,
+        'results': results
+    }
+    if args.json == '-':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_table(results)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 Результаты сохранены в {args.json}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f)['results'], args.threshold)
+        if regressions:
+            print("\n❌ Регрессии производительности:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print("\n✅ Регрессий относительно базового запуска нет", file=sys.stderr)
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""
+Запуск бота несколькими процессами
+Основной процесс получает обновления от Telegram (long polling или webhook)
+и распределяет их между процессами-обработчиками по ID проблемы или чата
+"""
+
+import asyncio
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+
+from webhook import health_handler
+
+logger = logging.getLogger(__name__)
+
+# Типы обновлений, которые обрабатывают роутеры бота
+ALLOWED_UPDATES = ['message', 'callback_query']
+
+# Путь, на который процессы-обработчики принимают обновления
+WORKER_PATH = '/updates'
+
+# Кнопки под проблемами: все нажатия по одной проблеме попадают в один процесс
+_PROBLEM_CALLBACK_RE = re.compile(r'^(?:like|approve|reject)_(\d+)$')
+
+
+def partition_key(update: Dict[str, Any]) -> int:
+    """
+    Ключ распределения обновления между процессами
+    
+    Нажатия на кнопки проблем распределяются по ID проблемы, поэтому
+    лайки и модерация одной проблемы обрабатываются последовательно
+    одним процессом, остальные обновления - по ID чата.
+    
+    Args:
+        update: Объект Update в формате Bot API
+    
+    Returns:
+        Целое число, остаток от деления которого - номер процесса
+    """
+    callback = update.get('callback_query')
+    if callback is not None:
+        match = _PROBLEM_CALLBACK_RE.match(callback.get('data') or '')
+        if match:
+            return int(match.group(1))
+        message = callback.get('message') or {}
+        return (message.get('chat') or callback['from'])['id']
+    
+    for kind in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        message = update.get(kind)
+        if message is not None:
+            return message['chat']['id']
+    return update.get('update_id', 0)
+
+
+class WorkerPool:
+    """
+    Процессы-обработчики обновлений
+    
+    Каждый процесс - python main.py --worker N с сервером на 127.0.0.1,
+    принимающим обновления от основного процесса. Упавший процесс
+    перезапускается, обновления для него повторяются до перезапуска.
+    """
+    
+    def __init__(self, workers: int, base_port: int, secret: str, extra_args: List[str] = None):
+        """
+        Инициализация пула
+        
+        Args:
+            workers: Количество процессов
+            base_port: Порт первого процесса, остальные - следующие по порядку
+            secret: Секрет для проверки запросов от основного процесса
+            extra_args: Дополнительные аргументы командной строки процессов
+        """
+        self.workers = workers
+        self.base_port = base_port
+        self.secret = secret
+        self.extra_args = extra_args or []
+        self.processes: List[Optional[subprocess.Popen]] = [None] * workers
+        self.forwarded = [0] * workers
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def url(self, index: int) -> str:
+        """Адрес процесса-обработчика"""
+        return f"http://127.0.0.1:{self.base_port + index}"
+    
+    def _spawn(self, index: int) -> subprocess.Popen:
+        """Запуск процесса-обработчика"""
+        env = dict(
+            os.environ,
+            WORKER_PORT=str(self.base_port + index),
+            WORKER_SECRET=self.secret
+        )
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+        process = subprocess.Popen(
+            [sys.executable, script, '--worker', str(index), *self.extra_args], env=env
+        )
+        self.processes[index] = process
+        logger.info(f"Запущен обработчик {index} (PID {process.pid}, порт {self.base_port + index})")
+        return process
+    
+    async def _wait_ready(self, index: int, timeout: float = 120):
+        """Ожидание, пока процесс начнет принимать обновления"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.processes[index].poll() is not None:
+                raise RuntimeError(f"Обработчик {index} завершился при запуске")
+            try:
+                async with self._session.get(f"{self.url(index)}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"Обработчик {index} не запустился за {timeout:.0f} с")
+    
+    async def start(self):
+        """
+        Запуск всех процессов
+        
+        Первый процесс подключает Google Sheets и заполняет общую базу,
+        поэтому остальные запускаются после его готовности.
+        """
+        self._session = aiohttp.ClientSession()
+        self._spawn(0)
+        await self._wait_ready(0)
+        for index in range(1, self.workers):
+            self._spawn(index)
+        await asyncio.gather(*(self._wait_ready(index) for index in range(1, self.workers)))
+        logger.info(f"Все обработчики ({self.workers}) готовы")
+    
+    async def forward(self, update: Dict[str, Any], attempts: int = 30):
+        """
+        Передача обновления процессу по ключу распределения
+        
+        Args:
+            update: Объект Update в формате Bot API
+            attempts: Количество попыток (процесс может перезапускаться)
+        """
+        index = partition_key(update) % self.workers
+        for attempt in range(attempts):
+            try:
+                async with self._session.post(
+                    f"{self.url(index)}{WORKER_PATH}",
+                    json=update,
+                    headers={'X-Telegram-Bot-Api-Secret-Token': self.secret}
+                ) as response:
+                    if response.status == 200:
+                        self.forwarded[index] += 1
+                        return
+                    logger.warning(f"Обработчик {index} ответил {response.status} на обновление")
+            except aiohttp.ClientError as e:
+                logger.warning(f"Обработчик {index} недоступен: {e}")
+            await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+        logger.error(f"Обновление {update.get('update_id')} не доставлено обработчику {index}")
+    
+    async def supervise(self, interval: float = 1.0):
+        """Перезапуск завершившихся процессов"""
+        while True:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self.processes):
+                if process is not None and process.poll() is not None:
+                    logger.error(f"Обработчик {index} завершился с кодом {process.returncode}, перезапуск")
+                    self._spawn(index)
+    
+    async def _terminate(self, indexes: range, timeout: float):
+        """Остановка процессов по SIGTERM и принудительная через timeout секунд"""
+        for index in indexes:
+            process = self.processes[index]
+            if process is not None and process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for index in indexes:
+            process = self.processes[index]
+            if process is None:
+                continue
+            while process.poll() is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            if process.poll() is None:
+                logger.warning(f"Обработчик {index} не остановился за {timeout:.0f} с")
+                process.kill()
+    
+    async def stop(self, timeout: float = 30):
+        """
+        Остановка процессов с ожиданием записи их очередей
+        
+        Первый обработчик переносит журнал изменений в Google Sheets,
+        поэтому останавливается после остальных.
+        """
+        await self._terminate(range(1, self.workers), timeout)
+        await self._terminate(range(0, 1), timeout)
+        if self._session is not None:
+            await self._session.close()
+        logger.info(f"Обновлений передано обработчикам: {self.forwarded}")
+
+
+class TelegramClient:
+    """Минимальный клиент Bot API: обновления передаются обработчикам без разбора"""
+    
+    def __init__(self, token: str, api_url: Optional[str] = None):
+        """
+        Инициализация клиента
+        
+        Args:
+            token: Токен бота
+            api_url: Адрес сервера Bot API (по умолчанию api.telegram.org)
+        """
+        self.token = token
+        self.api = TelegramAPIServer.from_base(api_url) if api_url else PRODUCTION
+        self.session = aiohttp.ClientSession()
+    
+    async def call(self, method: str, request_timeout: float = 60, **params) -> Any:
+        """
+        Вызов метода Bot API
+        
+        Args:
+            method: Название метода
+            request_timeout: Ограничение времени запроса в секундах
+            **params: Параметры метода
+        
+        Returns:
+            Поле result ответа
+        """
+        async with self.session.post(
+            self.api.api_url(self.token, method),
+            json=params,
+            timeout=aiohttp.ClientTimeout(total=request_timeout)
+        ) as response:
+            data = await response.json()
+        if not data.get('ok'):
+            raise RuntimeError(f"{method}: {data.get('description')}")
+        return data['result']
+    
+    async def close(self):
+        """Закрытие HTTP-сессии"""
+        await self.session.close()
+
+
+async def poll_updates(client: TelegramClient, pool: WorkerPool, timeout: int = 30):
+    """
+    Long polling в основном процессе
+    
+    Обновления одного ответа getUpdates передаются обработчикам одновременно;
+    следующий запрос подтверждает их только после доставки.
+    """
+    await client.call('deleteWebhook')
+    offset = None
+    while True:
+        try:
+            updates = await client.call(
+                'getUpdates', request_timeout=timeout + 10,
+                offset=offset, timeout=timeout, allowed_updates=ALLOWED_UPDATES
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+            logger.error(f"Ошибка получения обновлений: {e}")
+            await asyncio.sleep(1)
+            continue
+        
+        if updates:
+            await asyncio.gather(*(pool.forward(update) for update in updates))
+            offset = updates[-1]['update_id'] + 1
+
+
+async def run_webhook_front(client: TelegramClient, pool: WorkerPool, base_url: str,
+                            path: str = '/webhook', secret_token: Optional[str] = None,
+                            host: str = '0.0.0.0', port: int = 8080):
+    """
+    Прием webhook в основном процессе и передача обновлений обработчикам
+    
+    Args:
+        client: Клиент Bot API
+        pool: Процессы-обработчики
+        base_url: Публичный адрес сервера
+        path: Путь для приема обновлений
+        secret_token: Секрет для проверки запросов от Telegram
+        host: Адрес для прослушивания
+        port: Порт для прослушивания
+    """
+    tasks = set()
+    
+    async def updates_handler(request: web.Request) -> web.Response:
+        if secret_token and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+            return web.Response(status=401)
+        # Telegram сразу получает ответ, обновление передается в фоне
+        task = asyncio.create_task(pool.forward(await request.json()))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return web.json_response({})
+    
+    app = web.Application()
+    app.router.add_get('/health', health_handler)
+    app.router.add_post(path, updates_handler)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Webhook-сервер запущен на {host}:{port}")
+    
+    try:
+        await client.call(
+            'setWebhook',
+            url=f"{base_url.rstrip('/')}{path}",
+            secret_token=secret_token,
+            allowed_updates=ALLOWED_UPDATES
+        )
+        logger.info(f"Webhook зарегистрирован: {base_url.rstrip('/')}{path}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_cluster(bot_token: str, workers: int, bot_mode: str = 'polling',
+                      webhook_url: Optional[str] = None, webhook_secret: Optional[str] = None,
+                      extra_args: List[str] = None):
+    """
+    Запуск процессов-обработчиков и прием обновлений в основном процессе
+    
+    Args:
+        bot_token: Токен бота
+        workers: Количество процессов-обработчиков
+        bot_mode: Режим получения обновлений (polling или webhook)
+        webhook_url: Публичный адрес сервера для режима webhook
+        webhook_secret: Секрет для проверки запросов от Telegram
+        extra_args: Дополнительные аргументы командной строки обработчиков
+    """
+    pool = WorkerPool(
+        workers,
+        base_port=int(os.getenv('WORKER_BASE_PORT', '8100')),
+        secret=os.urandom(16).hex(),
+        extra_args=extra_args
+    )
+    client = TelegramClient(bot_token, os.getenv('TELEGRAM_API_URL'))
+    supervisor = None
+    try:
+        await pool.start()
+        supervisor = asyncio.create_task(pool.supervise())
+        logger.info(f"Обновления распределяются между {workers} обработчиками, режим: {bot_mode}")
+        
+        if bot_mode == 'webhook':
+            await run_webhook_front(
+                client, pool, webhook_url,
+                path=os.getenv('WEBHOOK_PATH', '/webhook'),
+                secret_token=webhook_secret,
+                host=os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+                port=int(os.getenv('PORT', '8080'))
+            )
+        else:
+            await poll_updates(client, pool)
+    finally:
+        if supervisor is not None:
+            supervisor.cancel()
+        await pool.stop()
+        await client.close()
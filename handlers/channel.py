@@ -7,50 +7,66 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 import logging
 
-from services.google_sheets import GoogleSheetsService
+from services.storage import ProblemStorage
+from services.message_editor import MessageEditScheduler
+from services.likes_registry import LikesRegistry
 
 logger = logging.getLogger(__name__)
 
 # Создаем роутер для работы с каналом
-channel_router = Router()
+channel_router = Router(name="channel")
 
 
 @channel_router.callback_query(F.data.startswith("like_"))
-async def handle_like(callback: CallbackQuery, sheets_service: GoogleSheetsService):
+async def handle_like(callback: CallbackQuery, storage: ProblemStorage,
+                      edit_scheduler: MessageEditScheduler, likes_registry: LikesRegistry):
     """
     Обработчик нажатия на кнопку лайка в канале
     
     Args:
         callback: Callback от inline-кнопки
-        sheets_service: Сервис для работы с Google Sheets
+        storage: Хранилище проблем
+        edit_scheduler: Планировщик редактирования сообщений в канале
+        likes_registry: Реестр пользователей, поставивших лайк
     """
     try:
         # Извлекаем ID проблемы из callback_data
         problem_id = int(callback.data.split("_")[1])
+        user_id = callback.from_user.id
+        
+        # Повторное нажатие не меняет счетчик и не редактирует сообщение
+        if await likes_registry.has_liked(problem_id, user_id):
+            await callback.answer("Вы уже поставили лайк этой проблеме")
+            return
         
         # Получаем текущие данные проблемы
-        problem_data = sheets_service.get_problem_by_id(problem_id)
+        problem_data = await storage.get_problem_by_id(problem_id)
         
         if not problem_data:
             await callback.answer("❌ Проблема не найдена")
             return
         
-        # Увеличиваем количество лайков на 1
-        current_likes = problem_data.get('Лайки', 0)
-        new_likes = current_likes + 1
+        # Одновременные нажатия одного пользователя засчитываются один раз
+        if not await likes_registry.add(problem_id, user_id):
+            await callback.answer("Вы уже поставили лайк этой проблеме")
+            return
         
-        # Обновляем количество лайков в Google Sheets
-        success = sheets_service.update_likes(problem_id, new_likes)
+        # Атомарно увеличиваем количество лайков на 1
+        new_likes = await storage.increment_likes(problem_id)
         
-        if success:
+        if new_likes is not None:
             # Обновляем сообщение в канале
-            await update_channel_message(callback, problem_id, problem_data['Текст проблемы'], new_likes)
+            update_channel_message(
+                edit_scheduler, callback, problem_id,
+                problem_data['Текст проблемы'], new_likes
+            )
             
             # Уведомляем пользователя
             await callback.answer(f"👍 Лайк добавлен! Всего: {new_likes}")
             
             logger.info(f"Лайк добавлен к проблеме #{problem_id}, всего лайков: {new_likes}")
         else:
+            await likes_registry.remove(problem_id, user_id)
             await callback.answer("❌ Ошибка при обновлении лайков")
             
     except Exception as e:
@@ -58,11 +74,16 @@ async def handle_like(callback: CallbackQuery, sheets_service: GoogleSheetsServi
         await callback.answer("❌ Произошла ошибка")
 
 
-async def update_channel_message(callback: CallbackQuery, problem_id: int, problem_text: str, likes_count: int):
+def update_channel_message(edit_scheduler: MessageEditScheduler, callback: CallbackQuery,
+                           problem_id: int, problem_text: str, likes_count: int):
     """
     Обновление сообщения в канале с новым количеством лайков
     
+    Несколько лайков подряд объединяются планировщиком в одно редактирование
+    с последним значением счетчика.
+    
     Args:
+        edit_scheduler: Планировщик редактирования сообщений
         callback: Callback от inline-кнопки
         problem_id: ID проблемы
         problem_text: Текст проблемы
@@ -88,45 +109,37 @@ async def update_channel_message(callback: CallbackQuery, problem_id: int, probl
             ]
         ])
         
-        # Обновляем сообщение
-        await callback.message.edit_text(
+        # Ставим обновление сообщения в очередь
+        edit_scheduler.schedule(
+            chat_id=callback.message.chat.id,
+            message_id=callback.message.message_id,
             text=updated_text,
             reply_markup=keyboard,
             parse_mode="Markdown"
         )
         
-        logger.info(f"Сообщение проблемы #{problem_id} обновлено в канале")
-        
     except Exception as e:
         logger.error(f"Ошибка при обновлении сообщения в канале: {e}")
 
 
-async def get_problem_stats(sheets_service: GoogleSheetsService) -> dict:
+async def get_problem_stats(storage: ProblemStorage) -> dict:
     """
     Получение статистики по проблемам
     
     Args:
-        sheets_service: Сервис для работы с Google Sheets
+        storage: Хранилище проблем
         
     Returns:
         Словарь со статистикой
     """
     try:
-        all_records = sheets_service.worksheet.get_all_records()
-        
-        # Подсчитываем статистику
-        total_problems = len(all_records)
-        approved_problems = [r for r in all_records if r.get('Статус') == 'approved']
-        total_likes = sum(int(r.get('Лайки', 0)) for r in approved_problems)
-        
-        # Находим самую популярную проблему
-        most_liked = max(approved_problems, key=lambda x: int(x.get('Лайки', 0)), default={})
+        storage_stats = await storage.get_stats()
         
         stats = {
-            'total_problems': total_problems,
-            'approved_problems': len(approved_problems),
-            'total_likes': total_likes,
-            'most_liked': most_liked
+            'total_problems': storage_stats['total'],
+            'approved_problems': storage_stats['approved'],
+            'total_likes': storage_stats['total_likes'],
+            'most_liked': storage_stats['most_liked']
         }
         
         return stats
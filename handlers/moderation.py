@@ -5,20 +5,38 @@
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, Message
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
+from typing import Any, Dict, List, Optional, Set
 import logging
 
-from services.google_sheets import GoogleSheetsService
+from services.delivery import DeliveryQueue
+from services.metrics import registry
+from services.storage import ProblemStorage
 
 logger = logging.getLogger(__name__)
 
 # Создаем роутер для модерации
-moderation_router = Router()
+moderation_router = Router(name="moderation")
+
+# Максимальное количество проблем в одной команде массовой модерации
+MAX_BULK_IDS = 500
+
+# Количество проблем на одной странице /pending и длина текста в списке
+PENDING_PAGE_SIZE = 10
+PENDING_TEXT_PREVIEW = 200
+
+# Проблемы, решение по которым сейчас записывается в этом процессе: повторное
+# нажатие кнопки получает ответ сразу, не дожидаясь записи. Защиту между
+# процессами дает хранилище: статус меняется только у проблем в статусе
+# pending, а публикуются только проблемы, статус которых изменен этим вызовом
+# (кнопки распределяются по ID проблемы, а /approve и /reject - по ID чата)
+_in_progress: Set[int] = set()
 
 
 async def send_to_moderators(bot, mod_chat_id: int, problem_id: int, problem_text: str):
     """
     Отправка проблемы модераторам для рассмотрения
+    Вызывается очередью доставки, которая повторяет отправку при ошибках
     
     Args:
         bot: Экземпляр бота
@@ -26,122 +44,133 @@ async def send_to_moderators(bot, mod_chat_id: int, problem_id: int, problem_tex
         problem_id: ID проблемы
         problem_text: Текст проблемы
     """
-    try:
-        # Создаем сообщение для модераторов
-        moderation_text = f"""
+    # Создаем сообщение для модераторов
+    moderation_text = f"""
 🔍 **Новая проблема для модерации**
 
 **ID:** #{problem_id}
 **Текст:** {problem_text}
 
 Выберите действие:
-        """
-        
-        # Создаем inline-кнопки для модерации
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="✅ Одобрить", 
-                    callback_data=f"approve_{problem_id}"
-                ),
-                InlineKeyboardButton(
-                    text="❌ Отклонить", 
-                    callback_data=f"reject_{problem_id}"
-                )
-            ]
-        ])
-        
-        # Отправляем сообщение модераторам
-        await bot.send_message(
-            chat_id=mod_chat_id,
-            text=moderation_text,
-            reply_markup=keyboard,
-            parse_mode="Markdown"
-        )
-        
-        logger.info(f"Проблема #{problem_id} отправлена модераторам")
-        
-    except Exception as e:
-        logger.error(f"Ошибка при отправке модераторам: {e}")
+    """
+    
+    # Создаем inline-кнопки для модерации
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="✅ Одобрить", 
+                callback_data=f"approve_{problem_id}"
+            ),
+            InlineKeyboardButton(
+                text="❌ Отклонить", 
+                callback_data=f"reject_{problem_id}"
+            )
+        ]
+    ])
+    
+    # Отправляем сообщение модераторам
+    await bot.send_message(
+        chat_id=mod_chat_id,
+        text=moderation_text,
+        reply_markup=keyboard,
+        parse_mode="Markdown"
+    )
+    
+    logger.info(f"Проблема #{problem_id} отправлена модераторам")
 
 
 @moderation_router.callback_query(F.data.startswith("approve_"))
-async def approve_problem(callback: CallbackQuery, sheets_service: GoogleSheetsService, 
-                         bot, channel_id: str):
+async def approve_problem(callback: CallbackQuery, storage: ProblemStorage,
+                          delivery: DeliveryQueue):
     """
     Обработчик одобрения проблемы модератором
     
+    Проблема ставится в очередь публикации; сообщение модераторам отмечается
+    как опубликованное только после успешной отправки в канал.
+    
     Args:
         callback: Callback от inline-кнопки
-        sheets_service: Сервис для работы с Google Sheets
-        bot: Экземпляр бота
-        channel_id: ID канала для публикации
+        storage: Хранилище проблем
+        delivery: Очередь доставки сообщений
     """
-    try:
-        # Извлекаем ID проблемы из callback_data
-        problem_id = int(callback.data.split("_")[1])
-        
-        # Обновляем статус в Google Sheets
-        success = sheets_service.update_status(problem_id, "approved")
-        
-        if success:
-            # Получаем данные проблемы
-            problem_data = sheets_service.get_problem_by_id(problem_id)
-            
-            if problem_data:
-                # Публикуем в канал
-                await publish_to_channel(
-                    bot, int(channel_id), problem_id, 
-                    problem_data['Текст проблемы']
-                )
-                
-                # Уведомляем модератора
-                await callback.answer("✅ Проблема одобрена и опубликована в канале!")
-                await callback.message.edit_text(
-                    f"✅ **Одобрено**\n\n**ID:** #{problem_id}\n**Статус:** Опубликовано в канале"
-                )
-                
-                logger.info(f"Проблема #{problem_id} одобрена и опубликована")
-            else:
-                await callback.answer("❌ Ошибка: данные проблемы не найдены")
-        else:
-            await callback.answer("❌ Ошибка при обновлении статуса")
-            
-    except Exception as e:
-        logger.error(f"Ошибка при одобрении проблемы: {e}")
-        await callback.answer("❌ Произошла ошибка")
+    await moderate_problem(callback, storage, delivery, "approved")
 
 
 @moderation_router.callback_query(F.data.startswith("reject_"))
-async def reject_problem(callback: CallbackQuery, sheets_service: GoogleSheetsService):
+async def reject_problem(callback: CallbackQuery, storage: ProblemStorage,
+                         delivery: DeliveryQueue):
     """
     Обработчик отклонения проблемы модератором
     
     Args:
         callback: Callback от inline-кнопки
-        sheets_service: Сервис для работы с Google Sheets
+        storage: Хранилище проблем
+        delivery: Очередь доставки сообщений
     """
+    await moderate_problem(callback, storage, delivery, "rejected")
+
+
+async def moderate_problem(callback: CallbackQuery, storage: ProblemStorage,
+                           delivery: DeliveryQueue, status: str):
+    """
+    Решение модератора по одной проблеме
+    
+    Кнопки старых сообщений модераторам остаются и после массовой модерации,
+    поэтому решение принимается только для проблем, ожидающих модерации.
+    
+    Args:
+        callback: Callback от inline-кнопки
+        storage: Хранилище проблем
+        delivery: Очередь доставки сообщений
+        status: Новый статус ("approved" или "rejected")
+    """
+    problem_id = None
     try:
         # Извлекаем ID проблемы из callback_data
         problem_id = int(callback.data.split("_")[1])
+        if problem_id in _in_progress:
+            await callback.answer("⏳ Решение по проблеме уже записывается")
+            return
+        _in_progress.add(problem_id)
+        
+        problem_data = await storage.get_problem_by_id(problem_id)
+        if not problem_data:
+            await callback.answer("❌ Ошибка: данные проблемы не найдены")
+            return
+        if problem_data['Статус'] != 'pending':
+            await callback.answer("ℹ️ Проблема уже прошла модерацию")
+            return
         
-        # Обновляем статус в Google Sheets
-        success = sheets_service.update_status(problem_id, "rejected")
+        # Статус меняется, только если проблема все еще ожидает модерации: ее
+        # могла одобрить массовая команда в другом процессе
+        if not await storage.update_status(problem_id, status):
+            await callback.answer("ℹ️ Проблема уже прошла модерацию")
+            return
         
-        if success:
-            # Уведомляем модератора
+        if status == "approved":
+            # Публикация переживает перезапуск; кнопка отмечается после отправки в канал
+            delivery.put('publish', {
+                'id': problem_id,
+                'text': problem_data['Текст проблемы'],
+                'mod_message': [callback.message.chat.id, callback.message.message_id]
+            })
+            await callback.answer("✅ Проблема одобрена и поставлена в очередь публикации")
+            await callback.message.edit_text(
+                f"✅ **Одобрено**\n\n**ID:** #{problem_id}\n**Статус:** Ожидает публикации в канале"
+            )
+            logger.info(f"Проблема #{problem_id} одобрена и поставлена в очередь публикации")
+        else:
             await callback.answer("❌ Проблема отклонена")
             await callback.message.edit_text(
                 f"❌ **Отклонено**\n\n**ID:** #{problem_id}\n**Статус:** Отклонено модератором"
             )
-            
             logger.info(f"Проблема #{problem_id} отклонена")
-        else:
-            await callback.answer("❌ Ошибка при обновлении статуса")
-            
+    
     except Exception as e:
-        logger.error(f"Ошибка при отклонении проблемы: {e}")
+        logger.error(f"Ошибка при модерации проблемы: {e}")
         await callback.answer("❌ Произошла ошибка")
+    finally:
+        _in_progress.discard(problem_id)
 
 
 async def publish_to_channel(bot, channel_id: int, problem_id: int, problem_text: str):
@@ -154,54 +183,259 @@ async def publish_to_channel(bot, channel_id: int, problem_id: int, problem_text
         problem_id: ID проблемы
         problem_text: Текст проблемы
     """
-    try:
-        # Форматируем сообщение для канала
-        channel_text = f"""
+    # Форматируем сообщение для канала
+    channel_text = f"""
 💭 **Проблема #{problem_id}**
 
 {problem_text}
 
 👍 0
-        """
+    """
+    
+    # Создаем inline-кнопку для лайков
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text="👍 Лайк (0)", 
+                callback_data=f"like_{problem_id}"
+            )
+        ]
+    ])
+    
+    # Публикуем в канал
+    await bot.send_message(
+        chat_id=channel_id,
+        text=channel_text,
+        reply_markup=keyboard,
+        parse_mode="Markdown"
+    )
+    
+    logger.info(f"Проблема #{problem_id} опубликована в канале")
+
+
+async def publish_approved(bot, channel_id: int, payload: Dict[str, Any]):
+    """
+    Публикация из очереди доставки
+    Вызывается очередью доставки, которая повторяет отправку при ошибках
+    
+    Args:
+        bot: Экземпляр бота
+        channel_id: ID канала
+        payload: ID и текст проблемы, а также [чат, сообщение] модераторам
+            при одобрении кнопкой
+    """
+    problem_id = payload['id']
+    await publish_to_channel(bot, channel_id, problem_id, payload['text'])
+    
+    mod_message = payload.get('mod_message')
+    if mod_message:
+        # Публикация уже выполнена - ошибка отметки не должна ее повторить
+        try:
+            await bot.edit_message_text(
+                chat_id=mod_message[0],
+                message_id=mod_message[1],
+                text=f"✅ **Одобрено**\n\n**ID:** #{problem_id}\n**Статус:** Опубликовано в канале"
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось отметить публикацию проблемы #{problem_id}: {e}")
+
+
+def parse_id_ranges(text: str) -> List[int]:
+    """
+    Разбор списка ID из аргументов команды
+    
+    Args:
+        text: Строка вида "12-40, 45 50"
+    
+    Returns:
+        Отсортированный список ID без повторов
+    
+    Raises:
+        ValueError: Если строка пустая, содержит не числа или слишком много ID
+    """
+    problem_ids = set()
+    for part in text.replace(',', ' ').split():
+        if '-' in part:
+            start, end = (int(value) for value in part.split('-', 1))
+            if start > end:
+                start, end = end, start
+            if end - start >= MAX_BULK_IDS:
+                raise ValueError(f"Слишком большой диапазон: {part}")
+            problem_ids.update(range(start, end + 1))
+        else:
+            problem_ids.add(int(part))
+    
+    if not problem_ids or len(problem_ids) > MAX_BULK_IDS:
+        raise ValueError(f"Нужно указать от 1 до {MAX_BULK_IDS} ID")
+    return sorted(problem_ids)
+
+
+@moderation_router.message(Command("approve", "reject"))
+async def bulk_moderation(message: Message, command: CommandObject, storage: ProblemStorage,
+                          delivery: DeliveryQueue, mod_chat_id: str):
+    """
+    Массовая модерация: /approve 12-40 или /reject 12,15,20-25
+    Доступна только в чате модераторов
+    
+    Все статусы записываются в таблицу одним пакетом, одобренные проблемы
+    ставятся в очередь доставки и публикуются в канал в фоне.
+    """
+    if str(message.chat.id) != str(mod_chat_id):
+        return
+    
+    try:
+        problem_ids = parse_id_ranges(command.args or '')
+    except ValueError:
+        await message.answer(
+            f"Укажите ID проблем: /{command.command} 12-40 или /{command.command} 12,15,20-25"
+        )
+        return
+    
+    candidates: List[int] = []
+    try:
+        status = "approved" if command.command == "approve" else "rejected"
         
-        # Создаем inline-кнопку для лайков
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="👍 Лайк (0)", 
-                    callback_data=f"like_{problem_id}"
-                )
-            ]
-        ])
+        # Изменяем только проблемы, которые еще ожидают модерации и не
+        # модерируются кнопкой в этот момент
+        pending = {problem['ID']: problem for problem in await storage.get_pending_problems()}
+        candidates = [
+            problem_id for problem_id in problem_ids
+            if problem_id in pending and problem_id not in _in_progress
+        ]
+        _in_progress.update(candidates)
+        updated = await storage.update_statuses(candidates, status)
+        if status == "approved":
+            # Публикуются только проблемы, статус которых изменил этот вызов.
+            # Публикации ставятся в очередь сразу после смены статуса, поэтому
+            # не теряются при перезапуске; скорость ограничивает лимит канала
+            delivery.put_many(
+                ('publish', {'id': problem_id, 'text': pending[problem_id]['Текст проблемы']})
+                for problem_id in updated
+            )
+        skipped = len(problem_ids) - len(updated)
         
-        # Публикуем в канал
-        await bot.send_message(
-            chat_id=channel_id,
-            text=channel_text,
-            reply_markup=keyboard,
-            parse_mode="Markdown"
+        action = "Одобрено" if status == "approved" else "Отклонено"
+        text = (
+            f"{'✅' if status == 'approved' else '❌'} **{action}:** {len(updated)}\n"
+            f"**Пропущено** (не найдены или уже обработаны): {skipped}"
         )
+        if status == "approved" and updated:
+            text += "\nПубликация в канале идет в фоне и продолжится после перезапуска"
+        await message.answer(text, parse_mode="Markdown")
+        logger.info(f"{action} проблем: {len(updated)} ({command.args})")
+    
+    except Exception as e:
+        logger.error(f"Ошибка при массовой модерации: {e}")
+        await message.answer("❌ Ошибка при массовой модерации")
+    finally:
+        _in_progress.difference_update(candidates)
+
+
+def format_pending_page(page: Dict[str, Any]) -> tuple:
+    """
+    Форматирование страницы очереди модерации
+    
+    Args:
+        page: Результат storage.get_pending_page()
+    
+    Returns:
+        Кортеж (текст_сообщения, клавиатура или None)
+    """
+    items = page['items']
+    if not items:
+        return "📋 Нет проблем, ожидающих модерации", None
+    
+    # Текст без Markdown: в тексте проблем могут быть служебные символы
+    lines = [f"📋 Ожидают модерации: {page['total']}", ""]
+    for problem in items:
+        text = str(problem['Текст проблемы'])
+        if len(text) > PENDING_TEXT_PREVIEW:
+            text = text[:PENDING_TEXT_PREVIEW] + "…"
+        lines.append(f"#{problem['ID']} {text}")
+    lines.append("")
+    lines.append(f"Одобрить страницу: /approve {items[0]['ID']}-{items[-1]['ID']}")
+    
+    # В кнопках хранится курсор, поэтому они работают и после перезапуска бота
+    buttons = []
+    if page['has_prev']:
+        buttons.append(InlineKeyboardButton(
+            text="◀️ Назад", callback_data=f"pending_prev_{items[0]['ID']}"
+        ))
+    if page['has_next']:
+        buttons.append(InlineKeyboardButton(
+            text="Вперед ▶️", callback_data=f"pending_next_{items[-1]['ID']}"
+        ))
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    
+    return "\n".join(lines), keyboard
+
+
+async def load_pending_page(storage: ProblemStorage, after_id: int = 0,
+                            before_id: Optional[int] = None) -> Dict[str, Any]:
+    """Загрузка страницы очереди; если страница опустела, показываем первую"""
+    page = await storage.get_pending_page(after_id, before_id, PENDING_PAGE_SIZE)
+    if not page['items'] and (after_id or before_id is not None):
+        page = await storage.get_pending_page(limit=PENDING_PAGE_SIZE)
+    return page
+
+
+@moderation_router.message(Command("pending"))
+async def pending_command(message: Message, storage: ProblemStorage, mod_chat_id: str):
+    """
+    Постраничный просмотр проблем, ожидающих модерации
+    Доступна только в чате модераторов
+    """
+    if str(message.chat.id) != str(mod_chat_id):
+        return
+    
+    try:
+        text, keyboard = format_pending_page(await load_pending_page(storage))
+        await message.answer(text, reply_markup=keyboard)
+    
+    except Exception as e:
+        logger.error(f"Ошибка при получении очереди модерации: {e}")
+        await message.answer("❌ Ошибка при получении очереди модерации")
+
+
+@moderation_router.callback_query(F.data.startswith("pending_"))
+async def pending_navigation(callback: CallbackQuery, storage: ProblemStorage):
+    """
+    Переход между страницами очереди модерации
+    
+    Args:
+        callback: Callback от кнопки "Назад" или "Вперед"
+        storage: Хранилище проблем
+    """
+    try:
+        _, direction, cursor = callback.data.split("_")
+        if direction == "next":
+            page = await load_pending_page(storage, after_id=int(cursor))
+        else:
+            page = await load_pending_page(storage, before_id=int(cursor))
         
-        logger.info(f"Проблема #{problem_id} опубликована в канале")
-        
+        text, keyboard = format_pending_page(page)
+        await callback.message.edit_text(text, reply_markup=keyboard)
+        await callback.answer()
+    
     except Exception as e:
-        logger.error(f"Ошибка при публикации в канал: {e}")
+        logger.error(f"Ошибка при переходе по очереди модерации: {e}")
+        await callback.answer("❌ Произошла ошибка")
 
 
 @moderation_router.message(Command("modstats"))
-async def moderation_stats(message: Message, sheets_service: GoogleSheetsService):
+async def moderation_stats(message: Message, storage: ProblemStorage):
     """
     Команда для получения статистики модерации
     Доступна только в чате модераторов
     """
     try:
-        # Получаем статистику из Google Sheets
-        all_records = sheets_service.worksheet.get_all_records()
+        # Получаем статистику из хранилища
+        stats = await storage.get_stats()
         
-        total_problems = len(all_records)
-        pending_count = len([r for r in all_records if r.get('Статус') == 'pending'])
-        approved_count = len([r for r in all_records if r.get('Статус') == 'approved'])
-        rejected_count = len([r for r in all_records if r.get('Статус') == 'rejected'])
+        total_problems = stats['total']
+        pending_count = stats['pending']
+        approved_count = stats['approved']
+        rejected_count = stats['rejected']
         
         stats_text = f"""
 📊 **Статистика модерации**
@@ -213,7 +447,77 @@ async def moderation_stats(message: Message, sheets_service: GoogleSheetsService
         """
         
         await message.answer(stats_text, parse_mode="Markdown")
-        
+    
     except Exception as e:
         logger.error(f"Ошибка при получении статистики: {e}")
         await message.answer("❌ Ошибка при получении статистики")
+
+
+def _format_ms(seconds: float) -> str:
+    """Длительность в миллисекундах (верхняя граница корзины гистограммы)"""
+    if seconds == float('inf'):
+        return '>10000'
+    return f"{seconds * 1000:.0f}"
+
+
+def format_perf_report(limit: int = 8) -> str:
+    """
+    Текст сводки производительности для команды /perf
+    
+    Args:
+        limit: Максимальное количество строк в каждом разделе
+    
+    Returns:
+        Текст сообщения (без разметки)
+    """
+    lines = ["⏱ Производительность (p50 / p95 / среднее, мс)"]
+    
+    def section(title: str, metric_name: str, describe):
+        metric = registry.get(metric_name)
+        rows = metric.summary()[:limit] if metric is not None else []
+        lines.append("")
+        lines.append(title)
+        if not rows:
+            lines.append("  нет данных")
+        for row in rows:
+            lines.append(
+                f"  {describe(row['labels'])} - {row['count']} шт., "
+                f"{_format_ms(row['p50'])} / {_format_ms(row['p95'])} / {row['avg'] * 1000:.1f}"
+            )
+    
+    def describe_handler(labels: Dict[str, str]) -> str:
+        name = f"{labels['router']}.{labels['handler']}"
+        return f"{name} [{labels['prefix']}]" if labels['prefix'] else name
+    
+    def describe_sheets(labels: Dict[str, str]) -> str:
+        method = labels['method']
+        errors = registry.get('sheets_errors_total').labels(method).value
+        received = registry.get('sheets_received_bytes_total').labels(method).value
+        details = f", ошибок {errors:.0f}" if errors else ""
+        if received:
+            details += f", получено {received / 1024:.0f} КБ"
+        return method + details
+    
+    section("Обработчики:", 'bot_handler_seconds', describe_handler)
+    section("Ожидание обработки обновлений:", 'bot_update_wait_seconds', lambda labels: "все")
+    section("Telegram Bot API:", 'telegram_request_seconds', lambda labels: labels['method'])
+    section("Очередь отправки Telegram:", 'telegram_queue_wait_seconds', lambda labels: "все")
+    section("Google Sheets API:", 'sheets_request_seconds', describe_sheets)
+    return '\n'.join(lines)
+
+
+@moderation_router.message(Command("perf"))
+async def perf_command(message: Message, mod_chat_id: str):
+    """
+    Сводка задержек обработчиков, Telegram и Google Sheets
+    Доступна только в чате модераторов
+    """
+    if str(message.chat.id) != str(mod_chat_id):
+        return
+    
+    try:
+        await message.answer(format_perf_report())
+    
+    except Exception as e:
+        logger.error(f"Ошибка при формировании сводки производительности: {e}")
+        await message.answer("❌ Ошибка при формировании сводки производительности")
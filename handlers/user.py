@@ -8,12 +8,13 @@ from aiogram.types import Message
 from aiogram.filters import Command
 import logging
 
-from services.google_sheets import GoogleSheetsService
+from services.delivery import DeliveryQueue
+from services.storage import ProblemStorage
 
 logger = logging.getLogger(__name__)
 
 # Создаем роутер для пользовательских сообщений
-user_router = Router()
+user_router = Router(name="user")
 
 
 @user_router.message(Command("start"))
@@ -36,10 +37,11 @@ async def start_command(message: Message):
 
 
 @user_router.message(F.text)
-async def handle_text_message(message: Message, sheets_service: GoogleSheetsService, bot, mod_chat_id: str):
+async def handle_text_message(message: Message, storage: ProblemStorage, mod_chat_id: str,
+                              delivery: DeliveryQueue):
     """
     Обработчик текстовых сообщений от пользователей
-    Сохраняет проблему в Google Sheets и отправляет на модерацию
+    Сохраняет проблему в хранилище и ставит ее в очередь отправки модераторам
     """
     try:
         # Проверяем, что сообщение НЕ из чата модераторов
@@ -61,8 +63,8 @@ async def handle_text_message(message: Message, sheets_service: GoogleSheetsServ
             )
             return
         
-        # Сохраняем проблему в Google Sheets
-        problem_id = sheets_service.add_problem(problem_text)
+        # Сохраняем проблему в хранилище
+        problem_id = await storage.add_problem(problem_text)
         
         # Отправляем подтверждение пользователю
         confirmation_text = f"""
@@ -77,12 +79,12 @@ async def handle_text_message(message: Message, sheets_service: GoogleSheetsServ
         
         await message.answer(confirmation_text, parse_mode="Markdown")
         
-        # Отправляем проблему модераторам
-        from handlers.moderation import send_to_moderators
-        await send_to_moderators(bot, int(mod_chat_id), problem_id, problem_text)
+        # Сообщение модераторам отправит очередь доставки: обработчик не ждет
+        # лимита Telegram для чата модераторов (20 сообщений в минуту)
+        delivery.put('moderation', {'id': problem_id, 'text': problem_text})
         
         logger.info(f"Пользователь {message.from_user.id} отправил проблему #{problem_id}")
-        
+    
     except Exception as e:
         logger.error(f"Ошибка при обработке сообщения пользователя: {e}")
         await message.answer(
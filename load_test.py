@@ -0,0 +1,452 @@
+"""
+Нагрузочный тест бота целиком
+Запускает main() с локальными имитациями Telegram Bot API и Google Sheets API
+и подает поток обновлений: /start, новые проблемы, модерация и лайки
+
+Примеры:
+    python load_test.py --duration 60 --submissions-per-min 500 --likes-per-sec 100
+    python load_test.py --save-stream stream.jsonl --json report.json
+    python load_test.py --replay stream.jsonl
+    python load_test.py --no-telegram-limits --channel-posts 1000
+    python load_test.py --backend sqlite --compare-workers 4
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from services.storage import PROBLEM_FIELDS
+from utils.fake_servers import FakeBotAPI, FakeSheetsAPI
+from utils.fake_sheets import FakeWorksheet
+
+CHANNEL_ID = -1001000000001
+MOD_CHAT_ID = -1001000000002
+FIRST_USER_ID = 10_000_000
+
+# Модерация выбирает проблемы, отправленные не позже чем столько секунд назад
+MODERATION_DELAY = 2.0
+
+
+class StreamGenerator:
+    """Синтетический поток обновлений с пуассоновскими интервалами"""
+    
+    def __init__(self, seed_rows: int, seed: int = 1, channel_posts: int = 50):
+        """
+        Инициализация генератора
+        
+        Args:
+            seed_rows: Количество одобренных проблем в таблице до начала теста
+            seed: Зерно генератора случайных чисел
+            channel_posts: Количество последних постов в канале, которые лайкают
+        """
+        self.seed_rows = seed_rows
+        self.channel_posts = max(1, min(channel_posts, seed_rows))
+        self.rng = random.Random(seed)
+        self._next_user = FIRST_USER_ID
+        self._next_message = 0
+    
+    def _user(self) -> Dict[str, Any]:
+        """Новый пользователь: ответы сопоставляются по его личному чату"""
+        self._next_user += 1
+        return {'id': self._next_user, 'is_bot': False, 'first_name': 'Тест'}
+    
+    def _message(self, text: str) -> Dict[str, Any]:
+        """Сообщение пользователя в личном чате с ботом"""
+        user = self._user()
+        self._next_message += 1
+        return {'message': {
+            'message_id': self._next_message,
+            'date': int(time.time()),
+            'chat': {'id': user['id'], 'type': 'private'},
+            'from': user,
+            'text': text
+        }}
+    
+    def _callback(self, data: str, chat_id: int, chat_type: str, message_id: int) -> Dict[str, Any]:
+        """
+        Нажатие на кнопку под сообщением в канале или чате модераторов
+        
+        У каждой проблемы одно сообщение в чате (его ID - ID проблемы),
+        поэтому нажатия под одним постом редактируют одно и то же сообщение.
+        """
+        self._next_message += 1
+        return {'callback_query': {
+            'id': str(self._next_message),
+            'from': self._user(),
+            'chat_instance': str(chat_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': chat_type},
+                'text': 'Проблема'
+            }
+        }}
+    
+    def _times(self, per_second: float, duration: float) -> List[float]:
+        """Моменты событий пуассоновского потока"""
+        times = []
+        if per_second <= 0:
+            return times
+        at = self.rng.expovariate(per_second)
+        while at < duration:
+            times.append(at)
+            at += self.rng.expovariate(per_second)
+        return times
+    
+    def generate(self, duration: float, starts_per_min: float, submissions_per_min: float,
+                 moderations_per_min: float, likes_per_sec: float,
+                 approve_ratio: float = 0.7) -> List[Dict[str, Any]]:
+        """
+        Поток событий, отсортированный по времени
+        
+        Returns:
+            Список словарей с ключами at (секунды от начала), kind и update
+        """
+        events = []
+        for at in self._times(starts_per_min / 60, duration):
+            events.append({'at': at, 'kind': 'start', 'update': self._message('/start')})
+        
+        submissions = self._times(submissions_per_min / 60, duration)
+        for index, at in enumerate(submissions):
+            text = f"Нагрузочный тест: проблема {index + 1}. " + "Подробности. " * self.rng.randint(1, 20)
+            events.append({'at': at, 'kind': 'submit', 'update': self._message(text)})
+        
+        # ID новых проблем выдаются по порядку после уже существующих
+        for at in self._times(moderations_per_min / 60, duration):
+            ready = bisect.bisect_right(submissions, at - MODERATION_DELAY)
+            if ready == 0:
+                continue
+            problem_id = self.seed_rows + self.rng.randint(1, ready)
+            action = 'approve' if self.rng.random() < approve_ratio else 'reject'
+            update = self._callback(f"{action}_{problem_id}", MOD_CHAT_ID, 'supergroup', problem_id)
+            events.append({'at': at, 'kind': action, 'update': update})
+        
+        # Лайкают последние посты канала: частые нажатия под одним постом
+        # объединяются планировщиком редактирования
+        first_post = self.seed_rows - self.channel_posts + 1
+        for at in self._times(likes_per_sec, duration):
+            problem_id = self.rng.randint(first_post, self.seed_rows)
+            update = self._callback(f"like_{problem_id}", CHANNEL_ID, 'channel', problem_id)
+            events.append({'at': at, 'kind': 'like', 'update': update})
+        
+        events.sort(key=lambda event: event['at'])
+        for update_id, event in enumerate(events, 1):
+            event['update']['update_id'] = update_id
+        return events
+
+
+def reply_key(update: Dict[str, Any]) -> str:
+    """Ключ, по которому ответ бота сопоставляется с обновлением"""
+    if 'callback_query' in update:
+        return update['callback_query']['id']
+    return str(update['message']['chat']['id'])
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def configure_environment(tmp_dir: str, bot_api: FakeBotAPI, sheets_api: FakeSheetsAPI,
+                          backend: str, telegram_limits: bool, workers: int = 1,
+                          worker_base_port: int = 18100, verbose: bool = False,
+                          sheets_quota: bool = False):
+    """Переменные окружения для запуска main() с имитациями"""
+    os.environ.update({
+        'BOT_TOKEN': '123456:LOADTEST',
+        'CHANNEL_ID': str(CHANNEL_ID),
+        'MOD_CHAT_ID': str(MOD_CHAT_ID),
+        'GOOGLE_SHEET_ID': 'loadtest',
+        'STORAGE_BACKEND': backend,
+        'BOT_MODE': 'polling',
+        'TELEGRAM_API_URL': bot_api.url,
+        'SHEETS_API_URL': sheets_api.url,
+        'SQLITE_PATH': os.path.join(tmp_dir, 'problems.sqlite3'),
+        'STATE_DB_PATH': os.path.join(tmp_dir, 'state.sqlite3'),
+        'LIKES_DB_PATH': os.path.join(tmp_dir, 'likes.sqlite3'),
+        'OUTBOX_PATH': os.path.join(tmp_dir, 'outbox.sqlite3'),
+        'ID_STATE_PATH': os.path.join(tmp_dir, 'id_state.json'),
+        'BOT_WORKERS': str(workers),
+        'WORKER_BASE_PORT': str(worker_base_port),
+        # Процессы-обработчики пишут логи в stderr теста
+        'LOG_LEVEL': 'INFO' if verbose else 'WARNING',
+    })
+    os.environ.pop('METRICS_PORT', None)
+    if not telegram_limits:
+        # Лимиты Telegram не ограничивают исходящие сообщения - измеряется сам бот.
+        # Интервал редактирования одного поста остается рабочим: без него
+        # объединение частых редактирований не проверяется
+        os.environ.update({
+            'TG_GLOBAL_RATE': '100000',
+            'TG_GROUP_RATE_PER_MINUTE': '6000000',
+            'TG_PRIVATE_RATE': '100000',
+            'EDIT_GLOBAL_RATE': '100000',
+        })
+    if not sheets_quota:
+        # Имитация Google Sheets не ограничивает запросы - квоты API сняты
+        os.environ.update({
+            'SHEETS_READS_PER_MINUTE': '0',
+            'SHEETS_WRITES_PER_MINUTE': '0',
+        })
+
+
+async def drive(events: List[Dict[str, Any]], bot_api: FakeBotAPI, drain_timeout: float) -> Dict[str, Any]:
+    """
+    Подача обновлений в темпе потока и ожидание ответов
+    
+    Returns:
+        Словарь с временем отправки по ключам ответа, началом и окончанием подачи
+    """
+    sent_at: Dict[str, float] = {}
+    started = time.perf_counter()
+    for event in events:
+        delay = started + event['at'] - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent_at[reply_key(event['update'])] = time.perf_counter()
+        bot_api.push(event['update'])
+    finished = time.perf_counter()
+    
+    # Ждем, пока бот ответит на все обновления
+    deadline = finished + drain_timeout
+    while time.perf_counter() < deadline:
+        answered = {key for _, _, key in list(bot_api.requests)}
+        if answered.issuperset(sent_at):
+            break
+        await asyncio.sleep(0.1)
+    
+    return {'sent_at': sent_at, 'started': started, 'finished': finished}
+
+
+def build_report(events: List[Dict[str, Any]], run: Dict[str, Any], bot_api: FakeBotAPI,
+                 worksheet: FakeWorksheet, seed_likes: int) -> Dict[str, Any]:
+    """Задержки ответов, пропускная способность и количество запросов к API"""
+    first_reply: Dict[str, float] = {}
+    for at, _, key in bot_api.requests:
+        if key is not None and key not in first_reply:
+            first_reply[key] = at
+    
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    unanswered: Dict[str, int] = defaultdict(int)
+    for event in events:
+        key = reply_key(event['update'])
+        reply = first_reply.get(key)
+        if reply is None:
+            unanswered[event['kind']] += 1
+        else:
+            latencies[event['kind']].append(reply - run['sent_at'][key])
+    
+    def summary(values: List[float]) -> Dict[str, Any]:
+        values = sorted(values)
+        return {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 0.5) * 1000, 1) if values else None,
+            'p99_ms': round(percentile(values, 0.99) * 1000, 1) if values else None,
+            'max_ms': round(values[-1] * 1000, 1) if values else None
+        }
+    
+    replied = [at for at in first_reply.values() if at >= run['started']]
+    elapsed = (max(replied) if replied else run['finished']) - run['started']
+    sheets_calls = dict(worksheet.calls)
+    likes_column = PROBLEM_FIELDS.index('Лайки')
+    total_likes = sum(
+        int(row[likes_column] or 0) for row in worksheet.get('A2:E') if len(row) > likes_column
+    )
+    
+    return {
+        'updates': len(events),
+        'offered_per_sec': round(len(events) / max(run['finished'] - run['started'], 1e-9), 1),
+        'handled_per_sec': round(sum(len(v) for v in latencies.values()) / max(elapsed, 1e-9), 1),
+        'latency': {
+            'all': summary([value for values in latencies.values() for value in values]),
+            **{kind: summary(values) for kind, values in sorted(latencies.items())}
+        },
+        'unanswered': dict(unanswered),
+        'telegram_calls': dict(bot_api.calls),
+        'sheets_calls': sheets_calls,
+        'channel_edits': sum(
+            1 for _, method, key in bot_api.requests
+            if method == 'editMessageText' and key == str(CHANNEL_ID)
+        ),
+        'likes_sent': sum(1 for event in events if event['kind'] == 'like'),
+        'likes_in_sheet': total_likes - seed_likes
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Вывод отчета"""
+    print(f"\nОбновлений: {report['updates']} "
+          f"(подано {report['offered_per_sec']}/с, обработано {report['handled_per_sec']}/с)")
+    print(f"\n{'тип':<10} {'ответов':>8} {'p50, мс':>10} {'p99, мс':>10} {'max, мс':>10}")
+    for kind, row in report['latency'].items():
+        print(f"{kind:<10} {row['count']:>8} {row['p50_ms'] or '-':>10} {row['p99_ms'] or '-':>10} {row['max_ms'] or '-':>10}")
+    if report['unanswered']:
+        print(f"\n⚠️ Без ответа: {report['unanswered']}")
+    print(f"\nЗапросы к Telegram Bot API: {report['telegram_calls']}")
+    print(f"Запросы к Google Sheets API: {report['sheets_calls']}")
+    print(f"Лайков отправлено: {report['likes_sent']}, записано в таблицу: {report['likes_in_sheet']}, "
+          f"редактирований постов в канале: {report['channel_edits']}")
+
+
+def print_comparison(reports: Dict[int, Dict[str, Any]]):
+    """Сравнение прогонов одного потока с разным количеством обработчиков"""
+    print(f"\nСравнение обработчиков (ядер процессора: {os.cpu_count()})")
+    print(f"{'обработчиков':<13} {'обработано/с':>13} {'p50, мс':>10} {'p99, мс':>10} {'без ответа':>11}")
+    for workers, report in reports.items():
+        row = report['latency']['all']
+        unanswered = sum(report['unanswered'].values())
+        print(f"{workers:<13} {report['handled_per_sec']:>13} {row['p50_ms'] or '-':>10} "
+              f"{row['p99_ms'] or '-':>10} {unanswered:>11}")
+
+
+async def run(args) -> Dict[str, Any]:
+    """Запуск имитаций, бота и потока обновлений"""
+    if args.replay:
+        with open(args.replay, encoding='utf-8') as f:
+            events = [json.loads(line) for line in f if line.strip()]
+    else:
+        events = StreamGenerator(args.seed_rows, args.seed, args.channel_posts).generate(
+            args.duration, args.starts_per_min, args.submissions_per_min,
+            args.moderations_per_min, args.likes_per_sec
+        )
+    if args.save_stream:
+        with open(args.save_stream, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+    
+    worksheet = FakeWorksheet.generate(args.seed_rows)
+    seed_likes = sum(problem_id % 100 for problem_id in range(1, args.seed_rows + 1))
+    sheets_api = FakeSheetsAPI(worksheet, latency=args.sheets_latency).start()
+    bot_api = FakeBotAPI(latency=args.telegram_latency).start()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_environment(
+            tmp_dir, bot_api, sheets_api, args.backend, args.telegram_limits,
+            args.workers, args.worker_base_port, args.verbose, args.sheets_quota
+        )
+        
+        # bot.log основного процесса и обработчиков создается во временном каталоге
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            import main as bot_main
+            if not args.verbose:
+                logging.getLogger().setLevel(logging.WARNING)
+            
+            print(f"🚀 Бот запускается, хранилище: {args.backend}, обработчиков: {args.workers}, "
+                  f"обновлений: {len(events)}", file=sys.stderr)
+            bot_task = asyncio.create_task(bot_main.main())
+            while not bot_api.polling_started.is_set():
+                if bot_task.done():
+                    raise RuntimeError("Бот завершился до начала приема обновлений")
+                await asyncio.sleep(0.05)
+            
+            result = await drive_and_stop(events, bot_task, bot_api, args)
+        finally:
+            os.chdir(cwd)
+            bot_api.stop()
+            sheets_api.stop()
+    
+    return build_report(events, result, bot_api, worksheet, seed_likes)
+
+
+async def drive_and_stop(events: List[Dict[str, Any]], bot_task: asyncio.Task,
+                         bot_api: FakeBotAPI, args) -> Dict[str, Any]:
+    """Подача потока и остановка бота с записью очередей в имитацию таблицы"""
+    try:
+        return await drive(events, bot_api, args.drain_timeout)
+    finally:
+        # Ошибки long polling при остановке имитации не относятся к результату
+        logging.getLogger('aiogram.dispatcher').setLevel(logging.CRITICAL)
+        bot_task.cancel()
+        done, _ = await asyncio.wait({bot_task}, timeout=args.shutdown_timeout)
+        if not done:
+            # С лимитами Telegram отложенные редактирования могут разбираться минутами
+            print(f"⚠️ Бот не остановился за {args.shutdown_timeout} с, очередь не дописана",
+                  file=sys.stderr)
+            bot_task.cancel()
+            await asyncio.gather(bot_task, return_exceptions=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Разбор аргументов и запуск теста"""
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с имитациями Telegram и Google Sheets")
+    parser.add_argument('--duration', type=float, default=30, help="длительность потока в секундах")
+    parser.add_argument('--starts-per-min', type=float, default=60, help="команд /start в минуту")
+    parser.add_argument('--submissions-per-min', type=float, default=500, help="новых проблем в минуту")
+    parser.add_argument('--moderations-per-min', type=float, default=60, help="одобрений и отклонений в минуту")
+    parser.add_argument('--likes-per-sec', type=float, default=100, help="лайков в секунду")
+    parser.add_argument('--seed-rows', type=int, default=10000, help="одобренных проблем в таблице до теста")
+    parser.add_argument('--seed', type=int, default=1, help="зерно генератора потока")
+    parser.add_argument('--channel-posts', type=int, default=50, help="количество лайкаемых постов в канале")
+    parser.add_argument('--backend', choices=('sheets', 'sqlite'), default='sheets', help="хранилище проблем")
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="количество процессов-обработчиков (BOT_WORKERS, только с --backend sqlite)"
+    )
+    parser.add_argument(
+        '--compare-workers', type=int, metavar='N',
+        help="прогнать один поток с 1 и N обработчиками и сравнить (только с --backend sqlite)"
+    )
+    parser.add_argument(
+        '--worker-base-port', type=int, default=18100,
+        help="порт первого процесса-обработчика (WORKER_BASE_PORT)"
+    )
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help="задержка ответа Bot API в секундах")
+    parser.add_argument('--sheets-latency', type=float, default=0.0, help="задержка ответа Sheets API в секундах")
+    parser.add_argument(
+        '--telegram-limits', action=argparse.BooleanOptionalAction, default=True,
+        help="лимиты исходящих сообщений Telegram, как в рабочем режиме (--no-telegram-limits - снять)"
+    )
+    parser.add_argument(
+        '--sheets-quota', action='store_true',
+        help="оставить квоты Google Sheets API (по умолчанию сняты)"
+    )
+    parser.add_argument('--drain-timeout', type=float, default=30, help="ожидание ответов после потока в секундах")
+    parser.add_argument(
+        '--shutdown-timeout', type=float, default=60,
+        help="ожидание остановки бота и записи очередей в секундах"
+    )
+    parser.add_argument('--replay', metavar='PATH', help="поток из файла JSONL вместо синтетического")
+    parser.add_argument('--save-stream', metavar='PATH', help="сохранить поток в JSONL для повторного запуска")
+    parser.add_argument('--json', metavar='PATH', help="сохранить отчет в JSON")
+    parser.add_argument('--verbose', action='store_true', help="выводить логи бота")
+    args = parser.parse_args(argv)
+    if (args.workers > 1 or args.compare_workers) and args.backend != 'sqlite':
+        parser.error("несколько обработчиков работают только с --backend sqlite")
+    
+    # Один и тот же поток (то же зерно) подается боту с каждым количеством обработчиков
+    reports = {}
+    for workers in (1, args.compare_workers) if args.compare_workers else (args.workers,):
+        args.workers = workers
+        reports[workers] = asyncio.run(run(args))
+        print_report(reports[workers])
+    if len(reports) > 1:
+        print_comparison(reports)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(
+                reports[args.workers] if len(reports) == 1 else {str(n): r for n, r in reports.items()},
+                f, ensure_ascii=False, indent=2
+            )
+        print(f"\n💾 Отчет сохранен в {args.json}")
+    
+    return 0 if not any(report['unanswered'] for report in reports.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,26 +3,48 @@
 Интегрирует все компоненты: пользователи, модерация, канал и Google Sheets
 """
 
+import time
+
+# Отметка старта процесса для --profile-startup (до импорта тяжелых модулей)
+PROCESS_STARTED = time.perf_counter()
+
+import argparse
 import asyncio
 import logging
 import os
+import secrets
+import signal
+from typing import Optional
+
 from dotenv import load_dotenv
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 # Импортируем роутеры
 from handlers.user import user_router
-from handlers.moderation import moderation_router
+from handlers.moderation import moderation_router, publish_approved, send_to_moderators
 from handlers.channel import channel_router
 
 # Импортируем сервисы
-from services.google_sheets import GoogleSheetsService
-from middleware import ContextMiddleware
+from services.google_sheets import AsyncGoogleSheetsService
+from services.sheets_quota import SheetsQuota
+from services.sqlite_storage import SQLiteStorage
+from services.storage import ProblemStorage
+from services.message_editor import MessageEditScheduler
+from services.likes_registry import LikesRegistry
+from services.send_queue import SendScheduler
+from services.delivery import DeliveryQueue, orphaned_paths, worker_path
+from services.fsm_storage import SQLiteFSMStorage, SnapshotStore
+from middleware import ContextMiddleware, ConcurrencyLimitMiddleware, MetricsMiddleware
+from webhook import run_webhook, run_worker_server, start_metrics_server
+from cluster import WORKER_PATH, run_cluster
+from utils.startup_profile import StartupProfiler
 
 # Настройка логирования
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv('LOG_LEVEL', 'INFO'),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('bot.log', encoding='utf-8'),
@@ -32,8 +54,99 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    """Основная функция запуска бота"""
+async def create_sheets_service(google_sheet_id: str,
+                                snapshot_store: SnapshotStore = None) -> AsyncGoogleSheetsService:
+    """
+    Подключение к Google Sheets с настройками из переменных окружения
+    
+    Args:
+        google_sheet_id: ID Google Sheets таблицы
+        snapshot_store: Хранилище снимков индекса для быстрого запуска
+    """
+    return await AsyncGoogleSheetsService.create(
+        os.getenv('GOOGLE_CREDENTIALS_PATH', '/etc/secrets/credentials.json'),
+        google_sheet_id,
+        id_state_path=os.getenv('ID_STATE_PATH', 'data/id_state.json'),
+        outbox_path=os.getenv('OUTBOX_PATH', 'data/outbox.sqlite3'),
+        cache_ttl=float(os.getenv('SHEETS_CACHE_TTL', '60')),
+        full_sync_interval=float(os.getenv('SHEETS_FULL_SYNC_INTERVAL', '900')),
+        snapshot_store=snapshot_store,
+        max_workers=int(os.getenv('SHEETS_MAX_WORKERS', '4')),
+        likes_flush_interval=float(os.getenv('LIKES_FLUSH_INTERVAL', '5')),
+        likes_flush_threshold=int(os.getenv('LIKES_FLUSH_THRESHOLD', '50')),
+        outbox_linger=float(os.getenv('SHEETS_BATCH_LINGER', '0.2')),
+        quota=SheetsQuota(
+            reads_per_minute=int(os.getenv('SHEETS_READS_PER_MINUTE', '60')),
+            writes_per_minute=int(os.getenv('SHEETS_WRITES_PER_MINUTE', '60'))
+        )
+    )
+
+
+async def create_storage(backend: str, google_sheet_id: str,
+                         snapshot_store: SnapshotStore = None,
+                         shared: bool = False, mirror_owner: bool = True) -> ProblemStorage:
+    """
+    Создание хранилища проблем
+    
+    Args:
+        backend: "sheets" - Google Sheets, "sqlite" - локальная база SQLite
+        google_sheet_id: ID Google Sheets таблицы (для sqlite - необязательное зеркало)
+        snapshot_store: Хранилище снимков индекса Google Sheets
+        shared: База SQLite общая для нескольких процессов-обработчиков
+        mirror_owner: Процесс подключает Google Sheets и переносит в таблицу
+            изменения всех процессов (в режиме shared - только первый обработчик)
+    
+    Returns:
+        Хранилище проблем
+    """
+    if backend == 'sheets':
+        return await create_sheets_service(google_sheet_id, snapshot_store)
+    
+    if backend != 'sqlite':
+        raise ValueError(f"Неизвестное хранилище: {backend}")
+    
+    mirror = None
+    if google_sheet_id and mirror_owner:
+        mirror = await create_sheets_service(google_sheet_id, snapshot_store)
+    storage = SQLiteStorage(
+        os.getenv('SQLITE_PATH', 'data/problems.sqlite3'),
+        mirror=mirror,
+        shared=shared,
+        journal=shared and bool(google_sheet_id)
+    )
+    
+    # При первом запуске переносим существующие проблемы из таблицы
+    if mirror is not None and len(storage) == 0:
+        storage.import_records(await mirror.get_all_records())
+    
+    return storage
+
+
+async def prepare_telegram(bot: Bot, bot_mode: str):
+    """
+    Проверка токена и сброс старого webhook одновременно с подключением хранилища
+    
+    Args:
+        bot: Экземпляр бота
+        bot_mode: Режим получения обновлений (polling, webhook или worker)
+    """
+    # Информация о боте кэшируется и нужна при запуске polling
+    await bot.me()
+    if bot_mode == 'polling':
+        # Webhook, оставшийся от прошлого запуска, мешает long polling
+        await bot.delete_webhook()
+
+
+async def main(profile_startup: bool = False, worker_index: Optional[int] = None):
+    """
+    Основная функция запуска бота
+    
+    Args:
+        profile_startup: Вывести в лог время каждого этапа запуска
+        worker_index: Номер процесса-обработчика в режиме нескольких процессов
+    """
+    profiler = StartupProfiler(PROCESS_STARTED)
+    profiler.mark('Импорт и конфигурация')
     
     # Загружаем переменные окружения
     load_dotenv()
@@ -43,58 +156,216 @@ async def main():
     channel_id = os.getenv('CHANNEL_ID')
     mod_chat_id = os.getenv('MOD_CHAT_ID')
     google_sheet_id = os.getenv('GOOGLE_SHEET_ID')
-    google_credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', '/etc/secrets/credentials.json')
+    storage_backend = os.getenv('STORAGE_BACKEND', 'sheets')
+    bot_mode = os.getenv('BOT_MODE', 'polling')
+    webhook_url = os.getenv('WEBHOOK_URL')
+    max_concurrent_updates = int(os.getenv('MAX_CONCURRENT_UPDATES', '50'))
+    edit_min_interval = float(os.getenv('EDIT_MIN_INTERVAL', '3'))
+    edit_global_rate = float(os.getenv('EDIT_GLOBAL_RATE', '20'))
+    workers = int(os.getenv('BOT_WORKERS', '1'))
+    webhook_secret = os.getenv('WEBHOOK_SECRET')
     
     # Проверяем наличие всех необходимых переменных
     required_vars = {
         'BOT_TOKEN': bot_token,
         'CHANNEL_ID': channel_id,
-        'MOD_CHAT_ID': mod_chat_id,
-        'GOOGLE_SHEET_ID': google_sheet_id
+        'MOD_CHAT_ID': mod_chat_id
     }
+    # Без Google Sheets можно работать только с локальным хранилищем
+    if storage_backend == 'sheets':
+        required_vars['GOOGLE_SHEET_ID'] = google_sheet_id
+    if bot_mode == 'webhook':
+        required_vars['WEBHOOK_URL'] = webhook_url
     
     missing_vars = [var for var, value in required_vars.items() if not value]
     if missing_vars:
         logger.error(f"Отсутствуют обязательные переменные окружения: {', '.join(missing_vars)}")
         return
     
+    if bot_mode == 'webhook' and not webhook_secret:
+        # Без секрета webhook принимал бы обновления от кого угодно; Telegram
+        # получает секрет при регистрации webhook на каждом запуске
+        webhook_secret = secrets.token_urlsafe(32)
+        logger.info("WEBHOOK_SECRET не задан, сгенерирован случайный секрет")
+    
+    # SIGTERM при остановке на хостинге завершает бота с записью очередей и
+    # снимков (в режиме polling aiogram заменяет обработчик своим на время опроса)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    
+    if workers > 1 and storage_backend != 'sqlite':
+        # Индекс Google Sheets и генератор ID хранятся в памяти процесса, поэтому
+        # бот запускается одним процессом, а не останавливается
+        logger.warning(
+            f"Несколько обработчиков (BOT_WORKERS={workers}) работают только с "
+            f"STORAGE_BACKEND=sqlite, запускается один обработчик"
+        )
+        workers = 1
+    
+    if workers > 1:
+        if worker_index is None:
+            # Основной процесс только принимает обновления и распределяет их
+            await run_cluster(
+                bot_token, workers, bot_mode, webhook_url, webhook_secret,
+                extra_args=['--profile-startup'] if profile_startup else None
+            )
+            return
+        bot_mode = 'worker'
+    
     try:
-        # Инициализируем бота и диспетчер
-        bot = Bot(token=bot_token)
-        storage = MemoryStorage()
-        dp = Dispatcher(storage=storage)
+        # Инициализируем бота и диспетчер; TELEGRAM_API_URL - собственный
+        # сервер Bot API или имитация в нагрузочном тесте
+        telegram_api_url = os.getenv('TELEGRAM_API_URL')
+        if telegram_api_url:
+            bot = Bot(
+                token=bot_token,
+                session=AiohttpSession(api=TelegramAPIServer.from_base(telegram_api_url))
+            )
+        else:
+            bot = Bot(token=bot_token)
         
-        # Инициализируем сервис Google Sheets
-        sheets_service = GoogleSheetsService(google_credentials_path, google_sheet_id)
+        # Все исходящие сообщения проходят через общую очередь с лимитами Telegram;
+        # общие лимиты бота, канала и чата модераторов делятся между обработчиками
+        send_scheduler = SendScheduler(
+            global_rate=float(os.getenv('TG_GLOBAL_RATE', '30')) / workers,
+            group_rate=float(os.getenv('TG_GROUP_RATE_PER_MINUTE', '20')) / 60 / workers,
+            private_rate=float(os.getenv('TG_PRIVATE_RATE', '1'))
+        )
+        bot.session.middleware(send_scheduler)
+        
+        # Состояния FSM и снимки кэшей хранятся в SQLite и переживают перезапуск
+        state_db_path = os.getenv('STATE_DB_PATH', 'data/state.sqlite3')
+        fsm_storage = SQLiteFSMStorage(state_db_path)
+        snapshot_store = SnapshotStore(state_db_path)
+        dp = Dispatcher(storage=fsm_storage)
+        profiler.mark('Бот и диспетчер')
+        
+        # Хранилище проблем подключается одновременно с Telegram; при наличии
+        # снимка индекса Google Sheets подключается в фоне после запуска
+        storage, _ = await asyncio.gather(
+            profiler.track('Хранилище проблем', create_storage(
+                storage_backend, google_sheet_id, snapshot_store,
+                shared=workers > 1, mirror_owner=not worker_index
+            )),
+            profiler.track('Подключение к Telegram', prepare_telegram(bot, bot_mode))
+        )
+        storage.start()
+        
+        # Планировщик редактирования сообщений в канале
+        edit_scheduler = MessageEditScheduler(
+            bot,
+            min_interval=edit_min_interval,
+            global_rate=edit_global_rate / workers
+        )
+        
+        # Реестр лайков: повторные нажатия отсекаются без обращения к хранилищу
+        likes_registry = LikesRegistry(
+            os.getenv('LIKES_DB_PATH', 'data/likes.sqlite3'), shared=workers > 1
+        )
+        # Лайки, потерянные при сбое между реестром и хранилищем, восстанавливаются
+        # до приема обновлений; в кластере - первым обработчиком, который
+        # запускается раньше остальных
+        if not worker_index:
+            await profiler.track('Восстановление лайков', likes_registry.restore_counts(storage))
+        
+        # Сообщения модераторам и публикации в канал отправляются в фоне и
+        # переживают перезапуск; у каждого обработчика своя очередь
+        delivery_path = os.getenv('DELIVERY_PATH', 'data/delivery.sqlite3')
+        delivery = DeliveryQueue(worker_path(delivery_path, worker_index), senders={
+            'moderation': lambda payload: send_to_moderators(
+                bot, int(mod_chat_id), payload['id'], payload['text']
+            ),
+            'publish': lambda payload: publish_approved(bot, int(channel_id), payload)
+        })
+        for path in orphaned_paths(delivery_path, worker_index, workers):
+            delivery.adopt(path)
+        delivery.start()
         
         # Создаем middleware с контекстом
         context_middleware = ContextMiddleware(
-            sheets_service=sheets_service,
+            storage=storage,
             channel_id=channel_id,
             mod_chat_id=mod_chat_id,
-            bot=bot
+            bot=bot,
+            edit_scheduler=edit_scheduler,
+            likes_registry=likes_registry,
+            delivery=delivery
         )
         
         # Регистрируем middleware
+        dp.update.outer_middleware(ConcurrencyLimitMiddleware(max_concurrent_updates))
         dp.message.middleware(context_middleware)
         dp.callback_query.middleware(context_middleware)
         
-        # Регистрируем роутеры
-        dp.include_router(user_router)
+        # Время обработчиков для /perf и /metrics
+        metrics_middleware = MetricsMiddleware()
+        dp.message.middleware(metrics_middleware)
+        dp.callback_query.middleware(metrics_middleware)
+        
+        # Регистрируем роутеры (команды модераторов до общего обработчика текста)
         dp.include_router(moderation_router)
         dp.include_router(channel_router)
+        dp.include_router(user_router)
+        profiler.mark('Обработчики')
+        
+        async def on_startup():
+            """Отметка готовности к приему обновлений"""
+            profiler.mark('Запуск приема обновлений')
+            logger.info(f"Бот готов к приему обновлений через {profiler.phases[-1][2]:.2f} с после старта")
+            if profile_startup:
+                logger.info(profiler.report())
+        
+        dp.startup.register(on_startup)
         
         logger.info("Бот RawThoughts запущен успешно!")
         logger.info(f"Канал: {channel_id}")
         logger.info(f"Чат модераторов: {mod_chat_id}")
-        logger.info(f"Google Sheets: {google_sheet_id}")
+        logger.info(f"Режим получения обновлений: {bot_mode}")
+        logger.info(f"Хранилище: {storage_backend}")
+        logger.info(f"Google Sheets: {google_sheet_id or 'не используется'}")
         
-        # Запускаем бота
-        await dp.start_polling(bot)
+        # Метрики отдает отдельный сервер (по умолчанию только на localhost),
+        # а не публичный webhook-сервер; обработчик отдает их на своем порту
+        metrics_port = os.getenv('METRICS_PORT')
+        if metrics_port and bot_mode != 'worker':
+            metrics_runner = await start_metrics_server(
+                os.getenv('METRICS_HOST', '127.0.0.1'), int(metrics_port)
+            )
         
+        # Запускаем бота
+        if bot_mode == 'worker':
+            await run_worker_server(
+                dp, bot, WORKER_PATH,
+                secret_token=os.environ['WORKER_SECRET'],
+                port=int(os.environ['WORKER_PORT'])
+            )
+        elif bot_mode == 'webhook':
+            await run_webhook(
+                dp, bot, webhook_url,
+                path=os.getenv('WEBHOOK_PATH', '/webhook'),
+                secret_token=webhook_secret,
+                host=os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+                port=int(os.getenv('PORT', '8080'))
+            )
+        else:
+            await dp.start_polling(bot)
+    
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
+        if 'delivery' in locals():
+            await delivery.close()
+        if 'edit_scheduler' in locals():
+            await edit_scheduler.close()
+        if 'storage' in locals():
+            await storage.close()
+        if 'likes_registry' in locals():
+            likes_registry.close()
+        if 'snapshot_store' in locals():
+            snapshot_store.close()
+        if 'metrics_runner' in locals():
+            await metrics_runner.cleanup()
+        if 'send_scheduler' in locals():
+            logger.info(f"Очередь отправки: {send_scheduler.metrics()}")
         if 'bot' in locals():
             await bot.session.close()
 
@@ -107,7 +378,8 @@ def setup_environment():
     
     # Проверяем наличие файла с учетными данными Google
     credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', 'credentials.json')
-    if not os.path.exists(credentials_path):
+    sheets_disabled = os.getenv('STORAGE_BACKEND') == 'sqlite' and not os.getenv('GOOGLE_SHEET_ID')
+    if not sheets_disabled and not os.path.exists(credentials_path):
         logger.error(f"Файл учетных данных Google не найден: {credentials_path}")
         logger.error("Создайте файл credentials.json с учетными данными Google Service Account")
         return False
@@ -122,13 +394,34 @@ def setup_environment():
 
 
 if __name__ == '__main__':
-    # Проверяем конфигурацию перед запуском
-    if setup_environment():
+    parser = argparse.ArgumentParser(description="Telegram-бот RawThoughts")
+    parser.add_argument(
+        '--profile-startup', action='store_true',
+        help="вывести в лог время каждого этапа запуска"
+    )
+    parser.add_argument(
+        '--worker', type=int, metavar='N',
+        help="номер процесса-обработчика (запускается основным процессом при BOT_WORKERS > 1)"
+    )
+    parser.add_argument(
+        '--workers', type=int, metavar='N',
+        help="количество процессов-обработчиков (заменяет BOT_WORKERS)"
+    )
+    args = parser.parse_args()
+    
+    # Через окружение значение получают и процессы-обработчики
+    if args.workers is not None:
+        os.environ['BOT_WORKERS'] = str(max(1, args.workers))
+    
+    # Проверяем конфигурацию перед запуском (обработчики запускает уже проверенный процесс)
+    if args.worker is not None or setup_environment():
         try:
             # Запускаем бота
-            asyncio.run(main())
+            asyncio.run(main(profile_startup=args.profile_startup, worker_index=args.worker))
         except KeyboardInterrupt:
             logger.info("Бот остановлен пользователем")
+        except asyncio.CancelledError:
+            logger.info("Бот остановлен")
         except Exception as e:
             logger.error(f"Критическая ошибка: {e}")
     else:
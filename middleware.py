@@ -2,9 +2,25 @@
 Middleware для передачи контекста в обработчики
 """
 
+import asyncio
+import time
 from aiogram import BaseMiddleware
 from typing import Callable, Dict, Any, Awaitable
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, TelegramObject
+
+from services.metrics import registry
+
+HANDLER_LATENCY = registry.histogram(
+    'bot_handler_seconds', 'Время работы обработчика события',
+    ('router', 'handler', 'prefix')
+)
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'Необработанные исключения в обработчиках',
+    ('router', 'handler', 'prefix')
+)
+UPDATE_WAIT = registry.histogram(
+    'bot_update_wait_seconds', 'Ожидание свободного места для обработки обновления'
+)
 
 
 class ContextMiddleware(BaseMiddleware):
@@ -22,3 +38,60 @@ class ContextMiddleware(BaseMiddleware):
         # Добавляем контекст в data
         data.update(self.context)
         return await handler(event, data)
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """Ограничение количества одновременно обрабатываемых обновлений"""
+    
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(limit)
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Лишние обновления ждут, пока освободится место
+        started = time.perf_counter()
+        async with self._semaphore:
+            UPDATE_WAIT.labels().observe(time.perf_counter() - started)
+            return await handler(event, data)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Гистограммы времени обработчиков по роутеру, функции и префиксу callback
+    
+    Регистрируется как внутренний middleware, поэтому измеряет только
+    работу найденного обработчика, без фильтров и ожидания в очереди.
+    """
+    
+    @staticmethod
+    def _labels(event: TelegramObject, data: Dict[str, Any]) -> tuple:
+        """Метки события: роутер, обработчик и префикс данных кнопки"""
+        router = data.get('event_router')
+        handler = data.get('handler')
+        prefix = ''
+        if isinstance(event, CallbackQuery) and event.data:
+            # like_12 -> like, pending_next_5 -> pending
+            prefix = event.data.split('_', 1)[0]
+        return (
+            router.name if router is not None else '',
+            getattr(getattr(handler, 'callback', None), '__name__', ''),
+            prefix
+        )
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        labels = self._labels(event, data)
+        try:
+            with HANDLER_LATENCY.labels(*labels).time():
+                return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(*labels).inc()
+            raise
@@ -0,0 +1,216 @@
+"""
+Фоновая доставка сообщений Telegram
+Сообщения модераторам и публикации в канал сохраняются в SQLite и отправляются
+фоновыми задачами, поэтому обработчики не ждут лимитов Telegram
+"""
+
+import asyncio
+import glob
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from services.metrics import registry
+from services.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+Sender = Callable[[Dict[str, Any]], Awaitable[None]]
+
+DELIVERY_SENT = registry.counter(
+    'delivery_sent_total', 'Сообщения, отправленные из очереди доставки', ('op',)
+)
+DELIVERY_DROPPED = registry.counter(
+    'delivery_dropped_total', 'Сообщения, отклоненные Telegram без возможности повтора', ('op',)
+)
+DELIVERY_RETRIES = registry.counter(
+    'delivery_retries_total', 'Повторы отправки из очереди доставки после ошибок', ('op',)
+)
+
+
+def worker_path(path: str, worker_index: Optional[int]) -> str:
+    """
+    Файл очереди процесса-обработчика
+    
+    Args:
+        path: Файл очереди из DELIVERY_PATH
+        worker_index: Номер обработчика (None - бот работает одним процессом)
+    
+    Returns:
+        path для одного процесса, иначе path с номером обработчика (delivery-2.sqlite3)
+    """
+    if worker_index is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{worker_index}{ext}"
+
+
+def orphaned_paths(path: str, worker_index: Optional[int], workers: int) -> List[str]:
+    """
+    Файлы очередей процессов, которых больше нет после изменения BOT_WORKERS
+    
+    Их сообщения отправляет первый обработчик или единственный процесс.
+    
+    Args:
+        path: Файл очереди из DELIVERY_PATH
+        worker_index: Номер обработчика (None - бот работает одним процессом)
+        workers: Количество обработчиков
+    
+    Returns:
+        Пути существующих файлов чужих очередей
+    """
+    if worker_index:
+        return []
+    
+    root, ext = os.path.splitext(path)
+    paths = [path] if worker_index == 0 and os.path.exists(path) else []
+    for candidate in sorted(glob.glob(f"{glob.escape(root)}-*{ext}")):
+        index = candidate[len(root) + 1:len(candidate) - len(ext)]
+        if index.isdigit() and (worker_index is None or int(index) >= workers):
+            paths.append(candidate)
+    return paths
+
+
+class DeliveryQueue:
+    """
+    Персистентная очередь исходящих сообщений с фоновой отправкой
+    
+    Для каждого типа сообщений работает своя задача, поэтому публикации в
+    канал не задерживают сообщения модераторам. Сообщение удаляется из
+    очереди только после успешной отправки; неотправленные сообщения
+    отправляются после перезапуска (сообщение, прерванное остановкой,
+    может быть отправлено повторно).
+    """
+    
+    def __init__(self, path: str, senders: Dict[str, Sender],
+                 batch_size: int = 50, max_backoff: float = 60.0):
+        """
+        Инициализация очереди
+        
+        Args:
+            path: Путь к файлу SQLite (":memory:" - очередь только в памяти)
+            senders: Функции отправки по типам сообщений; получают параметры сообщения
+            batch_size: Количество сообщений, читаемых из базы за раз
+            max_backoff: Максимальная пауза между повторами после ошибок (секунды)
+        """
+        self.outbox = Outbox(path)
+        self.senders = senders
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._events = {op: asyncio.Event() for op in senders}
+        self._stopped = asyncio.Event()
+        self._tasks: Dict[str, asyncio.Task] = {}
+    
+    def put(self, op: str, payload: Dict[str, Any]):
+        """
+        Постановка сообщения в очередь
+        
+        Args:
+            op: Тип сообщения (ключ senders)
+            payload: Параметры сообщения
+        """
+        self.put_many([(op, payload)])
+    
+    def put_many(self, messages: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Постановка нескольких сообщений в очередь одной транзакцией
+        
+        Args:
+            messages: Пары (тип сообщения, параметры)
+        """
+        messages = list(messages)
+        self.outbox.put_many(messages)
+        for op in {op for op, _ in messages}:
+            self._events[op].set()
+    
+    def adopt(self, path: str):
+        """
+        Перенос сообщений из очереди другого процесса и удаление ее файла
+        
+        Args:
+            path: Путь к файлу SQLite другой очереди
+        """
+        other = Outbox(path)
+        entries = other.peek()
+        other.close()
+        if entries:
+            self.put_many((op, payload) for _, op, payload in entries)
+            logger.info(f"Из очереди {path} перенесено {len(entries)} сообщений")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    
+    def start(self):
+        """Запуск фоновой отправки, в том числе сообщений, оставшихся с прошлого запуска"""
+        for op in self.senders:
+            self._tasks[op] = asyncio.create_task(self._run(op))
+        
+        pending = len(self.outbox)
+        if pending:
+            logger.info(f"В очереди доставки {pending} сообщений с прошлого запуска")
+    
+    async def _sleep(self, delay: float):
+        """Пауза, прерываемая остановкой очереди"""
+        try:
+            await asyncio.wait_for(self._stopped.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _run(self, op: str):
+        """Отправка сообщений одного типа по порядку постановки в очередь"""
+        sender = self.senders[op]
+        event = self._events[op]
+        backoff = 0.0
+        
+        while not self._stopped.is_set():
+            entries = self.outbox.peek(self.batch_size, ops=(op,))
+            if not entries:
+                event.clear()
+                await event.wait()
+                continue
+            
+            for entry_id, _, payload in entries:
+                if self._stopped.is_set():
+                    return
+                try:
+                    await sender(payload)
+                    DELIVERY_SENT.labels(op).inc()
+                    backoff = 0.0
+                except (TelegramBadRequest, TelegramForbiddenError) as e:
+                    # Повтор не поможет: чат недоступен или сообщение некорректно
+                    DELIVERY_DROPPED.labels(op).inc()
+                    logger.error(f"Сообщение {op} {payload.get('id')} отклонено Telegram: {e}")
+                except Exception as e:
+                    DELIVERY_RETRIES.labels(op).inc()
+                    backoff = min(self.max_backoff, max(1.0, backoff * 2))
+                    logger.warning(
+                        f"Ошибка отправки {op} {payload.get('id')}: {e}, повтор через {backoff:.1f} с"
+                    )
+                    await self._sleep(backoff)
+                    break
+                self.outbox.ack([entry_id])
+    
+    async def close(self, timeout: float = 10.0):
+        """
+        Остановка фоновой отправки
+        
+        Отправляемые сообщения дописываются (не дольше timeout секунд),
+        остальные остаются в очереди до следующего запуска.
+        """
+        self._stopped.set()
+        for event in self._events.values():
+            event.set()
+        
+        tasks = list(self._tasks.values())
+        if tasks:
+            _, running = await asyncio.wait(tasks, timeout=timeout)
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        pending = len(self.outbox)
+        if pending:
+            logger.info(f"В очереди доставки осталось {pending} сообщений, они будут отправлены после запуска")
+        self.outbox.close()
@@ -0,0 +1,261 @@
+"""
+Постоянное хранилище состояний FSM на SQLite
+Состояния переживают перезапуск и доступны нескольким процессам бота;
+в той же базе хранятся снимки внутренних кэшей для быстрого запуска
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Подключение к базе состояний и создание таблиц
+    
+    Args:
+        path: Путь к файлу SQLite (":memory:" - база только в памяти)
+    """
+    if path != ':memory:':
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(
+        'CREATE TABLE IF NOT EXISTS fsm ('
+        '    key TEXT PRIMARY KEY,'
+        '    state TEXT,'
+        '    data TEXT'
+        ') WITHOUT ROWID;'
+        'CREATE TABLE IF NOT EXISTS snapshots ('
+        '    name TEXT PRIMARY KEY,'
+        '    payload BLOB NOT NULL,'
+        '    updated_at REAL NOT NULL'
+        ');'
+    )
+    conn.commit()
+    return conn
+
+
+class ConnectionPool:
+    """
+    Пул соединений с базой состояний
+    
+    Соединения создаются по мере надобности (не больше size) и
+    переиспользуются, поэтому потоки, одновременно обращающиеся к базе,
+    не ждут друг друга на одном соединении: в режиме WAL чтение идет
+    параллельно с записью.
+    """
+    
+    def __init__(self, path: str, size: int = 4):
+        """
+        Инициализация пула
+        
+        Args:
+            path: Путь к файлу SQLite (":memory:" - одно соединение, у каждого своя база)
+            size: Максимальное количество соединений
+        """
+        self.path = path
+        self.size = 1 if path == ':memory:' else max(1, size)
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        # Первое соединение создает таблицы и сразу сообщает об ошибке пути
+        self._idle.put(connect(path))
+        self._created = 1
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """Свободное соединение, новое или освободившееся"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if not can_create:
+            return self._idle.get()
+        
+        try:
+            return connect(self.path)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Соединение из пула на время блока with; незавершенная транзакция откатывается"""
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            with self._lock:
+                closed = self._closed
+            if closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+    
+    def close(self):
+        """Закрытие соединений; занятые закрываются при возврате в пул"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SQLiteFSMStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram в SQLite
+    
+    Каждый вызов - одна операция по первичному ключу в локальном файле
+    (десятки микросекунд) на соединении из пула в отдельном потоке: запросы
+    выполняются параллельно, а ожидание блокировки записи, которую держит
+    другой процесс, не останавливает цикл событий. Кэша в памяти нет, поэтому
+    несколько процессов могут работать с одним файлом: режим WAL позволяет
+    читать параллельно с записью.
+    """
+    
+    def __init__(self, path: str, pool_size: int = 4):
+        """
+        Инициализация хранилища
+        
+        Args:
+            path: Путь к файлу SQLite (":memory:" - хранилище только в памяти)
+            pool_size: Максимальное количество соединений с базой
+        """
+        self.path = path
+        self._pool = ConnectionPool(path, pool_size)
+    
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        """Строковый ключ записи"""
+        # business_connection_id появился в aiogram 3.5; в 3.2 его нет
+        return ':'.join(str(part) if part is not None else '' for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id,
+            getattr(key, 'business_connection_id', None), key.destiny
+        ))
+    
+    def _get_field(self, key: StorageKey, field: str) -> Optional[str]:
+        """Значение столбца записи"""
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                f'SELECT {field} FROM fsm WHERE key = ?', (self._key(key),)
+            ).fetchone()
+        return row[0] if row is not None else None
+    
+    def _set_field(self, key: StorageKey, field: str, value: Optional[str]):
+        """Запись столбца; пустые записи удаляются, чтобы таблица не росла"""
+        db_key = self._key(key)
+        with self._pool.connection() as conn:
+            conn.execute(
+                f'INSERT INTO fsm (key, {field}) VALUES (?, ?) '
+                f'ON CONFLICT(key) DO UPDATE SET {field} = excluded.{field}',
+                (db_key, value)
+            )
+            conn.execute(
+                'DELETE FROM fsm WHERE key = ? AND state IS NULL AND data IS NULL', (db_key,)
+            )
+            conn.commit()
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await asyncio.to_thread(
+            self._set_field, key, 'state', state.state if isinstance(state, State) else state
+        )
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await asyncio.to_thread(self._get_field, key, 'state')
+    
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Данные состояния должны быть словарем, получено {type(data).__name__}")
+        await asyncio.to_thread(
+            self._set_field, key, 'data', json.dumps(data, ensure_ascii=False) if data else None
+        )
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = await asyncio.to_thread(self._get_field, key, 'data')
+        return json.loads(data) if data else {}
+    
+    async def close(self) -> None:
+        self._pool.close()
+
+
+class SnapshotStore:
+    """
+    Снимки внутренних кэшей в базе состояний
+    
+    Отдельный пул соединений с тем же файлом: диспетчер закрывает хранилище
+    FSM при остановке раньше, чем хранилище проблем успевает сохранить снимок.
+    """
+    
+    def __init__(self, path: str, pool_size: int = 2):
+        """
+        Инициализация хранилища снимков
+        
+        Args:
+            path: Путь к файлу SQLite (тот же, что у SQLiteFSMStorage)
+            pool_size: Максимальное количество соединений с базой
+        """
+        self.path = path
+        self._pool = ConnectionPool(path, pool_size)
+    
+    def save_snapshot(self, name: str, payload: bytes):
+        """
+        Сохранение снимка кэша
+        
+        Args:
+            name: Название снимка
+            payload: Содержимое снимка
+        """
+        with self._pool.connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshots (name, payload, updated_at) VALUES (?, ?, ?)',
+                (name, payload, time.time())
+            )
+            conn.commit()
+        logger.info(f"Снимок {name} сохранен ({len(payload)} байт)")
+    
+    def load_snapshot(self, name: str) -> Optional[bytes]:
+        """
+        Загрузка снимка кэша
+        
+        Args:
+            name: Название снимка
+        
+        Returns:
+            Содержимое снимка или None, если снимка нет
+        """
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                'SELECT payload FROM snapshots WHERE name = ?', (name,)
+            ).fetchone()
+        return row[0] if row is not None else None
+    
+    def close(self):
+        """Закрытие соединений с базой"""
+        self._pool.close()
@@ -3,167 +3,853 @@
 Обрабатывает создание, обновление и получение данных из таблицы
 """
 
-import gspread
-from google.oauth2.service_account import Credentials
+import array
+import asyncio
+import functools
 import os
 import json
-from typing import Optional, Dict, Any
+import marshal
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Sequence, Set, Tuple
 import logging
 
+from gspread.utils import numericise, rowcol_to_a1
+
+from services.id_allocator import IdAllocator
+from services.metrics import registry
+from services.outbox import Outbox
+from services.sheets_quota import PRIORITY_HIGH, PRIORITY_LOW, WRITE_METHODS, QuotaDeferred, SheetsQuota
+from services.stats import StatsAggregator
+from services.storage import PROBLEM_FIELDS
+
 logger = logging.getLogger(__name__)
 
+# Номера столбцов таблицы
+COL_ID = 1
+COL_TEXT = 2
+COL_LIKES = 3
+COL_STATUS = 4
+COL_DATE = 5
+
+# Номер строки из диапазона вида "'Лист1'!A5:E5"
+_RANGE_ROW_RE = re.compile(r'![A-Z]+(\d+)')
+
+# Контрольная сумма содержимого A2:E считается формулой в самой таблице, поэтому
+# ручные правки обнаруживаются чтением одной ячейки. Бот вычисляет ожидаемое
+# значение той же функцией (cell_checksum) и дополняет его после своих записей.
+# Ячейки F1:G1 заполняются, только если они пусты или заняты прежней версией формулы
+CHECKSUM_RANGE = 'F1:G1'
+CHECKSUM_CELL = 'G1'
+CHECKSUM_LABEL = 'Контрольная сумма v2'
+CHECKSUM_LABEL_PREFIX = 'Контрольная сумма'
+CHECKSUM_MODULUS = 2147483647
+CELL_HASH_MODULUS = 65521
+ROW_WEIGHT_MODULUS = 4093
+CHECKSUM_FORMULA = (
+    f'=ARRAYFORMULA(MOD(SUM(MAP(A2:E, ROW(A2:E)+0*COLUMN(A2:E), COLUMN(A2:E)+0*ROW(A2:E), '
+    f'LAMBDA(v, r, c, IF(LEN(v), (MOD(r, {ROW_WEIGHT_MODULUS})+1)*c*MOD(SUMPRODUCT('
+    f'UNICODE(MID(v, SEQUENCE(LEN(v)), 1)), SEQUENCE(LEN(v))), {CELL_HASH_MODULUS}), 0)))), '
+    f'{CHECKSUM_MODULUS}))'
+)
+
+# Название снимка индекса в хранилище снимков
+SNAPSHOT_NAME = 'sheets_index'
+SNAPSHOT_MAGIC = b'RTS3'
+
+# Адрес Google Sheets API; SHEETS_API_URL заменяет его адресом эмулятора
+SHEETS_API_HOST = 'https://sheets.googleapis.com'
+
+# Метрики запросов к Google Sheets API по методам gspread
+SHEETS_REQUESTS = registry.counter(
+    'sheets_requests_total', 'Запросы к Google Sheets API', ('method',)
+)
+SHEETS_ERRORS = registry.counter(
+    'sheets_errors_total', 'Ошибки запросов к Google Sheets API', ('method',)
+)
+SHEETS_LATENCY = registry.histogram(
+    'sheets_request_seconds', 'Длительность запросов к Google Sheets API', ('method',)
+)
+SHEETS_SENT_BYTES = registry.counter(
+    'sheets_sent_bytes_total', 'Отправлено байт в Google Sheets API', ('method',)
+)
+SHEETS_RECEIVED_BYTES = registry.counter(
+    'sheets_received_bytes_total', 'Получено байт от Google Sheets API', ('method',)
+)
+
+
+def _redirect_session(session, api_url: str):
+    """
+    Перенаправление запросов сессии gspread с sheets.googleapis.com на api_url
+    
+    Args:
+        session: Сессия requests клиента gspread
+        api_url: Адрес эмулятора (например, http://127.0.0.1:8081)
+    """
+    from requests.adapters import HTTPAdapter
+    
+    class RedirectAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            request.url = api_url.rstrip('/') + request.url[len(SHEETS_API_HOST):]
+            return super().send(request, **kwargs)
+    
+    session.mount(SHEETS_API_HOST, RedirectAdapter())
+
+
+def cell_checksum(row: int, col: int, value: Any) -> int:
+    """
+    Вклад ячейки в контрольную сумму, как в CHECKSUM_FORMULA
+    
+    Хэш текста - сумма кодов символов, умноженных на позицию, по модулю;
+    символы считаются в UTF-16, как в LEN и MID таблицы.
+    
+    Args:
+        row: Номер строки
+        col: Номер столбца (A - 1)
+        value: Значение ячейки (число или строка)
+    
+    Returns:
+        Слагаемое суммы для ячейки (0 для пустой)
+    """
+    text = value if isinstance(value, str) else str(value)
+    if not text:
+        return 0
+    # Кодировка с BOM использует порядок байтов платформы, как и array
+    units = array.array('H', text.encode('utf-16')[2:])
+    text_hash = sum(code * position for position, code in enumerate(units, 1)) % CELL_HASH_MODULUS
+    return (row % ROW_WEIGHT_MODULUS + 1) * col * text_hash
+
+
+def row_checksum(row: int, values: Sequence[Any]) -> int:
+    """Вклад строки таблицы (столбцы A-E) в контрольную сумму"""
+    return sum(cell_checksum(row, col, value) for col, value in enumerate(values[:COL_DATE], 1))
+
+
+def parse_checksum(value: Any) -> Optional[int]:
+    """Значение ячейки контрольной суммы или None, если формулы нет или она не вычислена"""
+    digits = re.sub(r'[\s,\u00a0]', '', str(value))
+    return int(digits) if digits.isdigit() else None
+
+
+class InstrumentedWorksheet:
+    """
+    Обертка листа gspread, считающая запросы, ошибки и задержку по методам
+    
+    Байты считаются хуком HTTP-сессии клиента (http_hook), поэтому для
+    листов без HTTP (FakeWorksheet) учитываются только запросы и задержка.
+    Каждый запрос (и каждый его повтор после 429) проходит через квоту.
+    """
+    
+    # Метод листа, выполняющийся в текущем потоке, - для учета байт
+    _current = threading.local()
+    
+    def __init__(self, worksheet, quota: Optional[SheetsQuota] = None):
+        self.worksheet = worksheet
+        self.quota = quota
+    
+    def __getattr__(self, name: str):
+        attr = getattr(self.worksheet, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        
+        def request(*args, **kwargs):
+            SHEETS_REQUESTS.labels(name).inc()
+            self._current.method = name
+            try:
+                with SHEETS_LATENCY.labels(name).time():
+                    return attr(*args, **kwargs)
+            except Exception:
+                SHEETS_ERRORS.labels(name).inc()
+                raise
+            finally:
+                self._current.method = None
+        
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            if self.quota is None:
+                return request(*args, **kwargs)
+            kind = 'write' if name in WRITE_METHODS else 'read'
+            return self.quota.call(kind, request, *args, **kwargs)
+        
+        return call
+    
+    @classmethod
+    def http_hook(cls, response, *args, **kwargs):
+        """Хук ответа requests: размер запроса и ответа по текущему методу листа"""
+        # Запросы вне методов листа - авторизация и открытие таблицы
+        method = getattr(cls._current, 'method', None) or 'connect'
+        body = response.request.body
+        SHEETS_SENT_BYTES.labels(method).inc(len(body) if body else 0)
+        SHEETS_RECEIVED_BYTES.labels(method).inc(len(response.content))
+
 
 class GoogleSheetsService:
     """Класс для работы с Google Sheets"""
     
-    def __init__(self, credentials_path: str, sheet_id: str):
+    HEADERS = PROBLEM_FIELDS
+    
+    def __init__(self, credentials_path: str, sheet_id: str,
+                 id_state_path: Optional[str] = None,
+                 outbox_path: str = ':memory:',
+                 cache_ttl: float = 60.0,
+                 worksheet=None,
+                 full_sync_interval: float = 900.0,
+                 snapshot_store=None,
+                 quota: Optional[SheetsQuota] = None):
         """
         Инициализация сервиса Google Sheets
         
         Args:
             credentials_path: Путь к JSON файлу с учетными данными
             sheet_id: ID Google Sheets таблицы
+            id_state_path: Путь к файлу с последним выданным ID
+            outbox_path: Путь к файлу очереди изменений
+            cache_ttl: Время жизни локальной копии таблицы в секундах (0 - без обновления)
+            worksheet: Готовый лист вместо подключения к Google (например, FakeWorksheet)
+            full_sync_interval: Период полной перезагрузки таблицы в секундах
+            snapshot_store: Хранилище снимков индекса (например, SQLiteFSMStorage) или None
+            quota: Квоты Google Sheets API (по умолчанию без ограничения, с паузами после 429)
         """
         self.sheet_id = sheet_id
         self.credentials_path = credentials_path
+        self.id_state_path = id_state_path
+        self.cache_ttl = cache_ttl
+        self.full_sync_interval = full_sync_interval
+        self.snapshot_store = snapshot_store
         self.client = None
-        self.worksheet = None
-        self._connect()
+        self.quota = quota or SheetsQuota()
+        self.worksheet = InstrumentedWorksheet(worksheet, self.quota) if worksheet is not None else None
+        self.id_allocator: Optional[IdAllocator] = None
+        
+        # Все изменения сначала попадают в локальную очередь
+        self.outbox = Outbox(outbox_path)
+        self._drain_lock = threading.Lock()
+        
+        # Индекс проблем: ID -> номер строки и ID -> запись
+        self._lock = threading.RLock()
+        self._rows: Dict[int, int] = {}
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._last_row = 1
+        self._loaded_at = 0.0
+        
+        # Состояние инкрементальной синхронизации: последняя прочитанная подряд
+        # строка и ожидаемая контрольная сумма таблицы (None - неизвестна)
+        self._synced_row = 1
+        self._checksum: Optional[int] = None
+        # Проверка по контрольной сумме отключается, если F1:G1 заняты чужими данными
+        self._checksum_enabled = True
+        self._checksum_invalid: Optional[str] = None
+        # Лайки и статус в таблице (в индексе могут быть еще не записанные значения)
+        self._sheet_values: Dict[int, Tuple[Any, Any]] = {}
+        self._full_loaded_at = 0.0
+        
+        # Статистика обновляется вместе с индексом
+        self.stats = StatsAggregator()
+        
+        # ID проблем, лайки которых еще не записаны в таблицу
+        self._dirty_likes: Set[int] = set()
+        
+        # При наличии снимка бот сразу работает с его данными, а подключение
+        # к Google и сверка с таблицей выполняются в фоне (connect)
+        self._connected = False
+        self._restored = self._restore_snapshot()
+        if not self._restored:
+            self.connect()
+    
+    @property
+    def is_connected(self) -> bool:
+        """Выполнено ли подключение к таблице и сверка индекса"""
+        return self._connected
     
-    def _connect(self):
-        """Подключение к Google Sheets"""
+    def connect(self):
+        """
+        Подключение к Google Sheets и сверка индекса с таблицей
+        
+        Без снимка вызывается при создании сервиса, после загрузки снимка -
+        в фоне или при первой записи в таблицу. Повторный вызов ничего не делает.
+        """
+        with self._drain_lock:
+            self._ensure_connected()
+    
+    def _ensure_connected(self):
+        """Подключение, если оно еще не выполнено; вызывается под блокировкой записи"""
+        if self._connected:
+            return
+        
         try:
-            # Настройка области видимости для Google Sheets API
-            scope = [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-            
-            # Загрузка учетных данных
-            if os.path.exists(self.credentials_path):
-                # Локальная разработка - файл существует
-                credentials = Credentials.from_service_account_file(
-                    self.credentials_path, 
-                    scopes=scope
+            started = time.monotonic()
+            if self.worksheet is None:
+                self.worksheet = InstrumentedWorksheet(
+                    self.quota.call('read', self._open_worksheet), self.quota
                 )
-            else:
-                # Продакшн (Render) - загружаем из переменной окружения
-                creds_json = os.getenv('GOOGLE_CREDENTIALS')
-                if creds_json:
-                    credentials_info = json.loads(creds_json)
-                    credentials = Credentials.from_service_account_info(
-                        credentials_info,
-                        scopes=scope
-                    )
-                else:
-                    raise FileNotFoundError(f"Credentials not found at {self.credentials_path} and GOOGLE_CREDENTIALS env var not set")
-            
-            # Создание клиента
-            self.client = gspread.authorize(credentials)
-            
-            # Открытие таблицы
-            spreadsheet = self.client.open_by_key(self.sheet_id)
-            self.worksheet = spreadsheet.sheet1
             
             # Создание заголовков, если их нет
             self._setup_headers()
             
-            logger.info("Успешно подключились к Google Sheets")
+            # Индекс из снимка дополняется строками, добавленными после него;
+            # без снимка или после ручных правок таблица загружается целиком
+            if self._restored and self._sync_changes():
+                self._ack_written_appends()
+            else:
+                self._load_index()
+            
+            # Генератор ID продолжает нумерацию с максимального ID в таблице
+            with self._lock:
+                max_id = max(self._rows, default=0)
+            if self.id_allocator is None:
+                self.id_allocator = IdAllocator(self.id_state_path, seed=max_id)
+            else:
+                self.id_allocator.observe(max_id)
             
+            self._connected = True
+            logger.info(f"Успешно подключились к Google Sheets за {time.monotonic() - started:.2f} с")
+        
         except Exception as e:
             logger.error(f"Ошибка подключения к Google Sheets: {e}")
             raise
     
+    def _open_worksheet(self):
+        """Авторизация и открытие первого листа таблицы"""
+        # Библиотеки Google импортируются только при подключении, чтобы
+        # не замедлять запуск бота (подключение обычно идет в фоне)
+        import gspread
+        from google.oauth2.service_account import Credentials
+        
+        # Локальный эмулятор Sheets API (нагрузочный тест) - без авторизации
+        api_url = os.getenv('SHEETS_API_URL')
+        if api_url:
+            from google.auth.credentials import AnonymousCredentials
+            self.client = gspread.Client(AnonymousCredentials())
+            http_client = getattr(self.client, 'http_client', self.client)
+            _redirect_session(http_client.session, api_url)
+            http_client.session.hooks['response'].append(InstrumentedWorksheet.http_hook)
+            return self.client.open_by_key(self.sheet_id).sheet1
+        
+        # Настройка области видимости для Google Sheets API
+        scope = [
+            'https://www.googleapis.com/auth/spreadsheets',
+            'https://www.googleapis.com/auth/drive'
+        ]
+        
+        # Загрузка учетных данных
+        if os.path.exists(self.credentials_path):
+            # Локальная разработка - файл существует
+            credentials = Credentials.from_service_account_file(
+                self.credentials_path, 
+                scopes=scope
+            )
+        else:
+            # Продакшн (Render) - загружаем из переменной окружения
+            creds_json = os.getenv('GOOGLE_CREDENTIALS')
+            if creds_json:
+                credentials_info = json.loads(creds_json)
+                credentials = Credentials.from_service_account_info(
+                    credentials_info,
+                    scopes=scope
+                )
+            else:
+                raise FileNotFoundError(f"Credentials not found at {self.credentials_path} and GOOGLE_CREDENTIALS env var not set")
+        
+        # Создание клиента; размер запросов учитывается в метриках
+        self.client = gspread.authorize(credentials)
+        http_client = getattr(self.client, 'http_client', self.client)
+        http_client.session.hooks['response'].append(InstrumentedWorksheet.http_hook)
+        
+        # Открытие таблицы
+        spreadsheet = self.client.open_by_key(self.sheet_id)
+        return spreadsheet.sheet1
+    
     def _setup_headers(self):
         """Создание заголовков в таблице, если их нет"""
         try:
             # Проверяем, есть ли заголовки
             headers = self.worksheet.row_values(1)
-            expected_headers = ['ID', 'Текст проблемы', 'Лайки', 'Статус', 'Дата создания']
+            expected_headers = self.HEADERS
             
-            if not headers or headers != expected_headers:
+            if not headers or headers[:len(expected_headers)] != expected_headers:
                 # Добавляем заголовки
                 self.worksheet.update('A1:E1', [expected_headers])
                 logger.info("Заголовки таблицы созданы")
-                
+            
+            # Формула контрольной суммы для обнаружения ручных правок
+            # (формула прежней версии заменяется вместе с подписью). Чужие
+            # данные в F1:G1 не перезаписываются: без формулы ручные правки
+            # обнаруживает только периодическая полная загрузка
+            label, value = (list(headers[COL_DATE:COL_DATE + 2]) + ['', ''])[:2]
+            if label == CHECKSUM_LABEL:
+                pass
+            elif (label == '' and value == '') or str(label).startswith(CHECKSUM_LABEL_PREFIX):
+                self.worksheet.update(CHECKSUM_RANGE, [[CHECKSUM_LABEL, CHECKSUM_FORMULA]], raw=False)
+                logger.info("Формула контрольной суммы добавлена в таблицу")
+            else:
+                self._checksum_enabled = False
+                logger.warning(
+                    f"Ячейки {CHECKSUM_RANGE} заняты ({label!r}, {value!r}), формула контрольной "
+                    f"суммы не добавлена; ручные правки обнаруживаются только полной загрузкой"
+                )
+        
         except Exception as e:
             logger.error(f"Ошибка при создании заголовков: {e}")
     
-    def add_problem(self, problem_text: str) -> int:
+    def _parse_row(self, values: List[Any]) -> Dict[str, Any]:
+        """Преобразование строки листа в запись (числа - как в get_all_records)"""
+        values = list(values[:len(self.HEADERS)])
+        values += [''] * (len(self.HEADERS) - len(values))
+        return dict(zip(
+            self.HEADERS,
+            (numericise(value) if isinstance(value, str) else value for value in values)
+        ))
+    
+    def _read_rows(self, first_row: int):
+        """
+        Чтение строк начиная с first_row и контрольной суммы одним запросом
+        
+        Returns:
+            Кортеж (значения строк, записи по порядку строк, контрольная сумма или None)
+        """
+        if not self._checksum_enabled:
+            data = self.worksheet.get(f'A{first_row}:E')
+            return data, [self._parse_row(row) for row in data], None
+        
+        data, checksum = self.worksheet.batch_get([f'A{first_row}:E', CHECKSUM_CELL])
+        raw = checksum[0][0] if checksum and checksum[0] else ''
+        value = parse_checksum(raw)
+        # Ошибка формулы (#ERROR!, #NAME?) или удаленная формула отключают
+        # проверку ручных правок; предупреждение - при каждом новом значении
+        if value is None and raw != self._checksum_invalid:
+            logger.warning(
+                f"В ячейке {CHECKSUM_CELL} не число ({raw!r}), ручные правки "
+                f"обнаруживаются только полной загрузкой"
+            )
+        self._checksum_invalid = raw if value is None else None
+        return data, [self._parse_row(row) for row in data], value
+    
+    @staticmethod
+    def _mutable_values(values: Sequence[Any]) -> Tuple[Any, Any]:
+        """Лайки и статус из значений строки таблицы"""
+        values = list(values[COL_LIKES - 1:COL_STATUS])
+        values += [''] * (2 - len(values))
+        return values[0], values[1]
+    
+    def _load_index(self):
+        """Загрузка всех записей таблицы в локальный индекс"""
+        data, all_records, checksum = self._read_rows(2)
+        
+        rows = {}
+        records = {}
+        sheet_values = {}
+        # Первая строка таблицы - заголовки
+        for row_num, (values, record) in enumerate(zip(data, all_records), 2):
+            problem_id = record.get('ID')
+            if isinstance(problem_id, int):
+                rows[problem_id] = row_num
+                records[problem_id] = record
+                sheet_values[problem_id] = self._mutable_values(values)
+        
+        with self._lock:
+            previous = self._records
+            self._rows = rows
+            self._records = records
+            self._last_row = len(all_records) + 1
+            self._synced_row = self._last_row
+            self._checksum = checksum
+            self._sheet_values = sheet_values
+            
+            # Изменения, еще не записанные в таблицу, важнее данных из таблицы
+            self._replay_outbox()
+            for problem_id in self._dirty_likes:
+                if problem_id in records and problem_id in previous:
+                    records[problem_id]['Лайки'] = previous[problem_id]['Лайки']
+            
+            self.stats.reset(records.values())
+            self._loaded_at = self._full_loaded_at = time.monotonic()
+        
+        logger.info(f"Загружен индекс проблем: {len(records)} записей")
+    
+    def _restore_snapshot(self) -> bool:
+        """
+        Загрузка индекса из снимка, сохраненного при остановке
+        
+        Обращений к Google нет: строки, добавленные после снимка, и ручные
+        правки подхватываются при подключении (connect).
+        
+        Returns:
+            True если индекс восстановлен из снимка
+        """
+        if self.snapshot_store is None:
+            return False
+        
+        try:
+            data = self.snapshot_store.load_snapshot(SNAPSHOT_NAME)
+            # Снимки старого формата не читаются - выполняется полная загрузка
+            if data is None or not data.startswith(SNAPSHOT_MAGIC):
+                return False
+            
+            snapshot = marshal.loads(zlib.decompress(data[len(SNAPSHOT_MAGIC):]))
+            if snapshot['sheet_id'] != self.sheet_id or snapshot['checksum'] is None:
+                return False
+            
+            rows = {}
+            records = {}
+            sheet_values = {}
+            for row_num, values, mutable in zip(snapshot['rows'], snapshot['records'], snapshot['sheet_values']):
+                rows[values[0]] = row_num
+                records[values[0]] = dict(zip(self.HEADERS, values))
+                sheet_values[values[0]] = mutable
+            
+            with self._lock:
+                self._rows = rows
+                self._records = records
+                self._last_row = self._synced_row = snapshot['synced_row']
+                self._checksum = snapshot['checksum']
+                self._sheet_values = sheet_values
+                self._replay_outbox()
+                self.stats.reset(records.values())
+                self._loaded_at = time.monotonic()
+                # Время полной загрузки переносится из снимка
+                age = max(0.0, time.time() - snapshot['full_loaded_at'])
+                self._full_loaded_at = time.monotonic() - age
+            
+            # Нумерация продолжается с максимального выданного ID, даже если
+            # файл генератора потерян
+            self.id_allocator = IdAllocator(
+                self.id_state_path,
+                seed=max(snapshot['last_id'], max(rows, default=0))
+            )
+        
+        except Exception as e:
+            logger.error(f"Не удалось восстановить индекс из снимка: {e}")
+            return False
+        
+        logger.info(f"Индекс проблем восстановлен из снимка: {len(records)} записей")
+        return True
+    
+    def save_snapshot(self):
+        """
+        Сохранение снимка индекса для быстрого следующего запуска
+        
+        Снимок - сжатый marshal записей, номеров строк, отметки синхронизации
+        и последнего выданного ID. Перед сохранением контрольная сумма
+        сверяется с таблицей, чтобы снимок соответствовал ее текущему состоянию.
+        """
+        if self.snapshot_store is None:
+            return
+        
+        with self._drain_lock:
+            # Без подключения индекс еще не сверялся и соответствует прошлому снимку
+            if self._connected:
+                try:
+                    if not self._sync_changes():
+                        # Таблица изменена вручную - при запуске нужна полная загрузка
+                        self._checksum = None
+                except Exception as e:
+                    logger.error(f"Ошибка при сверке таблицы перед сохранением снимка: {e}")
+                    self._checksum = None
+            
+            with self._lock:
+                written = [
+                    (row_num, self._records[problem_id], self._sheet_values.get(problem_id, ('', '')))
+                    for problem_id, row_num in self._rows.items()
+                    if problem_id in self._records
+                ]
+                snapshot = {
+                    'sheet_id': self.sheet_id,
+                    'synced_row': self._synced_row,
+                    'checksum': self._checksum,
+                    'full_loaded_at': time.time() - (time.monotonic() - self._full_loaded_at),
+                    'last_id': self.id_allocator.last_id if self.id_allocator else 0,
+                    'rows': [row_num for row_num, _, _ in written],
+                    'records': [
+                        tuple(record.get(field, '') for field in self.HEADERS)
+                        for _, record, _ in written
+                    ],
+                    'sheet_values': [tuple(values) for _, _, values in written]
+                }
+        
+        self.snapshot_store.save_snapshot(
+            SNAPSHOT_NAME, SNAPSHOT_MAGIC + zlib.compress(marshal.dumps(snapshot))
+        )
+    
+    def _ack_written_appends(self):
+        """Удаление из очереди строк, которые уже есть в таблице"""
+        # Строка могла быть записана после снимка, а подтверждение не сохраниться
+        written = [
+            entry_id for entry_id, op, payload in self.outbox.peek()
+            if op == 'append' and self._find_row(payload['row'][0]) is not None
+        ]
+        if written:
+            self.outbox.ack(written)
+            logger.info(f"Из очереди удалено уже записанных строк: {len(written)}")
+    
+    def _sync_changes(self) -> bool:
+        """
+        Инкрементальная синхронизация: новые строки и проверка ручных правок
+        
+        Читает только строки после последней синхронизированной и ячейку
+        с контрольной суммой, поэтому стоимость зависит от числа изменений,
+        а не от размера таблицы.
+        
+        Returns:
+            False если существующие строки изменены вручную и нужна полная загрузка
+        """
+        first_row = self._synced_row + 1
+        data, new_records, checksum = self._read_rows(first_row)
+        
+        with self._lock:
+            # Строки, добавленные самим ботом, уже учтены в ожидаемой сумме
+            foreign = [
+                (row_num, values, record)
+                for row_num, (values, record) in enumerate(zip(data, new_records), first_row)
+                if self._rows.get(record.get('ID')) != row_num
+            ]
+            
+            # Ожидаемая сумма: известная сумма таблицы и чужие новые строки.
+            # Расхождение с таблицей - ручная правка существующих строк
+            if checksum is not None and self._checksum is not None:
+                expected = self._checksum + sum(row_checksum(row_num, values) for row_num, values, _ in foreign)
+                if expected % CHECKSUM_MODULUS != checksum:
+                    logger.info("Таблица изменена вручную, выполняется полная загрузка")
+                    return False
+        
+        added = 0
+        with self._lock:
+            for row_num, values, record in foreign:
+                problem_id = record.get('ID')
+                if not isinstance(problem_id, int) or problem_id in self._rows:
+                    continue
+                self._rows[problem_id] = row_num
+                self._sheet_values[problem_id] = self._mutable_values(values)
+                if problem_id not in self._records:
+                    self._records[problem_id] = record
+                    self.stats.update(
+                        problem_id, None, 0, record.get('Статус'), int(record.get('Лайки') or 0)
+                    )
+                    added += 1
+            
+            self._synced_row += len(new_records)
+            self._last_row = max(self._last_row, self._synced_row)
+            self._checksum = checksum
+            self._loaded_at = time.monotonic()
+        
+        if added:
+            logger.info(f"Из таблицы получено новых проблем: {added}")
+        return True
+    
+    def _add_checksum(self, delta: int):
+        """Учет собственной записи в ожидаемой контрольной сумме (вызывается под self._lock)"""
+        if self._checksum is not None:
+            self._checksum = (self._checksum + delta) % CHECKSUM_MODULUS
+    
+    @property
+    def is_stale(self) -> bool:
+        """Истекло ли время жизни локальной копии таблицы"""
+        return self.cache_ttl > 0 and time.monotonic() - self._loaded_at > self.cache_ttl
+    
+    def refresh(self, full: bool = False):
+        """
+        Обновление локальной копии таблицы
+        
+        Подхватывает строки, добавленные или измененные в таблице вручную.
+        Обычно читаются только новые строки; вся таблица загружается при
+        ручной правке, раз в full_sync_interval секунд или по запросу.
+        
+        Args:
+            full: Загрузить всю таблицу (по запросу - без уступки квоты записи)
+        """
+        # Плановое обновление копии уступает квоту новым проблемам и модерации
+        priority = PRIORITY_HIGH if full else PRIORITY_LOW
+        
+        # Запись очереди не должна пересекаться с заменой номеров строк. Пока
+        # идет запись или подключение, читатели работают со старой копией
+        if not self._drain_lock.acquire(blocking=full):
+            return
+        try:
+            try:
+                # Первое подключение само сверяет индекс с таблицей
+                connected = self._connected
+                self._ensure_connected()
+                full = full or time.monotonic() - self._full_loaded_at > self.full_sync_interval
+                if connected:
+                    with self.quota.priority(priority):
+                        if full or not self._sync_changes():
+                            self._load_index()
+            except QuotaDeferred:
+                # Работаем со старой копией до следующего истечения TTL
+                self._loaded_at = time.monotonic()
+                logger.info("Обновление данных из Google Sheets отложено: квота чтения исчерпана")
+                return
+            except Exception as e:
+                # Повторим после следующего истечения TTL, пока работаем со старой копией
+                self._loaded_at = time.monotonic()
+                logger.error(f"Ошибка при обновлении данных из Google Sheets: {e}")
+                return
+        finally:
+            self._drain_lock.release()
+        
+        with self._lock:
+            max_id = max(self._rows, default=0)
+        self.id_allocator.observe(max_id)
+    
+    def _replay_outbox(self):
+        """Применение к индексу операций, оставшихся в очереди"""
+        entries = self.outbox.peek()
+        already_written = []
+        
+        for entry_id, op, payload in entries:
+            if op == 'append':
+                record = dict(zip(self.HEADERS, payload['row']))
+                if self._find_row(record['ID']) is not None:
+                    # Строка была добавлена, но подтверждение не успело сохраниться
+                    already_written.append(entry_id)
+                    continue
+                with self._lock:
+                    self._records[record['ID']] = record
+                    self.stats.update(record['ID'], None, 0, record['Статус'], int(record['Лайки'] or 0))
+            elif op == 'status':
+                self._patch_record(payload['id'], 'Статус', payload['status'])
+            elif op == 'likes':
+                self._patch_record(payload['id'], 'Лайки', payload['likes'])
+        
+        self.outbox.ack(already_written)
+        if entries:
+            logger.info(f"Восстановлено {len(entries) - len(already_written)} операций из очереди")
+    
+    def _find_row(self, problem_id: int) -> Optional[int]:
+        """Номер строки проблемы по индексу"""
+        with self._lock:
+            return self._rows.get(problem_id)
+    
+    def _patch_record(self, problem_id: int, field: str, value: Any) -> bool:
+        """Обновление поля записи в локальном индексе и статистике"""
+        with self._lock:
+            record = self._records.get(problem_id)
+            if record is None:
+                return False
+            
+            old_status, old_likes = record.get('Статус'), int(record.get('Лайки') or 0)
+            record[field] = value
+            self.stats.update(
+                problem_id, old_status, old_likes,
+                record.get('Статус'), int(record.get('Лайки') or 0)
+            )
+            return True
+    
+    def add_problem(self, problem_text: str, problem_id: Optional[int] = None,
+                    created_at: Optional[str] = None) -> int:
         """
         Добавление новой проблемы в таблицу
         
         Args:
             problem_text: Текст проблемы
-            
+            problem_id: Готовый ID (при зеркалировании другого хранилища)
+            created_at: Дата создания (при зеркалировании другого хранилища)
+        
         Returns:
             ID созданной записи
         """
         try:
-            # Получаем следующий ID
-            next_id = self._get_next_id()
+            # Получаем следующий ID без обращения к таблице
+            if problem_id is None:
+                next_id = self.id_allocator.allocate()
+            else:
+                next_id = problem_id
+                self.id_allocator.observe(problem_id)
             
             # Получаем текущую дату
             from datetime import datetime
-            current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            current_date = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            # Добавляем новую строку
+            # Сохраняем строку в очередь, номер строки станет известен после записи
             new_row = [next_id, problem_text, 0, "pending", current_date]
-            self.worksheet.append_row(new_row)
+            with self._lock:
+                self.outbox.put('append', {'row': new_row})
+                self._records[next_id] = dict(zip(self.HEADERS, new_row))
+                self.stats.update(next_id, None, 0, 'pending', 0)
             
             logger.info(f"Добавлена новая проблема с ID {next_id}")
             return next_id
-            
+        
         except Exception as e:
             logger.error(f"Ошибка при добавлении проблемы: {e}")
             raise
     
-    def _get_next_id(self) -> int:
-        """Получение следующего ID для новой записи"""
-        try:
-            # Получаем все ID из первого столбца (кроме заголовка)
-            id_column = self.worksheet.col_values(1)[1:]  # Пропускаем заголовок
-            
-            if not id_column:
-                return 1
-            
-            # Находим максимальный ID
-            max_id = max(int(id_val) for id_val in id_column if id_val.isdigit())
-            return max_id + 1
-            
-        except Exception as e:
-            logger.error(f"Ошибка при получении следующего ID: {e}")
-            return 1
+    def _appended_row(self, response: Optional[Dict[str, Any]]) -> int:
+        """Номер первой строки, добавленной через append_rows"""
+        updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+        match = _RANGE_ROW_RE.search(updated_range)
+        if match:
+            return int(match.group(1))
+        
+        with self._lock:
+            return self._last_row + 1
     
     def update_status(self, problem_id: int, status: str) -> bool:
         """
-        Обновление статуса проблемы
+        Обновление статуса проблемы, ожидающей модерации
         
         Args:
             problem_id: ID проблемы
             status: Новый статус ("approved" или "rejected")
-            
+        
         Returns:
-            True если обновление прошло успешно
+            True если статус изменен; False если проблема не найдена или уже прошла модерацию
         """
         try:
-            # Находим строку с нужным ID
-            id_column = self.worksheet.col_values(1)
-            
-            for row_num, cell_id in enumerate(id_column, 1):
-                if str(cell_id) == str(problem_id):
-                    # Обновляем статус в столбце D (4-й столбец)
-                    self.worksheet.update_cell(row_num, 4, status)
-                    logger.info(f"Статус проблемы {problem_id} обновлен на {status}")
-                    return True
-            
-            logger.warning(f"Проблема с ID {problem_id} не найдена")
-            return False
+            with self._lock:
+                if problem_id not in self._records:
+                    logger.warning(f"Проблема с ID {problem_id} не найдена")
+                    return False
+                if self._records[problem_id]['Статус'] != 'pending':
+                    logger.info(f"Проблема {problem_id} уже прошла модерацию, статус не изменен")
+                    return False
+                
+                # Статус в столбце D будет записан из очереди
+                self.outbox.put('status', {'id': problem_id, 'status': status})
+                self._patch_record(problem_id, 'Статус', status)
             
+            logger.info(f"Статус проблемы {problem_id} обновлен на {status}")
+            return True
+        
         except Exception as e:
             logger.error(f"Ошибка при обновлении статуса: {e}")
             return False
     
+    def update_statuses(self, problem_ids: List[int], status: str) -> List[int]:
+        """
+        Обновление статуса нескольких проблем, ожидающих модерации
+        
+        Все изменения попадают в очередь одной транзакцией и записываются
+        в таблицу одним batch_update.
+        
+        Args:
+            problem_ids: ID проблем
+            status: Новый статус ("approved" или "rejected")
+        
+        Returns:
+            ID проблем, статус которых изменен (без уже прошедших модерацию)
+        """
+        try:
+            with self._lock:
+                updated = [
+                    problem_id for problem_id in problem_ids
+                    if problem_id in self._records and self._records[problem_id]['Статус'] == 'pending'
+                ]
+                self.outbox.put_many(
+                    ('status', {'id': problem_id, 'status': status}) for problem_id in updated
+                )
+                for problem_id in updated:
+                    self._patch_record(problem_id, 'Статус', status)
+            
+            logger.info(f"Статус {len(updated)} проблем обновлен на {status}")
+            return updated
+        
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статусов: {e}")
+            return []
+    
     def update_likes(self, problem_id: int, new_likes_count: int) -> bool:
         """
         Обновление количества лайков
@@ -171,24 +857,24 @@ class GoogleSheetsService:
         Args:
             problem_id: ID проблемы
             new_likes_count: Новое количество лайков
-            
+        
         Returns:
             True если обновление прошло успешно
         """
         try:
-            # Находим строку с нужным ID
-            id_column = self.worksheet.col_values(1)
-            
-            for row_num, cell_id in enumerate(id_column, 1):
-                if str(cell_id) == str(problem_id):
-                    # Обновляем количество лайков в столбце C (3-й столбец)
-                    self.worksheet.update_cell(row_num, 3, new_likes_count)
-                    logger.info(f"Лайки проблемы {problem_id} обновлены на {new_likes_count}")
-                    return True
-            
-            logger.warning(f"Проблема с ID {problem_id} не найдена")
-            return False
+            with self._lock:
+                if problem_id not in self._records:
+                    logger.warning(f"Проблема с ID {problem_id} не найдена")
+                    return False
+                
+                # Лайки в столбце C будут записаны из очереди
+                self.outbox.put('likes', {'id': problem_id, 'likes': new_likes_count})
+                self._patch_record(problem_id, 'Лайки', new_likes_count)
+                self._dirty_likes.discard(problem_id)
             
+            logger.info(f"Лайки проблемы {problem_id} обновлены на {new_likes_count}")
+            return True
+        
         except Exception as e:
             logger.error(f"Ошибка при обновлении лайков: {e}")
             return False
@@ -199,23 +885,13 @@ class GoogleSheetsService:
         
         Args:
             problem_id: ID проблемы
-            
+        
         Returns:
             Словарь с данными проблемы или None
         """
-        try:
-            # Получаем все данные из таблицы
-            all_records = self.worksheet.get_all_records()
-            
-            for record in all_records:
-                if record.get('ID') == problem_id:
-                    return record
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Ошибка при получении проблемы: {e}")
-            return None
+        with self._lock:
+            record = self._records.get(problem_id)
+            return dict(record) if record is not None else None
     
     def get_pending_problems(self) -> list:
         """
@@ -224,14 +900,528 @@ class GoogleSheetsService:
         Returns:
             Список проблем в ожидании модерации
         """
-        try:
-            all_records = self.worksheet.get_all_records()
-            pending_problems = [
-                record for record in all_records 
+        with self._lock:
+            return [
+                dict(record) for record in self._records.values()
                 if record.get('Статус') == 'pending'
             ]
-            return pending_problems
+    
+    def get_all_records(self) -> List[Dict[str, Any]]:
+        """
+        Получение всех записей из индекса
+        
+        Returns:
+            Список всех проблем
+        """
+        with self._lock:
+            return [dict(record) for record in self._records.values()]
+    
+    def get_pending_page(self, after_id: int = 0, before_id: Optional[int] = None,
+                         limit: int = 10) -> Dict[str, Any]:
+        """
+        Страница проблем в ожидании модерации
+        
+        Args:
+            after_id: Проблемы с ID больше указанного
+            before_id: Проблемы с ID меньше указанного
+            limit: Размер страницы
+        
+        Returns:
+            Словарь с ключами items, total, has_prev и has_next
+        """
+        problem_ids, has_prev, has_next = self.stats.pending_ids(after_id, before_id, limit)
+        with self._lock:
+            items = [dict(self._records[problem_id]) for problem_id in problem_ids
+                     if problem_id in self._records]
+        return {
+            'items': items,
+            'total': self.stats.snapshot()['pending'],
+            'has_prev': has_prev,
+            'has_next': has_next
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Получение статистики из инкрементальных счетчиков
+        
+        Returns:
+            Словарь со статистикой
+        """
+        stats = self.stats.snapshot()
+        top = [self.get_problem_by_id(problem_id) for problem_id, _ in self.stats.top()]
+        stats['top'] = [record for record in top if record is not None]
+        stats['most_liked'] = stats['top'][0] if stats['top'] else {}
+        return stats
+    
+    def set_likes(self, problem_id: int, likes_count: int) -> bool:
+        """
+        Установка количества лайков с отложенной записью в таблицу
+        
+        Args:
+            problem_id: ID проблемы
+            likes_count: Новое количество лайков
+        
+        Returns:
+            True если проблема найдена
+        """
+        with self._lock:
+            if not self._patch_record(problem_id, 'Лайки', likes_count):
+                return False
+            self._dirty_likes.add(problem_id)
+            return True
+    
+    def increment_likes(self, problem_id: int) -> Optional[int]:
+        """
+        Увеличение количества лайков в памяти
+        
+        Запись в таблицу откладывается до следующего вызова flush_likes().
+        
+        Args:
+            problem_id: ID проблемы
+        
+        Returns:
+            Новое количество лайков или None, если проблема не найдена
+        """
+        with self._lock:
+            record = self._records.get(problem_id)
+            if record is None:
+                return None
             
+            new_likes = int(record.get('Лайки') or 0) + 1
+            self._patch_record(problem_id, 'Лайки', new_likes)
+            self._dirty_likes.add(problem_id)
+            return new_likes
+    
+    @property
+    def pending_likes(self) -> int:
+        """Количество проблем с незаписанными лайками"""
+        with self._lock:
+            return len(self._dirty_likes)
+    
+    def flush_likes(self) -> int:
+        """
+        Передача накопленных лайков в очередь изменений
+        
+        Returns:
+            Количество проблем с обновленными лайками
+        """
+        with self._lock:
+            dirty = self._dirty_likes
+            self._dirty_likes = set()
+            operations = [
+                ('likes', {'id': problem_id, 'likes': self._records[problem_id]['Лайки']})
+                for problem_id in dirty
+            ]
+            # Запись в очередь под блокировкой, чтобы не перепутать порядок значений
+            self.outbox.put_many(operations)
+        
+        return len(operations)
+    
+    def drain_outbox(self, limit: int = 100) -> int:
+        """
+        Запись операций из очереди в таблицу
+        
+        Новые строки добавляются одним append_rows, обновления ячеек -
+        одним batch_update. Операции удаляются из очереди только после
+        успешной записи.
+        
+        Args:
+            limit: Максимальное количество операций за один вызов
+        
+        Returns:
+            Количество обработанных операций
+        """
+        # Квота записи занимается до блокировки: пока запись ждет квоту,
+        # обновление копии и подключение не стоят за ней в очереди
+        entries = self.outbox.peek(limit, deferred_ops=('likes',))
+        ops = {op for _, op, _ in entries}
+        writes = int('append' in ops) + int(bool(ops - {'append'}))
+        priority = PRIORITY_LOW if ops == {'likes'} else PRIORITY_HIGH
+        try:
+            with self.quota.priority(priority):
+                self.quota.acquire_ahead('write', writes)
+        except QuotaDeferred:
+            self.quota.release_ahead('write')
+            if priority == PRIORITY_LOW:
+                # Лайки останутся в очереди до освобождения квоты
+                return 0
+            raise
+        
+        try:
+            with self._drain_lock:
+                self._ensure_connected()
+                return self._drain_outbox(limit)
+        finally:
+            self.quota.release_ahead('write')
+    
+    def _drain_outbox(self, limit: int) -> int:
+        """
+        Запись одной порции очереди, вызывается под блокировкой
+        
+        Лайки выбираются из очереди после новых проблем и статусов. Порция
+        только из лайков записывается с низким приоритетом и откладывается,
+        если квота записи нужна новым проблемам и модерации.
+        """
+        entries = self.outbox.peek(limit, deferred_ops=('likes',))
+        if not entries:
+            return 0
+        
+        # Сначала добавляем новые строки, чтобы обновления нашли свои строки
+        appends = [(entry_id, payload['row']) for entry_id, op, payload in entries if op == 'append']
+        if appends:
+            response = self.worksheet.append_rows([row for _, row in appends])
+            first_row = self._appended_row(response)
+            
+            with self._lock:
+                for offset, (_, row) in enumerate(appends):
+                    self._rows[row[0]] = first_row + offset
+                    self._sheet_values[row[0]] = self._mutable_values(row)
+                self._add_checksum(sum(
+                    row_checksum(first_row + offset, row) for offset, (_, row) in enumerate(appends)
+                ))
+                self._last_row = max(self._last_row, first_row + len(appends) - 1)
+                # Если перед нашими строками появились чужие, их прочитает синхронизация
+                if first_row == self._synced_row + 1:
+                    self._synced_row = self._last_row
+            self.outbox.ack(entry_id for entry_id, _ in appends)
+        
+        # Обновления ячеек: для каждой ячейки остается последнее значение
+        cells: Dict[Tuple[int, int], Tuple[int, Any]] = {}
+        updated = []
+        for entry_id, op, payload in entries:
+            if op == 'append':
+                continue
+            updated.append(entry_id)
+            
+            column, value = (COL_STATUS, payload['status']) if op == 'status' else (COL_LIKES, payload['likes'])
+            row_num = self._find_row(payload['id'])
+            if row_num is None:
+                logger.warning(f"Проблема с ID {payload['id']} не найдена в таблице, операция пропущена")
+                continue
+            cells[row_num, column] = (payload['id'], value)
+        
+        if cells:
+            priority = PRIORITY_LOW if all(op == 'likes' for _, op, _ in entries) else PRIORITY_HIGH
+            try:
+                with self.quota.priority(priority):
+                    self.worksheet.batch_update([
+                        {'range': rowcol_to_a1(*cell), 'values': [[value]]}
+                        for cell, (_, value) in cells.items()
+                    ])
+            except QuotaDeferred:
+                # Лайки останутся в очереди до освобождения квоты
+                return 0
+            # Ожидаемая сумма меняется на разницу вкладов записанных ячеек
+            with self._lock:
+                delta = 0
+                for (row_num, column), (problem_id, value) in cells.items():
+                    old = self._sheet_values.get(problem_id)
+                    if old is None:
+                        # Прежнее значение неизвестно - сумма будет принята из таблицы
+                        self._checksum = None
+                        continue
+                    likes, status = old
+                    self._sheet_values[problem_id] = (value, status) if column == COL_LIKES else (likes, value)
+                    delta += cell_checksum(row_num, column, value) - cell_checksum(row_num, column, old[column - COL_LIKES])
+                self._add_checksum(delta)
+        self.outbox.ack(updated)
+        
+        logger.info(f"Из очереди записано операций: {len(entries)}")
+        return len(entries)
+
+
+class AsyncGoogleSheetsService:
+    """
+    Асинхронная обертка над GoogleSheetsService
+    
+    Изменения сохраняются в локальную очередь и сразу возвращают результат,
+    фоновая задача записывает очередь в таблицу пакетами с повторами.
+    Блокирующие вызовы gspread выполняются в ограниченном пуле потоков,
+    поэтому медленный ответ Google не останавливает цикл событий aiogram.
+    """
+    
+    def __init__(self, service: GoogleSheetsService, max_workers: int = 4,
+                 likes_flush_interval: float = 5.0, likes_flush_threshold: int = 50,
+                 outbox_batch_size: int = 100, outbox_max_backoff: float = 60.0,
+                 outbox_linger: float = 0.2, outbox_retry_interval: float = 1.0):
+        """
+        Инициализация асинхронного сервиса
+        
+        Args:
+            service: Синхронный сервис Google Sheets
+            max_workers: Максимальное количество одновременных запросов к API
+            likes_flush_interval: Период записи накопленных лайков (секунды)
+            likes_flush_threshold: Количество измененных проблем для досрочной записи
+            outbox_batch_size: Максимальное количество операций в одной записи в таблицу
+            outbox_max_backoff: Максимальная пауза между повторами при ошибках API (секунды)
+            outbox_linger: Время накопления изменений перед записью (секунды)
+            outbox_retry_interval: Период повтора записи лайков, отложенных из-за квоты (секунды)
+        """
+        self.service = service
+        self.likes_flush_interval = likes_flush_interval
+        self.likes_flush_threshold = likes_flush_threshold
+        self.outbox_batch_size = outbox_batch_size
+        self.outbox_max_backoff = outbox_max_backoff
+        self.outbox_linger = outbox_linger
+        self.outbox_retry_interval = outbox_retry_interval
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="sheets"
+        )
+        self._outbox_event = asyncio.Event()
+        # Изменения с момента последней записи; полная порция записывается без ожидания
+        self._unflushed = 0
+        self._batch_ready = asyncio.Event()
+        self._refresh_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._outbox_task: Optional[asyncio.Task] = None
+        self._connect_task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    async def create(cls, credentials_path: str, sheet_id: str,
+                     id_state_path: Optional[str] = None,
+                     outbox_path: str = ':memory:',
+                     cache_ttl: float = 60.0,
+                     full_sync_interval: float = 900.0,
+                     snapshot_store=None,
+                     quota: Optional[SheetsQuota] = None,
+                     **kwargs) -> "AsyncGoogleSheetsService":
+        """
+        Создание сервиса без блокировки цикла событий
+        
+        При наличии снимка сервис создается без обращений к Google,
+        подключение выполняется в фоне после start().
+        
+        Args:
+            credentials_path: Путь к JSON файлу с учетными данными
+            sheet_id: ID Google Sheets таблицы
+            id_state_path: Путь к файлу с последним выданным ID
+            outbox_path: Путь к файлу очереди изменений
+            cache_ttl: Время жизни локальной копии таблицы в секундах
+            full_sync_interval: Период полной перезагрузки таблицы в секундах
+            snapshot_store: Хранилище снимков индекса
+            quota: Квоты Google Sheets API
+            **kwargs: Параметры AsyncGoogleSheetsService
+        """
+        loop = asyncio.get_running_loop()
+        service = await loop.run_in_executor(
+            None, functools.partial(
+                GoogleSheetsService, credentials_path, sheet_id,
+                id_state_path, outbox_path, cache_ttl,
+                full_sync_interval=full_sync_interval,
+                snapshot_store=snapshot_store,
+                quota=quota
+            )
+        )
+        return cls(service, **kwargs)
+    
+    async def _run(self, func, *args):
+        """Выполнение блокирующего метода в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    def _notify_outbox(self, count: int = 1):
+        """Сигнал фоновой задаче о новых операциях в очереди"""
+        self._unflushed += count
+        if self._unflushed >= self.outbox_batch_size:
+            self._batch_ready.set()
+        self._outbox_event.set()
+    
+    # Изменения записываются в локальную очередь и не ждут ответа Google
+    
+    async def add_problem(self, problem_text: str, problem_id: Optional[int] = None,
+                          created_at: Optional[str] = None) -> int:
+        """Добавление новой проблемы в таблицу"""
+        problem_id = self.service.add_problem(problem_text, problem_id, created_at)
+        self._notify_outbox()
+        return problem_id
+    
+    async def update_status(self, problem_id: int, status: str) -> bool:
+        """Обновление статуса проблемы"""
+        success = self.service.update_status(problem_id, status)
+        self._notify_outbox()
+        return success
+    
+    async def update_statuses(self, problem_ids: List[int], status: str) -> List[int]:
+        """Обновление статуса нескольких проблем"""
+        updated = self.service.update_statuses(problem_ids, status)
+        self._notify_outbox(len(updated))
+        return updated
+    
+    async def update_likes(self, problem_id: int, new_likes_count: int) -> bool:
+        """Обновление количества лайков"""
+        success = self.service.update_likes(problem_id, new_likes_count)
+        self._notify_outbox()
+        return success
+    
+    # Чтение выполняется из локального индекса; таблица перечитывается
+    # только после истечения TTL
+    
+    async def refresh(self, force: bool = False):
+        """
+        Обновление локальной копии таблицы
+        
+        Args:
+            force: Загрузить всю таблицу, даже если TTL еще не истек
+        """
+        # Обновление уже идет - читатели не ждут его и работают со старой копией
+        if self._refresh_lock.locked() and not force:
+            return
+        async with self._refresh_lock:
+            if force or self.service.is_stale:
+                await self._run(self.service.refresh, force)
+    
+    async def get_problem_by_id(self, problem_id: int) -> Optional[Dict[str, Any]]:
+        """Получение информации о проблеме по ID"""
+        await self.refresh()
+        return self.service.get_problem_by_id(problem_id)
+    
+    async def get_pending_problems(self) -> list:
+        """Получение всех проблем в ожидании модерации"""
+        await self.refresh()
+        return self.service.get_pending_problems()
+    
+    async def get_all_records(self) -> List[Dict[str, Any]]:
+        """Получение всех записей из индекса"""
+        await self.refresh()
+        return self.service.get_all_records()
+    
+    async def get_pending_page(self, after_id: int = 0, before_id: Optional[int] = None,
+                               limit: int = 10) -> Dict[str, Any]:
+        """Страница проблем в ожидании модерации"""
+        await self.refresh()
+        return self.service.get_pending_page(after_id, before_id, limit)
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Получение статистики по индексу"""
+        await self.refresh()
+        return self.service.get_stats()
+    
+    async def set_likes(self, problem_id: int, likes_count: int) -> bool:
+        """Установка количества лайков с отложенной записью в таблицу"""
+        success = self.service.set_likes(problem_id, likes_count)
+        
+        if success and self.service.pending_likes >= self.likes_flush_threshold:
+            await self.flush_likes()
+        
+        return success
+    
+    async def increment_likes(self, problem_id: int) -> Optional[int]:
+        """
+        Добавление лайка с отложенной записью в таблицу
+        
+        Args:
+            problem_id: ID проблемы
+        
+        Returns:
+            Новое количество лайков или None, если проблема не найдена
+        """
+        new_likes = self.service.increment_likes(problem_id)
+        
+        # Досрочная запись, если накопилось много изменений
+        if new_likes is not None and self.service.pending_likes >= self.likes_flush_threshold:
+            await self.flush_likes()
+        
+        return new_likes
+    
+    async def flush_likes(self) -> int:
+        """Передача накопленных лайков в очередь изменений"""
+        flushed = self.service.flush_likes()
+        if flushed:
+            self._notify_outbox(flushed)
+        return flushed
+    
+    async def _flush_loop(self):
+        """Периодическая передача накопленных лайков в очередь"""
+        while True:
+            await asyncio.sleep(self.likes_flush_interval)
+            await self.flush_likes()
+    
+    async def _outbox_loop(self):
+        """Фоновая запись очереди изменений в таблицу с повторами при ошибках"""
+        backoff = 1.0
+        while True:
+            self._unflushed = 0
+            self._batch_ready.clear()
+            try:
+                processed = await self._run(self.service.drain_outbox, self.outbox_batch_size)
+                backoff = 1.0
+            except Exception as e:
+                logger.error(f"Ошибка при записи очереди в Google Sheets, повтор через {backoff:.0f} с: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.outbox_max_backoff)
+                continue
+            
+            if processed >= self.outbox_batch_size:
+                # В очереди еще есть изменения - продолжаем без паузы
+                continue
+            
+            if processed == 0:
+                self._outbox_event.clear()
+                if len(self.service.outbox):
+                    # Лайки отложены из-за квоты - повторим позже или при новых изменениях
+                    try:
+                        await asyncio.wait_for(self._outbox_event.wait(), self.outbox_retry_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                # Очередь пуста - ждем новых изменений
+                await self._outbox_event.wait()
+            
+            # Собираем одновременные изменения (например, всплеск новых проблем)
+            # в один append_rows; полная порция записывается сразу
+            if self.outbox_linger > 0:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.outbox_linger)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def _connect(self):
+        """Фоновое подключение к таблице после запуска из снимка"""
+        try:
+            await self._run(self.service.connect)
         except Exception as e:
-            logger.error(f"Ошибка при получении ожидающих проблем: {e}")
-            return []
+            # Подключение повторится при записи очереди или обновлении индекса
+            logger.error(f"Не удалось подключиться к Google Sheets в фоне: {e}")
+    
+    def start(self):
+        """Запуск фонового подключения, записи лайков и очереди изменений"""
+        if self._connect_task is None and not self.service.is_connected:
+            self._connect_task = asyncio.create_task(self._connect())
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if self._outbox_task is None:
+            self._outbox_task = asyncio.create_task(self._outbox_loop())
+    
+    async def close(self):
+        """Запись оставшихся изменений и остановка пула потоков"""
+        # Остановка не ждет квоту: недописанная очередь запишется при следующем запуске
+        self.service.quota.close()
+        for task in (self._connect_task, self._flush_task, self._outbox_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._connect_task = None
+        self._flush_task = None
+        self._outbox_task = None
+        
+        await self.flush_likes()
+        
+        # Последняя попытка записать очередь; при ошибке она сохранится до следующего запуска
+        try:
+            while await self._run(self.service.drain_outbox, self.outbox_batch_size):
+                pass
+        except QuotaDeferred:
+            logger.info(f"Квота записи Google Sheets исчерпана, в очереди осталось {len(self.service.outbox)} изменений")
+        except Exception as e:
+            logger.error(f"Не удалось записать очередь перед остановкой: {e}")
+        
+        try:
+            await self._run(self.service.save_snapshot)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить снимок индекса: {e}")
+        
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+        self.service.outbox.close()
@@ -0,0 +1,118 @@
+"""
+Локальный генератор ID проблем
+Выдает монотонно возрастающие ID без чтения таблицы на каждую заявку
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IdAllocator:
+    """
+    Потокобезопасный генератор монотонных ID с сохранением на диск
+    
+    На диск записывается не каждый выданный ID, а граница зарезервированного
+    блока из block_size ID: запись нужна раз на блок. После перезапуска выдача
+    продолжается со следующего блока, поэтому неиспользованные ID блока
+    пропускаются, но не повторяются.
+    """
+    
+    def __init__(self, state_path: Optional[str] = None, seed: int = 0, block_size: int = 100):
+        """
+        Инициализация генератора
+        
+        Args:
+            state_path: Путь к файлу с границей зарезервированных ID (None - только в памяти)
+            seed: Максимальный ID, уже существующий в таблице
+            block_size: Количество ID, резервируемых одной записью на диск
+        """
+        self.state_path = state_path
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._last_id = max(seed, self._load())
+        self._reserved = self._last_id
+        logger.info(f"Генератор ID инициализирован, последний ID: {self._last_id}")
+    
+    @property
+    def last_id(self) -> int:
+        """Последний выданный ID"""
+        with self._lock:
+            return self._last_id
+    
+    def _load(self) -> int:
+        """Чтение сохраненной границы зарезервированных ID"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return 0
+        
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            # last_id - формат без резервирования блоков
+            return int(state.get('reserved', state.get('last_id', 0)))
+        except Exception as e:
+            logger.error(f"Ошибка при чтении состояния генератора ID: {e}")
+            return 0
+    
+    def _save(self, reserved: int):
+        """
+        Атомарная запись границы зарезервированных ID на диск
+        
+        Временный файл сбрасывается на диск до переименования, а каталог - после,
+        поэтому после сбоя питания в файле остается старая или новая граница,
+        но не обрезанные данные.
+        """
+        if not self.state_path:
+            return
+        
+        directory = os.path.dirname(self.state_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'reserved': reserved}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+        
+        # Переименование сохраняется на диске вместе с записью каталога
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def allocate(self) -> int:
+        """
+        Выдача следующего ID
+        
+        Returns:
+            Новый уникальный ID
+        """
+        with self._lock:
+            next_id = self._last_id + 1
+            # Новый блок сохраняется до выдачи, чтобы после перезапуска ID не повторился
+            if next_id > self._reserved:
+                reserved = next_id + self.block_size - 1
+                self._save(reserved)
+                self._reserved = reserved
+            self._last_id = next_id
+            return next_id
+    
+    def observe(self, problem_id: int):
+        """
+        Учет ID, появившегося в таблице в обход генератора
+        
+        Args:
+            problem_id: ID существующей проблемы
+        """
+        with self._lock:
+            if problem_id > self._reserved:
+                self._save(problem_id)
+                self._reserved = problem_id
+            self._last_id = max(self._last_id, problem_id)
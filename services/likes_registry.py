@@ -0,0 +1,187 @@
+"""
+Учет пользователей, поставивших лайк
+Повторное нажатие на кнопку определяется по памяти без запросов к хранилищу
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict
+
+from services.storage import ProblemStorage
+
+logger = logging.getLogger(__name__)
+
+
+class LikesRegistry:
+    """
+    Множества пользователей, поставивших лайк, по проблемам
+    
+    В памяти для каждой проблемы хранится отсортированный массив ID
+    пользователей (8 байт на лайк), на диске - таблица SQLite.
+    Массив проблемы загружается с диска при первом обращении. С общим
+    файлом (shared) запросы выполняются в потоках, чтобы ожидание
+    блокировки записи другого процесса не останавливало цикл событий.
+    """
+    
+    def __init__(self, path: str, shared: bool = False):
+        """
+        Инициализация реестра
+        
+        Args:
+            path: Путь к файлу SQLite (":memory:" - реестр только в памяти)
+            shared: С файлом одновременно работают другие процессы
+        """
+        self.path = path
+        self.shared = shared
+        if path != ':memory:':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._likers: Dict[int, array] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS likes ('
+            'problem_id INTEGER NOT NULL, '
+            'user_id INTEGER NOT NULL, '
+            'PRIMARY KEY (problem_id, user_id)) WITHOUT ROWID'
+        )
+        self._conn.commit()
+    
+    def _get_likers(self, problem_id: int) -> array:
+        """Отсортированные ID пользователей проблемы, вызывается под блокировкой"""
+        likers = self._likers.get(problem_id)
+        if likers is None:
+            rows = self._conn.execute(
+                'SELECT user_id FROM likes WHERE problem_id = ? ORDER BY user_id',
+                (problem_id,)
+            ).fetchall()
+            likers = array('q', (user_id for user_id, in rows))
+            self._likers[problem_id] = likers
+        return likers
+    
+    async def _run(self, func, *args):
+        """Вызов запроса к базе: в потоке для общего файла, сразу - для файла одного процесса"""
+        if self.shared:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+    
+    async def has_liked(self, problem_id: int, user_id: int) -> bool:
+        """
+        Ставил ли пользователь лайк проблеме
+        
+        Args:
+            problem_id: ID проблемы
+            user_id: ID пользователя Telegram
+        """
+        return await self._run(self._has_liked, problem_id, user_id)
+    
+    def _has_liked(self, problem_id: int, user_id: int) -> bool:
+        """Проверка лайка по массиву проблемы"""
+        with self._lock:
+            likers = self._get_likers(problem_id)
+            index = bisect.bisect_left(likers, user_id)
+            return index < len(likers) and likers[index] == user_id
+    
+    async def add(self, problem_id: int, user_id: int) -> bool:
+        """
+        Регистрация лайка пользователя
+        
+        Args:
+            problem_id: ID проблемы
+            user_id: ID пользователя Telegram
+        
+        Returns:
+            True если лайк новый, False если пользователь уже ставил лайк
+        """
+        return await self._run(self._add, problem_id, user_id)
+    
+    def _add(self, problem_id: int, user_id: int) -> bool:
+        """Запись лайка в массив и в базу"""
+        with self._lock:
+            likers = self._get_likers(problem_id)
+            index = bisect.bisect_left(likers, user_id)
+            if index < len(likers) and likers[index] == user_id:
+                return False
+            
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO likes (problem_id, user_id) VALUES (?, ?)',
+                (problem_id, user_id)
+            )
+            self._conn.commit()
+            likers.insert(index, user_id)
+            # Запись уже есть: лайк поставлен через другой процесс с той же базой
+            return cursor.rowcount > 0
+    
+    async def remove(self, problem_id: int, user_id: int):
+        """
+        Отмена регистрации лайка (если лайк не удалось сохранить)
+        
+        Args:
+            problem_id: ID проблемы
+            user_id: ID пользователя Telegram
+        """
+        await self._run(self._remove, problem_id, user_id)
+    
+    def _remove(self, problem_id: int, user_id: int):
+        """Удаление лайка из массива и из базы"""
+        with self._lock:
+            likers = self._get_likers(problem_id)
+            index = bisect.bisect_left(likers, user_id)
+            if index < len(likers) and likers[index] == user_id:
+                del likers[index]
+            
+            self._conn.execute(
+                'DELETE FROM likes WHERE problem_id = ? AND user_id = ?',
+                (problem_id, user_id)
+            )
+            self._conn.commit()
+    
+    def _counts(self) -> Dict[int, int]:
+        """Количество зарегистрированных лайков по проблемам"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT problem_id, COUNT(*) FROM likes GROUP BY problem_id'
+            ).fetchall()
+        return dict(rows)
+    
+    async def restore_counts(self, storage: ProblemStorage) -> int:
+        """
+        Восстановление лайков, потерянных между реестром и хранилищем
+        
+        Лайк записывается в реестр до увеличения счетчика в хранилище, а
+        хранилище Google Sheets передает счетчик в очередь изменений не сразу.
+        Сбой между этими шагами оставляет лайк в реестре без учета в счетчике,
+        поэтому счетчик проблемы, меньший числа лайков в реестре, поднимается
+        до этого числа. Вызывается до приема обновлений: лайк, находящийся
+        в обработке, был бы учтен дважды.
+        
+        Args:
+            storage: Хранилище проблем
+        
+        Returns:
+            Количество восстановленных лайков
+        """
+        restored = 0
+        for problem_id, count in (await self._run(self._counts)).items():
+            problem = await storage.get_problem_by_id(problem_id)
+            if problem is None:
+                continue
+            likes = int(problem.get('Лайки') or 0)
+            if likes < count and await storage.update_likes(problem_id, count):
+                logger.warning(f"Восстановлены лайки проблемы {problem_id}: {likes} -> {count}")
+                restored += count - likes
+        return restored
+    
+    def close(self):
+        """Закрытие соединения с базой"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,109 @@
+"""
+Планировщик редактирования сообщений в канале
+Объединяет частые обновления одного сообщения в одно редактирование
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Set, Tuple
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MessageKey = Tuple[int, int]
+
+
+class MessageEditScheduler:
+    """
+    Отложенное редактирование сообщений
+    
+    Для каждого сообщения хранится только последняя версия текста.
+    Первое изменение отправляется сразу, следующие - не чаще одного раза
+    в min_interval секунд, общее количество редактирований ограничено global_rate.
+    """
+    
+    def __init__(self, bot, min_interval: float = 3.0, global_rate: float = 20.0):
+        """
+        Инициализация планировщика
+        
+        Args:
+            bot: Экземпляр бота
+            min_interval: Минимальный интервал между редактированиями одного сообщения (секунды)
+            global_rate: Максимальное количество редактирований в секунду для всех сообщений
+        """
+        self.bot = bot
+        self.min_interval = min_interval
+        self._limiter = TokenBucket(global_rate)
+        self._pending: Dict[MessageKey, Dict[str, Any]] = {}
+        self._tasks: Dict[MessageKey, asyncio.Task] = {}
+    
+    def schedule(self, chat_id: int, message_id: int, text: str, **kwargs):
+        """
+        Постановка редактирования сообщения в очередь
+        
+        Args:
+            chat_id: ID чата
+            message_id: ID сообщения
+            text: Новый текст сообщения
+            **kwargs: Дополнительные параметры edit_message_text (reply_markup, parse_mode)
+        """
+        key = (chat_id, message_id)
+        # Более новая версия заменяет еще не отправленную
+        self._pending[key] = dict(text=text, **kwargs)
+        
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+    
+    async def _run(self, key: MessageKey):
+        """Отправка последней версии сообщения с соблюдением интервала"""
+        try:
+            while key in self._pending:
+                await self._limiter.acquire()
+                params = self._pending.pop(key)
+                await self._edit(key, params)
+                await asyncio.sleep(self.min_interval)
+        finally:
+            self._tasks.pop(key, None)
+    
+    async def _edit(self, key: MessageKey, params: Dict[str, Any]):
+        """Редактирование сообщения через Bot API"""
+        chat_id, message_id = key
+        try:
+            await self.bot.edit_message_text(chat_id=chat_id, message_id=message_id, **params)
+            logger.info(f"Сообщение {message_id} в чате {chat_id} обновлено")
+        
+        except TelegramRetryAfter as e:
+            # Повторяем после паузы, если за это время не появилась более новая версия
+            logger.warning(f"Превышен лимит редактирования, повтор через {e.retry_after} с")
+            self._pending.setdefault(key, params)
+            await asyncio.sleep(e.retry_after)
+        
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.error(f"Ошибка при редактировании сообщения {message_id}: {e}")
+        
+        except Exception as e:
+            logger.error(f"Ошибка при редактировании сообщения {message_id}: {e}")
+    
+    async def close(self, timeout: float = 10.0):
+        """
+        Ожидание отправки запланированных редактирований
+        
+        При лимите 20 сообщений в минуту на канал очередь редактирований
+        может разбираться минутами, поэтому ожидание ограничено timeout
+        секундами. Неотправленные версии теряются: следующий лайк снова
+        обновит сообщение, а число лайков сохранено в хранилище.
+        """
+        tasks: Set[asyncio.Task] = set(self._tasks.values())
+        if not tasks:
+            return
+        
+        _, running = await asyncio.wait(tasks, timeout=timeout)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if running:
+            logger.info(f"Не отправлено редактирований при остановке: {len(running)}")
@@ -0,0 +1,256 @@
+"""
+Метрики производительности бота
+Счетчики и гистограммы задержек в формате Prometheus без внешних зависимостей
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Границы корзин гистограмм задержек (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Метки в формате Prometheus: {name="value",...}"""
+    pairs = [
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        )
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """Число в формате Prometheus"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Семейство метрик с одинаковым именем и набором меток"""
+    
+    kind = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[LabelValues, object] = {}
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def labels(self, *values: str, **kwargs: str):
+        """
+        Метрика с конкретными значениями меток
+        
+        Args:
+            *values: Значения меток по порядку labelnames
+            **kwargs: Значения меток по именам
+        """
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+    
+    def items(self) -> List[Tuple[LabelValues, object]]:
+        """Все значения меток и соответствующие метрики"""
+        with self._lock:
+            return sorted(self._children.items())
+
+
+class _CounterValue:
+    """Значение счетчика для одного набора меток"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1.0):
+        """Увеличение счетчика"""
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+    
+    kind = 'counter'
+    
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+    
+    def render(self) -> List[str]:
+        """Строки метрики в формате Prometheus"""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self.items()
+        ]
+
+
+class _HistogramValue:
+    """Гистограмма для одного набора меток"""
+    
+    def __init__(self, buckets: Sequence[float]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        """Учет одного измерения"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Замер длительности блока кода"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+    
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        """Согласованная копия корзин, количества и суммы"""
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+    
+    def quantile(self, q: float) -> float:
+        """
+        Оценка квантиля по корзинам (верхняя граница корзины)
+        
+        Args:
+            q: Квантиль от 0 до 1
+        """
+        counts, total, _ = self.snapshot()
+        if total == 0:
+            return 0.0
+        
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class Histogram(_Metric):
+    """Гистограмма распределения значений (обычно задержек)"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+    
+    def render(self) -> List[str]:
+        """Строки метрики в формате Prometheus"""
+        lines = []
+        for values, child in self.items():
+            counts, total, amount = child.snapshot()
+            
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(amount)}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Краткая сводка по каждому набору меток
+        
+        Returns:
+            Список словарей с ключами labels, count, avg, p50 и p95,
+            отсортированный по убыванию суммарного времени
+        """
+        rows = []
+        for values, child in self.items():
+            _, total, amount = child.snapshot()
+            rows.append({
+                'labels': dict(zip(self.labelnames, values)),
+                'count': total,
+                'sum': amount,
+                'avg': amount / total if total else 0.0,
+                'p50': child.quantile(0.5),
+                'p95': child.quantile(0.95)
+            })
+        rows.sort(key=lambda row: row['sum'], reverse=True)
+        return rows
+
+
+class MetricsRegistry:
+    """Набор метрик процесса"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        """Регистрация метрики; повторная регистрация возвращает существующую"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Создание счетчика"""
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Создание гистограммы"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def get(self, name: str) -> Optional[_Metric]:
+        """Метрика по имени"""
+        with self._lock:
+            return self._metrics.get(name)
+    
+    def render(self) -> str:
+        """
+        Все метрики в текстовом формате Prometheus
+        
+        Returns:
+            Текст для ответа на запрос /metrics
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Общий набор метрик процесса
+registry = MetricsRegistry()
@@ -0,0 +1,126 @@
+"""
+Локальная очередь изменений для Google Sheets
+Изменения сохраняются в SQLite и записываются в таблицу фоновым процессом
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+OutboxEntry = Tuple[int, str, Dict[str, Any]]
+
+
+class Outbox:
+    """Персистентная FIFO-очередь операций над таблицей"""
+    
+    def __init__(self, path: str):
+        """
+        Инициализация очереди
+        
+        Args:
+            path: Путь к файлу SQLite (":memory:" - очередь только в памяти)
+        """
+        self.path = path
+        if path != ':memory:':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'op TEXT NOT NULL, '
+            'payload TEXT NOT NULL, '
+            'created_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+    
+    def put(self, op: str, payload: Dict[str, Any]):
+        """
+        Добавление операции в очередь
+        
+        Args:
+            op: Тип операции (например, "append", "status", "likes")
+            payload: Параметры операции
+        """
+        self.put_many([(op, payload)])
+    
+    def put_many(self, operations: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Добавление нескольких операций одной транзакцией
+        
+        Args:
+            operations: Пары (тип операции, параметры)
+        """
+        now = time.time()
+        rows = [
+            (op, json.dumps(payload, ensure_ascii=False), now)
+            for op, payload in operations
+        ]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO outbox (op, payload, created_at) VALUES (?, ?, ?)', rows
+            )
+            self._conn.commit()
+    
+    def peek(self, limit: int = -1, deferred_ops: Sequence[str] = (),
+             ops: Sequence[str] = ()) -> List[OutboxEntry]:
+        """
+        Получение самых старых операций без удаления
+        
+        Args:
+            limit: Максимальное количество операций (-1 - все)
+            deferred_ops: Типы операций, выбираемых после всех остальных
+                (порядок внутри каждой группы сохраняется)
+            ops: Выбирать только операции этих типов (пусто - все)
+        
+        Returns:
+            Список (ID записи, тип операции, параметры)
+        """
+        where = ''
+        if ops:
+            where = f"WHERE op IN ({', '.join('?' * len(ops))}) "
+        order = 'id'
+        if deferred_ops:
+            order = f"op IN ({', '.join('?' * len(deferred_ops))}), id"
+        with self._lock:
+            cursor = self._conn.execute(
+                f'SELECT id, op, payload FROM outbox {where}ORDER BY {order} LIMIT ?',
+                (*ops, *deferred_ops, limit)
+            )
+            rows = cursor.fetchall()
+        return [(entry_id, op, json.loads(payload)) for entry_id, op, payload in rows]
+    
+    def ack(self, entry_ids: Iterable[int]):
+        """
+        Удаление записанных в таблицу операций
+        
+        Args:
+            entry_ids: ID записей очереди
+        """
+        ids = [(entry_id,) for entry_id in entry_ids]
+        if not ids:
+            return
+        
+        with self._lock:
+            self._conn.executemany('DELETE FROM outbox WHERE id = ?', ids)
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+    
+    def close(self):
+        """Закрытие соединения с базой"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,48 @@
+"""
+Ограничители частоты запросов
+Используются для соблюдения лимитов Telegram Bot API
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Асинхронный алгоритм «ведро токенов»"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Инициализация ограничителя
+        
+        Args:
+            rate: Количество токенов, добавляемых в секунду
+            capacity: Максимальное количество накопленных токенов (по умолчанию rate)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        """Пополнение токенов за прошедшее время"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    @property
+    def is_full(self) -> bool:
+        """Накоплен ли максимум токенов (ведро давно не использовалось)"""
+        self._refill()
+        return self._tokens >= self.capacity
+    
+    async def acquire(self):
+        """Ожидание и получение одного токена"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,164 @@
+"""
+Очередь исходящих запросов к Telegram Bot API
+Все отправки и редактирования сообщений проходят через общие ограничители частоты
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Union
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from services.metrics import registry
+from services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_LATENCY = registry.histogram(
+    'telegram_request_seconds', 'Длительность запросов к Telegram Bot API', ('method',)
+)
+TELEGRAM_QUEUE_WAIT = registry.histogram(
+    'telegram_queue_wait_seconds', 'Ожидание запроса в очереди по лимитам Telegram'
+)
+TELEGRAM_RETRIES = registry.counter(
+    'telegram_retry_after_total', 'Ответы RetryAfter от Telegram', ('method',)
+)
+
+ChatId = Union[int, str]
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, выравнивающий исходящие сообщения по лимитам Telegram
+    
+    Запросы с chat_id (send_message, edit_message_text, message.answer и т.д.)
+    ждут токен в ведре своего чата и в общем ведре. Ответ 429 (RetryAfter)
+    приостанавливает все отправки на указанное время, после чего запрос
+    повторяется, поэтому всплеск публикаций разбирается с максимально
+    допустимой скоростью и ничего не теряется.
+    """
+    
+    def __init__(self, global_rate: float = 30.0, group_rate: float = 20 / 60,
+                 private_rate: float = 1.0, max_retries: int = 5):
+        """
+        Инициализация очереди
+        
+        Args:
+            global_rate: Максимальное количество сообщений в секунду для всех чатов
+            group_rate: Максимальное количество сообщений в секунду в одну группу или канал
+            private_rate: Максимальное количество сообщений в секунду в личный чат
+            max_retries: Количество повторов после ответа RetryAfter
+        """
+        self.group_rate = group_rate
+        self.private_rate = private_rate
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate)
+        self._chats: Dict[ChatId, TokenBucket] = {}
+        self._depth: Dict[ChatId, int] = {}
+        self._resume = asyncio.Event()
+        self._resume.set()
+        
+        # Метрики очереди
+        self.queued = 0
+        self.max_queued = 0
+        self.sent = 0
+        self.retries = 0
+    
+    def _bucket(self, chat_id: ChatId) -> TokenBucket:
+        """Ведро токенов чата"""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Отрицательные ID и @username - группы и каналы
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(self.private_rate if is_private else self.group_rate)
+            self._chats[chat_id] = bucket
+        return bucket
+    
+    def _release(self, chat_id: ChatId):
+        """Уменьшение глубины очереди чата и удаление неиспользуемых ведер"""
+        self.queued -= 1
+        self._depth[chat_id] -= 1
+        if self._depth[chat_id] == 0:
+            del self._depth[chat_id]
+            # Полное ведро ничем не отличается от нового; запрос, отмененный
+            # во время паузы, ведро еще не создал
+            bucket = self._chats.get(chat_id)
+            if bucket is not None and bucket.is_full:
+                del self._chats[chat_id]
+    
+    async def _pause(self, retry_after: float):
+        """Остановка всех отправок на время, указанное Telegram"""
+        if not self._resume.is_set():
+            await self._resume.wait()
+            return
+        self._resume.clear()
+        try:
+            await asyncio.sleep(retry_after)
+        finally:
+            self._resume.set()
+    
+    @staticmethod
+    async def _request(make_request, bot, method):
+        """Запрос к Bot API с замером длительности"""
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            TELEGRAM_LATENCY.labels(type(method).__name__).observe(time.perf_counter() - started)
+    
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            # Ответы на callback и служебные запросы не ограничиваются
+            return await self._request(make_request, bot, method)
+        
+        # ID из переменных окружения приходят строками
+        if isinstance(chat_id, str) and chat_id.lstrip('-').isdigit():
+            chat_id = int(chat_id)
+        
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        self._depth[chat_id] = self._depth.get(chat_id, 0) + 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                # Во время паузы после RetryAfter новые запросы не отправляются
+                started = time.perf_counter()
+                await self._resume.wait()
+                await self._bucket(chat_id).acquire()
+                await self._global.acquire()
+                await self._resume.wait()
+                TELEGRAM_QUEUE_WAIT.labels().observe(time.perf_counter() - started)
+                try:
+                    response = await self._request(make_request, bot, method)
+                    self.sent += 1
+                    return response
+                except TelegramRetryAfter as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    TELEGRAM_RETRIES.labels(type(method).__name__).inc()
+                    logger.warning(
+                        f"Превышен лимит Telegram ({type(method).__name__} в чат {chat_id}), "
+                        f"повтор через {e.retry_after} с, в очереди {self.queued}"
+                    )
+                    await self._pause(e.retry_after)
+        finally:
+            self._release(chat_id)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Текущее состояние очереди
+        
+        Returns:
+            Словарь с ключами queued, max_queued, sent, retries и chats
+            (глубина очереди по чатам)
+        """
+        return {
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'sent': self.sent,
+            'retries': self.retries,
+            'chats': dict(self._depth)
+        }
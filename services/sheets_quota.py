@@ -0,0 +1,312 @@
+"""
+Квоты Google Sheets API
+Запросы к таблице распределяются по минутным квотам чтения и записи
+с приоритетом новых проблем и модерации над лайками и статистикой
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Новые проблемы, модерация и подключение к таблице
+PRIORITY_HIGH = 0
+# Лайки и обновление локальной копии для статистики
+PRIORITY_LOW = 1
+
+PRIORITY_NAMES = {PRIORITY_HIGH: 'high', PRIORITY_LOW: 'low'}
+
+# Методы gspread, расходующие квоту записи; остальные - квоту чтения
+WRITE_METHODS = frozenset({
+    'update', 'batch_update', 'append_row', 'append_rows', 'insert_row', 'insert_rows',
+    'delete_rows', 'update_cell', 'update_cells', 'clear', 'batch_clear', 'format'
+})
+
+QUOTA_WAIT = registry.histogram(
+    'sheets_quota_wait_seconds', 'Ожидание квоты Google Sheets API', ('kind', 'priority')
+)
+QUOTA_DEFERRED = registry.counter(
+    'sheets_quota_deferred_total', 'Запросы с низким приоритетом, отложенные из-за квоты', ('kind',)
+)
+QUOTA_RATE_LIMITED = registry.counter(
+    'sheets_rate_limited_total', 'Ответы 429 от Google Sheets API', ('kind',)
+)
+
+
+class QuotaDeferred(Exception):
+    """Квоты не хватает для запроса с низким приоритетом - запрос нужно повторить позже"""
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Ответ 429 (превышена квота) от Google Sheets API"""
+    code = getattr(error, 'code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code == 429
+
+
+class _Window:
+    """Запросы одного вида за последнюю минуту и адаптивный лимит"""
+    
+    def __init__(self, limit: int):
+        self.configured = limit
+        self.limit = float(limit)
+        self.sent: Deque[float] = deque()
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.waiting = {PRIORITY_HIGH: 0, PRIORITY_LOW: 0}
+    
+    def remaining(self, now: float) -> float:
+        """Остаток квоты в текущем окне"""
+        while self.sent and self.sent[0] <= now - 60:
+            self.sent.popleft()
+        return self.limit - len(self.sent)
+    
+    def wait_time(self, now: float) -> float:
+        """Время до освобождения места в окне или окончания паузы после 429"""
+        pause = self.paused_until - now
+        if self.remaining(now) >= 1:
+            return max(pause, 0.0)
+        return max(pause, self.sent[0] + 60 - now, 0.01)
+
+
+class SheetsQuota:
+    """
+    Планировщик запросов к Google Sheets API по минутным квотам
+    
+    Запрос с высоким приоритетом ждет свободного места в окне, запросы с
+    низким приоритетом выполняются, только пока в окне остается резерв для
+    высокого приоритета, иначе сразу получают QuotaDeferred (после close()
+    не ждут и запросы с высоким приоритетом). Ответ 429
+    вдвое уменьшает лимит и приостанавливает запросы этого вида с
+    экспоненциально растущей паузой; успешные запросы постепенно
+    возвращают лимит к настроенному значению.
+    """
+    
+    def __init__(self, reads_per_minute: int = 0, writes_per_minute: int = 0,
+                 low_priority_reserve: float = 0.3, max_retries: int = 5,
+                 initial_backoff: float = 1.0, max_backoff: float = 64.0):
+        """
+        Инициализация планировщика
+        
+        Args:
+            reads_per_minute: Квота чтения в минуту (0 - без ограничения)
+            writes_per_minute: Квота записи в минуту (0 - без ограничения)
+            low_priority_reserve: Доля квоты, недоступная запросам с низким приоритетом
+            max_retries: Количество повторов запроса с высоким приоритетом после 429
+            initial_backoff: Первая пауза после 429 в секундах
+            max_backoff: Максимальная пауза после 429 в секундах
+        """
+        self.low_priority_reserve = low_priority_reserve
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._windows = {
+            'read': _Window(reads_per_minute),
+            'write': _Window(writes_per_minute)
+        }
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+    
+    @contextmanager
+    def priority(self, priority: int) -> Iterator[None]:
+        """
+        Приоритет запросов, выполняемых в текущем потоке внутри блока
+        
+        Args:
+            priority: PRIORITY_HIGH или PRIORITY_LOW
+        """
+        previous = getattr(self._local, 'priority', PRIORITY_HIGH)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+    
+    @property
+    def current_priority(self) -> int:
+        """Приоритет запросов текущего потока"""
+        return getattr(self._local, 'priority', PRIORITY_HIGH)
+    
+    def _reserve(self, window: _Window, priority: int) -> float:
+        """Часть окна, которую запрос не может занять"""
+        return window.limit * self.low_priority_reserve if priority == PRIORITY_LOW else 0.0
+    
+    def _acquire(self, kind: str, priority: int):
+        """Ожидание места в окне (высокий приоритет) или QuotaDeferred (низкий)"""
+        window = self._windows[kind]
+        started = time.monotonic()
+        
+        with self._condition:
+            window.waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if window.configured <= 0 and window.paused_until <= now:
+                        # Квота не ограничена, паузы после 429 нет
+                        break
+                    
+                    # Запросы с высоким приоритетом обслуживаются первыми
+                    blocked = priority == PRIORITY_LOW and window.waiting[PRIORITY_HIGH] > 0
+                    enough = (
+                        window.configured <= 0
+                        or window.remaining(now) - self._reserve(window, priority) >= 1
+                    )
+                    if window.paused_until <= now and enough and not blocked:
+                        break
+                    
+                    # После close() запросы не ждут квоту, чтобы не задерживать остановку
+                    if priority == PRIORITY_LOW or self._closed:
+                        QUOTA_DEFERRED.labels(kind).inc()
+                        raise QuotaDeferred(f"Квота {kind} Google Sheets исчерпана")
+                    
+                    self._condition.wait(window.wait_time(now) if window.configured > 0
+                                         else window.paused_until - now)
+                
+                if window.configured > 0:
+                    window.sent.append(time.monotonic())
+            finally:
+                window.waiting[priority] -= 1
+                self._condition.notify_all()
+        
+        QUOTA_WAIT.labels(kind, PRIORITY_NAMES[priority]).observe(time.monotonic() - started)
+    
+    def acquire_ahead(self, kind: str, count: int = 1):
+        """
+        Предварительное занятие квоты для следующих запросов текущего потока
+        
+        Позволяет дождаться квоты до взятия блокировок: запросы этого вида
+        в текущем потоке расходуют занятые места без ожидания. Неизрасходованные
+        места возвращаются release_ahead().
+        
+        Args:
+            kind: "read" или "write"
+            count: Количество запросов
+        """
+        ahead = getattr(self._local, 'ahead', None)
+        if ahead is None:
+            ahead = self._local.ahead = {}
+        priority = self.current_priority
+        for _ in range(count):
+            self._acquire(kind, priority)
+            ahead[kind] = ahead.get(kind, 0) + 1
+    
+    def release_ahead(self, kind: str):
+        """
+        Возврат мест, занятых acquire_ahead() и не израсходованных запросами
+        
+        Args:
+            kind: "read" или "write"
+        """
+        ahead = getattr(self._local, 'ahead', None)
+        count = ahead.pop(kind, 0) if ahead else 0
+        if not count:
+            return
+        
+        window = self._windows[kind]
+        with self._condition:
+            if window.configured > 0:
+                for _ in range(min(count, len(window.sent))):
+                    window.sent.pop()
+            self._condition.notify_all()
+    
+    def _take_ahead(self, kind: str) -> bool:
+        """Использование места, занятого acquire_ahead(), если оно есть"""
+        ahead = getattr(self._local, 'ahead', None)
+        if not ahead or not ahead.get(kind):
+            return False
+        ahead[kind] -= 1
+        return True
+    
+    def _on_success(self, kind: str):
+        """Постепенное восстановление лимита после успешного запроса"""
+        window = self._windows[kind]
+        with self._condition:
+            window.backoff = 0.0
+            if window.configured > 0 and window.limit < window.configured:
+                window.limit = min(window.configured, window.limit + 1)
+    
+    def _on_rate_limited(self, kind: str) -> float:
+        """
+        Реакция на ответ 429: уменьшение лимита и пауза запросов этого вида
+        
+        Returns:
+            Длительность паузы в секундах
+        """
+        QUOTA_RATE_LIMITED.labels(kind).inc()
+        window = self._windows[kind]
+        with self._condition:
+            window.backoff = min(self.max_backoff, max(self.initial_backoff, window.backoff * 2))
+            # Случайная добавка, чтобы повторы разных потоков не совпадали
+            pause = window.backoff + random.uniform(0, window.backoff / 2)
+            window.paused_until = max(window.paused_until, time.monotonic() + pause)
+            if window.configured > 0:
+                window.limit = max(1.0, window.limit / 2)
+            self._condition.notify_all()
+        
+        logger.warning(f"Google Sheets ответил 429 ({kind}), пауза {pause:.1f} с")
+        return pause
+    
+    def call(self, kind: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнение запроса к API с учетом квоты и приоритета текущего потока
+        
+        Запрос с высоким приоритетом после ответа 429 повторяется до
+        max_retries раз, с низким - не повторяется.
+        
+        Args:
+            kind: "read" или "write"
+            func: Функция, выполняющая запрос
+        
+        Returns:
+            Результат func
+        """
+        priority = self.current_priority
+        retries = self.max_retries if priority == PRIORITY_HIGH else 0
+        for attempt in range(retries + 1):
+            # Повтор после 429 снова ждет квоту
+            if attempt > 0 or not self._take_ahead(kind):
+                self._acquire(kind, priority)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                self._on_rate_limited(kind)
+                if attempt == retries:
+                    raise
+                continue
+            self._on_success(kind)
+            return result
+    
+    def close(self):
+        """Прекращение ожидания квоты: ждущие и новые запросы без квоты получают QuotaDeferred"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+    
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Текущее состояние квот
+        
+        Returns:
+            Для read и write: лимит, остаток в окне и оставшаяся пауза после 429
+        """
+        now = time.monotonic()
+        with self._condition:
+            return {
+                kind: {
+                    'limit': window.limit if window.configured > 0 else None,
+                    'remaining': window.remaining(now) if window.configured > 0 else None,
+                    'paused': max(0.0, window.paused_until - now)
+                }
+                for kind, window in self._windows.items()
+            }
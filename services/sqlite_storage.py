@@ -0,0 +1,547 @@
+"""
+Локальное хранилище проблем на SQLite
+Основное хранилище для быстрой работы; Google Sheets используется как зеркало
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.stats import STATUSES, StatsAggregator
+from services.storage import PROBLEM_FIELDS
+
+logger = logging.getLogger(__name__)
+
+_SELECT_PROBLEM = 'SELECT id, text, likes, status, created_at FROM problems'
+
+
+class SQLiteStorage:
+    """
+    Хранилище проблем в SQLite с необязательным зеркалом в Google Sheets
+    
+    В режиме нескольких процессов (shared) база общая: статистика читается
+    запросами к базе, а не из счетчиков процесса. Изменения для зеркала
+    при этом записываются в журнал той же транзакцией и переносятся в
+    Google Sheets одним процессом, к которому подключено зеркало. Запросы
+    к общей базе выполняются в потоках: пока другой процесс держит
+    блокировку записи, ожидание не останавливает цикл событий.
+    """
+    
+    def __init__(self, path: str, mirror=None, shared: bool = False,
+                 journal: bool = False, journal_interval: float = 1.0):
+        """
+        Инициализация хранилища
+        
+        Args:
+            path: Путь к файлу базы данных (":memory:" - база только в памяти)
+            mirror: Хранилище-зеркало (например, AsyncGoogleSheetsService) или None
+            shared: С базой одновременно работают другие процессы
+            journal: Передавать изменения в зеркало через журнал в базе
+            journal_interval: Период переноса журнала в зеркало в секундах
+        """
+        self.path = path
+        self.mirror = mirror
+        self.shared = shared
+        self.journal = journal
+        self.journal_interval = journal_interval
+        self._journal_task: Optional[asyncio.Task] = None
+        if path != ':memory:':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS problems ('
+            '    id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            '    text TEXT NOT NULL,'
+            '    likes INTEGER NOT NULL DEFAULT 0,'
+            '    status TEXT NOT NULL DEFAULT \'pending\','
+            '    created_at TEXT NOT NULL'
+            ');'
+            'CREATE INDEX IF NOT EXISTS idx_problems_status ON problems (status, likes);'
+            'CREATE INDEX IF NOT EXISTS idx_problems_status_id ON problems (status, id);'
+            'CREATE TABLE IF NOT EXISTS mirror_journal ('
+            '    seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            '    op TEXT NOT NULL,'
+            '    problem_id INTEGER NOT NULL'
+            ');'
+        )
+        self._conn.commit()
+        
+        # Статистика считается один раз при запуске и дальше обновляется инкрементально;
+        # общую базу изменяют другие процессы, поэтому счетчики процесса не используются
+        self.stats = StatsAggregator()
+        if not shared:
+            self._reset_stats()
+    
+    @staticmethod
+    def _to_record(row) -> Dict[str, Any]:
+        """Преобразование строки таблицы в запись с полями Google Sheets"""
+        return dict(zip(PROBLEM_FIELDS, row))
+    
+    def _reset_stats(self):
+        """Пересчет статистики по всей базе"""
+        with self._lock:
+            rows = self._conn.execute(_SELECT_PROBLEM).fetchall()
+        self.stats.reset(self._to_record(row) for row in rows)
+    
+    def _current(self, problem_id: int) -> Optional[tuple]:
+        """Текущие статус и лайки проблемы, вызывается под блокировкой"""
+        return self._conn.execute(
+            'SELECT status, likes FROM problems WHERE id = ?', (problem_id,)
+        ).fetchone()
+    
+    async def _run(self, func, *args):
+        """Вызов запроса к базе: в потоке для общей базы, сразу - для базы одного процесса"""
+        if self.shared:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+    
+    def _log_change(self, op: str, problem_id: int):
+        """Запись изменения в журнал зеркала, вызывается под блокировкой до commit"""
+        if self.journal:
+            self._conn.execute(
+                'INSERT INTO mirror_journal (op, problem_id) VALUES (?, ?)', (op, problem_id)
+            )
+    
+    def _query_stats(self) -> Dict[str, Any]:
+        """Счетчики статистики по всей базе (режим shared)"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT status, COUNT(*), SUM(likes) FROM problems GROUP BY status'
+            ).fetchall()
+        stats = {status: 0 for status in STATUSES}
+        stats['total'] = 0
+        stats['total_likes'] = 0
+        for status, count, likes in rows:
+            stats[status] = count
+            stats['total'] += count
+            if status == 'approved':
+                stats['total_likes'] = likes or 0
+        return stats
+    
+    def _query_top(self, limit: int) -> List[int]:
+        """ID одобренных проблем по убыванию лайков по индексу (status, likes)"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id FROM problems WHERE status = ? ORDER BY likes DESC, id LIMIT ?',
+                ('approved', limit)
+            ).fetchall()
+        return [problem_id for problem_id, in rows]
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM problems').fetchone()[0]
+    
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Загрузка существующих записей (например, из Google Sheets)
+        
+        Args:
+            records: Записи с полями PROBLEM_FIELDS
+        
+        Returns:
+            Количество загруженных записей
+        """
+        rows = [
+            (
+                record['ID'],
+                str(record.get('Текст проблемы', '')),
+                int(record.get('Лайки') or 0),
+                record.get('Статус') or 'pending',
+                str(record.get('Дата создания', ''))
+            )
+            for record in records
+            if isinstance(record.get('ID'), int)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO problems (id, text, likes, status, created_at) '
+                'VALUES (?, ?, ?, ?, ?)', rows
+            )
+            self._conn.commit()
+        self._reset_stats()
+        
+        logger.info(f"В SQLite загружено {len(rows)} записей")
+        return len(rows)
+    
+    async def _mirror(self, method: str, *args):
+        """Передача изменения в зеркало; в режиме журнала изменения переносит replay_journal"""
+        if self.mirror is None or self.journal:
+            return
+        await self._apply_mirror(method, *args)
+    
+    async def _apply_mirror(self, method: str, *args):
+        """Вызов метода зеркала; ошибки зеркала не влияют на основное хранилище"""
+        try:
+            await getattr(self.mirror, method)(*args)
+        except Exception as e:
+            logger.error(f"Ошибка при записи в зеркало ({method}): {e}")
+    
+    def _insert_problem(self, problem_text: str, current_date: str) -> int:
+        """Запись новой проблемы, возвращает ее ID"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO problems (text, likes, status, created_at) VALUES (?, 0, ?, ?)',
+                (problem_text, 'pending', current_date)
+            )
+            problem_id = cursor.lastrowid
+            self._log_change('add', problem_id)
+            self._conn.commit()
+            self.stats.update(problem_id, None, 0, 'pending', 0)
+        return problem_id
+    
+    async def add_problem(self, problem_text: str) -> int:
+        """
+        Добавление новой проблемы
+        
+        Args:
+            problem_text: Текст проблемы
+        
+        Returns:
+            ID созданной записи
+        """
+        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        problem_id = await self._run(self._insert_problem, problem_text, current_date)
+        
+        logger.info(f"Добавлена новая проблема с ID {problem_id}")
+        await self._mirror('add_problem', problem_text, problem_id, current_date)
+        return problem_id
+    
+    def _set_status(self, problem_id: int, status: str) -> bool:
+        """Смена статуса проблемы в ожидании модерации"""
+        with self._lock:
+            current = self._current(problem_id)
+            if current is None:
+                logger.warning(f"Проблема с ID {problem_id} не найдена")
+                return False
+            
+            cursor = self._conn.execute(
+                'UPDATE problems SET status = ? WHERE id = ? AND status = ?',
+                (status, problem_id, 'pending')
+            )
+            if cursor.rowcount != 1:
+                logger.info(f"Проблема {problem_id} уже прошла модерацию, статус не изменен")
+                return False
+            self._log_change('status', problem_id)
+            self._conn.commit()
+            self.stats.update(problem_id, current[0], current[1], status, current[1])
+        return True
+    
+    async def update_status(self, problem_id: int, status: str) -> bool:
+        """
+        Обновление статуса проблемы, ожидающей модерации
+        
+        Статус меняется условным UPDATE, поэтому из двух процессов,
+        одновременно модерирующих одну проблему, решение записывает один.
+        
+        Args:
+            problem_id: ID проблемы
+            status: Новый статус ("approved" или "rejected")
+        
+        Returns:
+            True если статус изменен; False если проблема не найдена или уже прошла модерацию
+        """
+        if not await self._run(self._set_status, problem_id, status):
+            return False
+        
+        logger.info(f"Статус проблемы {problem_id} обновлен на {status}")
+        await self._mirror('update_status', problem_id, status)
+        return True
+    
+    async def update_statuses(self, problem_ids: List[int], status: str) -> List[int]:
+        """
+        Обновление статуса нескольких проблем, ожидающих модерации, одной транзакцией
+        
+        Args:
+            problem_ids: ID проблем
+            status: Новый статус ("approved" или "rejected")
+        
+        Returns:
+            ID проблем, статус которых изменен (без уже прошедших модерацию)
+        """
+        updated = await self._run(self._set_statuses, problem_ids, status)
+        
+        logger.info(f"Статус {len(updated)} проблем обновлен на {status}")
+        if updated:
+            await self._mirror('update_statuses', updated, status)
+        return updated
+    
+    def _set_statuses(self, problem_ids: List[int], status: str) -> List[int]:
+        """Смена статуса проблем в ожидании модерации одной транзакцией"""
+        updated = []
+        with self._lock:
+            for problem_id in problem_ids:
+                current = self._current(problem_id)
+                if current is None:
+                    continue
+                cursor = self._conn.execute(
+                    'UPDATE problems SET status = ? WHERE id = ? AND status = ?',
+                    (status, problem_id, 'pending')
+                )
+                if cursor.rowcount != 1:
+                    continue
+                self._log_change('status', problem_id)
+                self.stats.update(problem_id, current[0], current[1], status, current[1])
+                updated.append(problem_id)
+            self._conn.commit()
+        return updated
+    
+    def _set_likes(self, problem_id: int, new_likes_count: int) -> bool:
+        """Запись количества лайков"""
+        with self._lock:
+            current = self._current(problem_id)
+            if current is None:
+                logger.warning(f"Проблема с ID {problem_id} не найдена")
+                return False
+            
+            self._conn.execute(
+                'UPDATE problems SET likes = ? WHERE id = ?', (new_likes_count, problem_id)
+            )
+            self._log_change('likes', problem_id)
+            self._conn.commit()
+            self.stats.update(problem_id, current[0], current[1], current[0], new_likes_count)
+        return True
+    
+    async def update_likes(self, problem_id: int, new_likes_count: int) -> bool:
+        """
+        Установка количества лайков
+        
+        Args:
+            problem_id: ID проблемы
+            new_likes_count: Новое количество лайков
+        
+        Returns:
+            True если обновление прошло успешно
+        """
+        if not await self._run(self._set_likes, problem_id, new_likes_count):
+            return False
+        
+        await self._mirror('set_likes', problem_id, new_likes_count)
+        return True
+    
+    def _add_like(self, problem_id: int) -> Optional[int]:
+        """Увеличение счетчика лайков, возвращает новое значение"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE problems SET likes = likes + 1 WHERE id = ?', (problem_id,)
+            )
+            row = self._current(problem_id)
+            if row is not None:
+                self._log_change('likes', problem_id)
+            self._conn.commit()
+            if row is None:
+                return None
+            status, new_likes = row
+            self.stats.update(problem_id, status, new_likes - 1, status, new_likes)
+        return new_likes
+    
+    async def increment_likes(self, problem_id: int) -> Optional[int]:
+        """
+        Атомарное добавление лайка
+        
+        Args:
+            problem_id: ID проблемы
+        
+        Returns:
+            Новое количество лайков или None, если проблема не найдена
+        """
+        new_likes = await self._run(self._add_like, problem_id)
+        if new_likes is None:
+            return None
+        
+        # В зеркало передается итоговое значение, запись в таблицу объединяется
+        await self._mirror('set_likes', problem_id, new_likes)
+        return new_likes
+    
+    async def get_problem_by_id(self, problem_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Получение информации о проблеме по ID
+        
+        Args:
+            problem_id: ID проблемы
+        
+        Returns:
+            Словарь с данными проблемы или None
+        """
+        return await self._run(self._fetch_problem, problem_id)
+    
+    def _fetch_problem(self, problem_id: int) -> Optional[Dict[str, Any]]:
+        """Запись проблемы из базы"""
+        with self._lock:
+            row = self._conn.execute(
+                f'{_SELECT_PROBLEM} WHERE id = ?', (problem_id,)
+            ).fetchone()
+        return self._to_record(row) if row is not None else None
+    
+    async def get_pending_problems(self) -> List[Dict[str, Any]]:
+        """
+        Получение всех проблем со статусом "pending"
+        
+        Returns:
+            Список проблем в ожидании модерации
+        """
+        return await self._run(self._fetch_pending)
+    
+    def _fetch_pending(self) -> List[Dict[str, Any]]:
+        """Все проблемы в ожидании модерации из базы"""
+        with self._lock:
+            rows = self._conn.execute(
+                f'{_SELECT_PROBLEM} WHERE status = ? ORDER BY id', ('pending',)
+            ).fetchall()
+        return [self._to_record(row) for row in rows]
+    
+    async def get_pending_page(self, after_id: int = 0, before_id: Optional[int] = None,
+                               limit: int = 10) -> Dict[str, Any]:
+        """
+        Страница проблем в ожидании модерации по индексу (status, id)
+        
+        Args:
+            after_id: Проблемы с ID больше указанного
+            before_id: Проблемы с ID меньше указанного
+            limit: Размер страницы
+        
+        Returns:
+            Словарь с ключами items, total, has_prev и has_next
+        """
+        return await self._run(self._fetch_pending_page, after_id, before_id, limit)
+    
+    def _fetch_pending_page(self, after_id: int, before_id: Optional[int], limit: int) -> Dict[str, Any]:
+        """Страница проблем в ожидании модерации из базы"""
+        with self._lock:
+            if before_id is not None:
+                rows = self._conn.execute(
+                    f'{_SELECT_PROBLEM} WHERE status = ? AND id < ? ORDER BY id DESC LIMIT ?',
+                    ('pending', before_id, limit)
+                ).fetchall()
+                rows.reverse()
+            else:
+                rows = self._conn.execute(
+                    f'{_SELECT_PROBLEM} WHERE status = ? AND id > ? ORDER BY id LIMIT ?',
+                    ('pending', after_id, limit)
+                ).fetchall()
+            
+            has_prev = has_next = False
+            if rows:
+                has_prev = self._conn.execute(
+                    'SELECT 1 FROM problems WHERE status = ? AND id < ? LIMIT 1',
+                    ('pending', rows[0][0])
+                ).fetchone() is not None
+                has_next = self._conn.execute(
+                    'SELECT 1 FROM problems WHERE status = ? AND id > ? LIMIT 1',
+                    ('pending', rows[-1][0])
+                ).fetchone() is not None
+        
+        return {
+            'items': [self._to_record(row) for row in rows],
+            'total': self._snapshot()['pending'],
+            'has_prev': has_prev,
+            'has_next': has_next
+        }
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        """Счетчики статистики: из памяти процесса или запросом к общей базе"""
+        return self._query_stats() if self.shared else self.stats.snapshot()
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """
+        Получение статистики из инкрементальных счетчиков
+        
+        Returns:
+            Словарь со статистикой
+        """
+        return await self._run(self._collect_stats)
+    
+    def _collect_stats(self) -> Dict[str, Any]:
+        """Статистика с записями самых популярных проблем"""
+        stats = self._snapshot()
+        if self.shared:
+            top_ids = self._query_top(self.stats.top_size)
+        else:
+            top_ids = [problem_id for problem_id, _ in self.stats.top()]
+        top = [self._fetch_problem(problem_id) for problem_id in top_ids]
+        stats['top'] = [record for record in top if record is not None]
+        stats['most_liked'] = stats['top'][0] if stats['top'] else {}
+        return stats
+    
+    async def replay_journal(self, limit: int = 500) -> int:
+        """
+        Перенос изменений из журнала в зеркало
+        
+        Значения читаются из базы в момент переноса, поэтому несколько
+        изменений одной проблемы (например, всплеск лайков) передаются
+        в зеркало одним вызовом.
+        
+        Args:
+            limit: Максимальное количество записей журнала за вызов
+        
+        Returns:
+            Количество обработанных записей журнала
+        """
+        rows = await self._run(self._read_journal, limit)
+        if not rows:
+            return 0
+        
+        for op, problem_id in dict.fromkeys((op, problem_id) for _, op, problem_id in rows):
+            record = await self.get_problem_by_id(problem_id)
+            if record is None:
+                continue
+            if op == 'add':
+                await self._apply_mirror('add_problem', record['Текст проблемы'], problem_id, record['Дата создания'])
+            elif op == 'status':
+                await self._apply_mirror('update_status', problem_id, record['Статус'])
+            else:
+                await self._apply_mirror('set_likes', problem_id, record['Лайки'])
+        
+        await self._run(self._trim_journal, rows[-1][0])
+        return len(rows)
+    
+    def _read_journal(self, limit: int) -> List[tuple]:
+        """Первые записи журнала зеркала"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT seq, op, problem_id FROM mirror_journal ORDER BY seq LIMIT ?', (limit,)
+            ).fetchall()
+    
+    def _trim_journal(self, seq: int):
+        """Удаление перенесенных записей журнала"""
+        with self._lock:
+            self._conn.execute('DELETE FROM mirror_journal WHERE seq <= ?', (seq,))
+            self._conn.commit()
+    
+    async def _replay_loop(self):
+        """Периодический перенос журнала в зеркало"""
+        while True:
+            try:
+                await self.replay_journal()
+            except Exception as e:
+                logger.error(f"Ошибка при переносе журнала в зеркало: {e}")
+            await asyncio.sleep(self.journal_interval)
+    
+    def start(self):
+        """Запуск фоновых задач зеркала"""
+        if self.mirror is not None:
+            self.mirror.start()
+            if self.journal:
+                self._journal_task = asyncio.create_task(self._replay_loop())
+    
+    async def close(self):
+        """Закрытие базы данных и зеркала"""
+        if self._journal_task is not None:
+            self._journal_task.cancel()
+            await asyncio.gather(self._journal_task, return_exceptions=True)
+        if self.mirror is not None:
+            if self.journal:
+                while await self.replay_journal():
+                    pass
+            await self.mirror.close()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,171 @@
+"""
+Инкрементальная статистика по проблемам
+Счетчики обновляются при каждом изменении, поэтому /modstats не читает все записи
+"""
+
+import bisect
+import heapq
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STATUSES = ('pending', 'approved', 'rejected')
+
+
+class StatsAggregator:
+    """
+    Счетчики статусов, сумма лайков и топ одобренных проблем по лайкам
+    
+    Топ хранится в куче с ленивым удалением: при изменении лайков добавляется
+    новая запись, устаревшие отбрасываются при чтении. ID проблем, ожидающих
+    модерации, хранятся в отсортированном списке для постраничного просмотра.
+    """
+    
+    def __init__(self, top_size: int = 10):
+        """
+        Инициализация статистики
+        
+        Args:
+            top_size: Размер топа проблем по лайкам
+        """
+        self.top_size = top_size
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._total = 0
+        self._total_likes = 0
+        # Лайки одобренных проблем: ID -> количество
+        self._approved_likes: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int]] = []
+        self._pending: List[int] = []
+    
+    def reset(self, records: Iterable[Dict[str, Any]]):
+        """
+        Пересчет статистики по всем записям
+        
+        Args:
+            records: Записи с полями ID, Статус и Лайки
+        """
+        with self._lock:
+            self._counts = {}
+            self._total = 0
+            self._total_likes = 0
+            self._approved_likes = {}
+            self._pending = []
+            for record in records:
+                self._apply(record['ID'], None, 0, record.get('Статус'), int(record.get('Лайки') or 0))
+            self._rebuild_heap()
+    
+    def update(self, problem_id: int, old_status: Optional[str], old_likes: int,
+               new_status: Optional[str], new_likes: int):
+        """
+        Учет изменения одной проблемы
+        
+        Args:
+            problem_id: ID проблемы
+            old_status: Статус до изменения (None - новая проблема)
+            old_likes: Лайки до изменения
+            new_status: Статус после изменения (None - проблема удалена)
+            new_likes: Лайки после изменения
+        """
+        with self._lock:
+            self._apply(problem_id, old_status, old_likes, new_status, new_likes)
+    
+    def _apply(self, problem_id: int, old_status: Optional[str], old_likes: int,
+               new_status: Optional[str], new_likes: int):
+        """Изменение счетчиков, вызывается под блокировкой"""
+        if old_status == 'pending' and new_status != 'pending':
+            index = bisect.bisect_left(self._pending, problem_id)
+            if index < len(self._pending) and self._pending[index] == problem_id:
+                del self._pending[index]
+        elif new_status == 'pending' and old_status != 'pending':
+            bisect.insort(self._pending, problem_id)
+        
+        if old_status is not None:
+            self._counts[old_status] = self._counts.get(old_status, 0) - 1
+            self._total -= 1
+            if old_status == 'approved':
+                self._total_likes -= old_likes
+                self._approved_likes.pop(problem_id, None)
+        
+        if new_status is not None:
+            self._counts[new_status] = self._counts.get(new_status, 0) + 1
+            self._total += 1
+            if new_status == 'approved':
+                self._total_likes += new_likes
+                self._approved_likes[problem_id] = new_likes
+                heapq.heappush(self._heap, (-new_likes, problem_id))
+        
+        # Сжимаем кучу, когда устаревших записей становится слишком много
+        if len(self._heap) > 4 * max(len(self._approved_likes), 64):
+            self._rebuild_heap()
+    
+    def _rebuild_heap(self):
+        """Построение кучи только из актуальных значений"""
+        self._heap = [(-likes, problem_id) for problem_id, likes in self._approved_likes.items()]
+        heapq.heapify(self._heap)
+    
+    def top(self, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Топ одобренных проблем по лайкам
+        
+        Args:
+            limit: Количество проблем (по умолчанию top_size)
+        
+        Returns:
+            Список пар (ID проблемы, лайки) по убыванию лайков
+        """
+        limit = limit or self.top_size
+        result = []
+        seen = set()
+        valid = []
+        
+        with self._lock:
+            while self._heap and len(result) < limit:
+                entry = heapq.heappop(self._heap)
+                likes, problem_id = -entry[0], entry[1]
+                if self._approved_likes.get(problem_id) != likes or problem_id in seen:
+                    # Устаревшая запись - больше не нужна
+                    continue
+                seen.add(problem_id)
+                result.append((problem_id, likes))
+                valid.append(entry)
+            
+            # Возвращаем актуальные записи обратно в кучу
+            for entry in valid:
+                heapq.heappush(self._heap, entry)
+        
+        return result
+    
+    def pending_ids(self, after_id: int = 0, before_id: Optional[int] = None,
+                    limit: int = 10) -> Tuple[List[int], bool, bool]:
+        """
+        Страница ID проблем, ожидающих модерации
+        
+        Args:
+            after_id: Вернуть ID больше указанного (следующая страница)
+            before_id: Вернуть ID меньше указанного (предыдущая страница)
+            limit: Размер страницы
+        
+        Returns:
+            Кортеж (ID по возрастанию, есть ли страница до, есть ли страница после)
+        """
+        with self._lock:
+            if before_id is not None:
+                end = bisect.bisect_left(self._pending, before_id)
+                start = max(0, end - limit)
+            else:
+                start = bisect.bisect_right(self._pending, after_id)
+                end = start + limit
+            return self._pending[start:end], start > 0, end < len(self._pending)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Текущие значения счетчиков
+        
+        Returns:
+            Словарь с ключами total, pending, approved, rejected и total_likes
+        """
+        with self._lock:
+            stats = {status: self._counts.get(status, 0) for status in STATUSES}
+            stats['total'] = self._total
+            stats['total_likes'] = self._total_likes
+        return stats
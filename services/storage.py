@@ -0,0 +1,70 @@
+"""
+Интерфейс хранилища проблем
+Обработчики работают с любым хранилищем, реализующим ProblemStorage
+"""
+
+from typing import Any, Dict, List, Optional, Protocol
+
+# Поля записи о проблеме (совпадают с заголовками Google Sheets)
+PROBLEM_FIELDS = ['ID', 'Текст проблемы', 'Лайки', 'Статус', 'Дата создания']
+
+
+class ProblemStorage(Protocol):
+    """Асинхронное хранилище проблем"""
+    
+    async def add_problem(self, problem_text: str) -> int:
+        """Добавление новой проблемы, возвращает ее ID"""
+        ...
+    
+    async def update_status(self, problem_id: int, status: str) -> bool:
+        """Обновление статуса проблемы, ожидающей модерации; False - не найдена или уже прошла модерацию"""
+        ...
+    
+    async def update_statuses(self, problem_ids: List[int], status: str) -> List[int]:
+        """Обновление статуса нескольких проблем, ожидающих модерации, возвращает ID обновленных"""
+        ...
+    
+    async def update_likes(self, problem_id: int, new_likes_count: int) -> bool:
+        """Установка количества лайков"""
+        ...
+    
+    async def increment_likes(self, problem_id: int) -> Optional[int]:
+        """Атомарное добавление лайка, возвращает новое количество"""
+        ...
+    
+    async def get_problem_by_id(self, problem_id: int) -> Optional[Dict[str, Any]]:
+        """Получение проблемы по ID"""
+        ...
+    
+    async def get_pending_problems(self) -> List[Dict[str, Any]]:
+        """Получение проблем в ожидании модерации"""
+        ...
+    
+    async def get_pending_page(self, after_id: int = 0, before_id: Optional[int] = None,
+                               limit: int = 10) -> Dict[str, Any]:
+        """
+        Страница проблем в ожидании модерации по возрастанию ID
+        
+        Returns:
+            Словарь с ключами items, total, has_prev и has_next
+        """
+        ...
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """
+        Получение статистики
+        
+        Returns:
+            Словарь с ключами total, pending, approved, rejected,
+            total_likes (лайки одобренных проблем), most_liked и
+            top (одобренные проблемы по убыванию лайков)
+        """
+        ...
+    
+    def start(self):
+        """Запуск фоновых задач хранилища"""
+        ...
+    
+    async def close(self):
+        """Сохранение изменений и освобождение ресурсов"""
+        ...
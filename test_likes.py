@@ -0,0 +1,146 @@
+"""
+Нагрузочный тест лайков
+Одновременно отправляет тысячи нажатий на кнопку лайка и проверяет,
+что ни один лайк не потерян ни в хранилище, ни в таблице
+"""
+
+import asyncio
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from handlers.channel import handle_like
+from services.google_sheets import AsyncGoogleSheetsService, GoogleSheetsService
+from services.likes_registry import LikesRegistry
+from services.sqlite_storage import SQLiteStorage
+from utils.fake_sheets import FakeWorksheet
+
+PROBLEMS = 5
+LIKES = 5000
+
+
+class RecordingEditScheduler:
+    """Планировщик редактирования, который только запоминает последний текст"""
+    
+    def __init__(self):
+        self.edits = {}
+    
+    def schedule(self, chat_id, message_id, text, **kwargs):
+        self.edits[(chat_id, message_id)] = text
+
+
+def make_callback(problem_id: int, user_id: int, answers: list):
+    """Callback нажатия на кнопку лайка под постом проблемы"""
+    async def answer(text=None, **kwargs):
+        answers.append(text)
+    
+    return SimpleNamespace(
+        data=f"like_{problem_id}",
+        from_user=SimpleNamespace(id=user_id),
+        message=SimpleNamespace(chat=SimpleNamespace(id=-100), message_id=problem_id),
+        answer=answer
+    )
+
+
+def create_sheets_storage(worksheet: FakeWorksheet) -> AsyncGoogleSheetsService:
+    """Хранилище Google Sheets с частым обновлением индекса во время теста"""
+    service = GoogleSheetsService('credentials.json', 'fake', cache_ttl=0.01, worksheet=worksheet)
+    return AsyncGoogleSheetsService(service, likes_flush_interval=0.05, likes_flush_threshold=3)
+
+
+async def run_likes(name: str, storage, worksheet: FakeWorksheet) -> bool:
+    """
+    Одновременная отправка лайков и проверка итоговых значений
+    
+    Args:
+        name: Название хранилища для вывода
+        storage: Хранилище проблем
+        worksheet: Лист, в который хранилище (или его зеркало) записывает изменения
+    
+    Returns:
+        True если все лайки учтены
+    """
+    print(f"🔄 {name}: {LIKES} одновременных лайков для {PROBLEMS} проблем...")
+    
+    storage.start()
+    problem_ids = [await storage.add_problem(f"Проблема {i}") for i in range(PROBLEMS)]
+    for problem_id in problem_ids:
+        await storage.update_status(problem_id, 'approved')
+    
+    targets = [random.choice(problem_ids) for _ in range(LIKES)]
+    expected = {problem_id: targets.count(problem_id) for problem_id in problem_ids}
+    answers = []
+    edit_scheduler = RecordingEditScheduler()
+    likes_registry = LikesRegistry(':memory:')
+    
+    # Каждый лайк ставит новый пользователь
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        handle_like(make_callback(problem_id, user_id, answers), storage, edit_scheduler, likes_registry)
+        for user_id, problem_id in enumerate(targets)
+    ))
+    elapsed = time.perf_counter() - started
+    
+    errors = [text for text in answers if not text.startswith('👍')]
+    if errors:
+        print(f"❌ Ошибки при обработке лайков: {errors[:5]}")
+        return False
+    
+    # Повторные нажатия тех же пользователей не должны менять счетчики
+    answers.clear()
+    await asyncio.gather(*(
+        handle_like(make_callback(problem_id, user_id, answers), storage, edit_scheduler, likes_registry)
+        for user_id, problem_id in enumerate(targets)
+    ))
+    if any(text.startswith('👍') for text in answers):
+        print("❌ Повторный лайк того же пользователя засчитан")
+        return False
+    
+    # Значения в хранилище
+    for problem_id in problem_ids:
+        problem = await storage.get_problem_by_id(problem_id)
+        if problem['Лайки'] != expected[problem_id]:
+            print(f"❌ Проблема {problem_id}: {problem['Лайки']} лайков вместо {expected[problem_id]}")
+            return False
+    
+    stats = await storage.get_stats()
+    if stats['total_likes'] != LIKES:
+        print(f"❌ В статистике {stats['total_likes']} лайков вместо {LIKES}")
+        return False
+    
+    # Значения в таблице после записи всех изменений
+    await storage.close()
+    for problem_id in problem_ids:
+        likes = worksheet.cell(problem_id, 'Лайки')
+        if likes != expected[problem_id]:
+            print(f"❌ В таблице у проблемы {problem_id} {likes} лайков вместо {expected[problem_id]}")
+            return False
+    
+    print(f"✅ {name}: все {LIKES} лайков учтены за {elapsed:.2f} с")
+    return True
+
+
+async def main() -> bool:
+    """Запуск теста для всех хранилищ"""
+    worksheet = FakeWorksheet(latency=0.001)
+    if not await run_likes('Google Sheets', create_sheets_storage(worksheet), worksheet):
+        return False
+    
+    worksheet = FakeWorksheet(latency=0.001)
+    storage = SQLiteStorage(':memory:', mirror=create_sheets_storage(worksheet))
+    if not await run_likes('SQLite', storage, worksheet):
+        return False
+    
+    return True
+
+
+if __name__ == '__main__':
+    print("🧪 Нагрузочный тест лайков")
+    print("=" * 50)
+    
+    if asyncio.run(main()):
+        print("\n🎉 Ни один лайк не потерян!")
+    else:
+        print("\n❌ Лайки теряются при одновременных нажатиях")
+        sys.exit(1)
@@ -0,0 +1,66 @@
+"""
+Тест очереди исходящих запросов
+Отменяет запросы во время паузы после RetryAfter и проверяет, что очередь
+не падает и не оставляет за собой счетчиков
+"""
+
+import asyncio
+import sys
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from services.send_queue import SendScheduler
+
+PAUSE = 0.5
+
+
+async def main() -> bool:
+    scheduler = SendScheduler(global_rate=100, group_rate=100, private_rate=100)
+    bot = SimpleNamespace()
+    calls = []
+    
+    async def make_request(bot, method):
+        calls.append(method.chat_id)
+        if len(calls) == 1:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=PAUSE)
+        return True
+    
+    # Первый запрос получает RetryAfter и останавливает все отправки
+    first = asyncio.create_task(scheduler(make_request, bot, SendMessage(chat_id=1, text="1")))
+    await asyncio.sleep(0.05)
+    
+    # Запрос в новый чат ждет окончания паузы, его ведро еще не создано
+    waiting = asyncio.create_task(scheduler(make_request, bot, SendMessage(chat_id=2, text="2")))
+    await asyncio.sleep(0.05)
+    waiting.cancel()
+    try:
+        await waiting
+        print("❌ Отмененный запрос завершился без CancelledError")
+        return False
+    except asyncio.CancelledError:
+        print("✅ Запрос, отмененный во время паузы, завершился с CancelledError")
+    
+    if not await first:
+        print("❌ Запрос после паузы не отправлен")
+        return False
+    print(f"✅ Запрос после паузы отправлен, вызовов API: {len(calls)}")
+    
+    metrics = scheduler.metrics()
+    if metrics['queued'] or metrics['chats']:
+        print(f"❌ В очереди остались запросы: {metrics}")
+        return False
+    print("✅ Очередь пуста")
+    return True
+
+
+if __name__ == '__main__':
+    print("🧪 Тест очереди исходящих запросов")
+    print("=" * 50)
+    
+    if asyncio.run(main()):
+        print("\n🎉 Отмена во время паузы обрабатывается корректно!")
+    else:
+        print("\n❌ Очередь некорректно обрабатывает отмену")
+        sys.exit(1)
@@ -70,6 +70,17 @@ def test_google_sheets():
             print("❌ Ошибка обновления лайков")
             return False
         
+        # Тестируем запись очереди изменений в таблицу
+        print("🔄 Тестирование записи очереди изменений...")
+        while sheets_service.drain_outbox():
+            pass
+        
+        if len(sheets_service.outbox) == 0:
+            print("✅ Очередь записана в таблицу")
+        else:
+            print("❌ В очереди остались незаписанные изменения")
+            return False
+        
         print("\n🎉 Все тесты прошли успешно!")
         print("✅ Google Sheets интеграция работает корректно")
         
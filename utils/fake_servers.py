@@ -0,0 +1,283 @@
+"""
+Локальные HTTP-серверы, имитирующие Telegram Bot API и Google Sheets API
+Используются в нагрузочном тесте вместо настоящих сервисов
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from utils.fake_sheets import FakeWorksheet
+
+# Диапазон A1 без имени листа: "A5:E", "A1:1", "G1"
+_RANGE_RE = re.compile(r'^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$')
+
+
+class ServerThread:
+    """aiohttp-приложение в отдельном потоке со своим циклом событий"""
+    
+    def __init__(self, app: web.Application, host: str = '127.0.0.1', port: int = 0):
+        """
+        Инициализация сервера
+        
+        Args:
+            app: Приложение aiohttp
+            host: Адрес для прослушивания
+            port: Порт (0 - любой свободный)
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        """Адрес сервера"""
+        return f"http://{self.host}:{self.port}"
+    
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self._start())
+        self._ready.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self._runner.cleanup())
+        self.loop.close()
+    
+    async def _start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+    
+    def start(self) -> "ServerThread":
+        """Запуск сервера и ожидание готовности"""
+        self._thread.start()
+        self._ready.wait()
+        return self
+    
+    def stop(self):
+        """Остановка сервера"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+
+class FakeBotAPI:
+    """
+    Имитация Telegram Bot API
+    
+    Отдает обновления из очереди через getUpdates и записывает все
+    исходящие запросы бота с временем получения. Ответы на сообщения
+    сопоставляются по chat_id, ответы на callback - по callback_query_id.
+    """
+    
+    def __init__(self, latency: float = 0.0):
+        """
+        Инициализация сервера
+        
+        Args:
+            latency: Задержка ответа на каждый запрос в секундах
+        """
+        self.latency = latency
+        self.calls: Counter = Counter()
+        # (время получения, метод, chat_id или callback_query_id)
+        self.requests: List[Tuple[float, str, Optional[str]]] = []
+        self._updates: Optional[asyncio.Queue] = None
+        self._message_id = 0
+        # Устанавливается первым запросом getUpdates: бот готов принимать обновления
+        self.polling_started = threading.Event()
+        self.server = ServerThread(self._create_app())
+    
+    def _create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        return app
+    
+    def start(self) -> "FakeBotAPI":
+        """Запуск сервера в отдельном потоке"""
+        self.server.start()
+        self._updates = asyncio.Queue()
+        return self
+    
+    def stop(self):
+        """Остановка сервера"""
+        self.server.stop()
+    
+    @property
+    def url(self) -> str:
+        """Адрес сервера для TelegramAPIServer.from_base"""
+        return self.server.url
+    
+    def push(self, update: Dict[str, Any]):
+        """
+        Добавление обновления в очередь getUpdates (из любого потока)
+        
+        Args:
+            update: Объект Update в формате Bot API
+        """
+        self.server.loop.call_soon_threadsafe(self._updates.put_nowait, update)
+    
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ожидание обновлений как при long polling"""
+        limit = int(params.get('limit') or 100)
+        timeout = min(float(params.get('timeout') or 0), 1.0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self._updates.get(), timeout or 0.01))
+        except asyncio.TimeoutError:
+            return updates
+        while len(updates) < limit and not self._updates.empty():
+            updates.append(self._updates.get_nowait())
+        return updates
+    
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Ответ на отправку сообщения"""
+        self._message_id += 1
+        chat_id = int(params['chat_id'])
+        return {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'supergroup'},
+            'text': params.get('text', '')
+        }
+    
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if method != 'getUpdates':
+            self.calls[method] += 1
+            key = params.get('callback_query_id') or params.get('chat_id')
+            self.requests.append((time.perf_counter(), method, str(key) if key is not None else None))
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        
+        if method == 'getUpdates':
+            self.polling_started.set()
+            result: Any = await self._get_updates(params)
+        elif method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'RawThoughts', 'username': 'rawthoughts_test_bot'}
+        elif method in ('sendMessage', 'editMessageText') and 'chat_id' in params:
+            result = self._message(params)
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+
+class FakeSheetsAPI:
+    """
+    Имитация Google Sheets API v4 поверх FakeWorksheet
+    
+    Поддерживает запросы, которые выполняет GoogleSheetsService через gspread:
+    метаданные таблицы, чтение и запись диапазонов, batchGet, append и
+    batchUpdate. Количество запросов считает FakeWorksheet.calls.
+    """
+    
+    def __init__(self, worksheet: FakeWorksheet, latency: float = 0.0):
+        """
+        Инициализация сервера
+        
+        Args:
+            worksheet: Лист с данными
+            latency: Задержка ответа на каждый запрос в секундах
+        """
+        self.worksheet = worksheet
+        self.latency = latency
+        self.server = ServerThread(self._create_app())
+    
+    def _create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route('*', '/v4/spreadsheets/{tail:.*}', self._handle)
+        return app
+    
+    def start(self) -> "FakeSheetsAPI":
+        """Запуск сервера в отдельном потоке"""
+        self.server.start()
+        return self
+    
+    def stop(self):
+        """Остановка сервера"""
+        self.server.stop()
+    
+    @property
+    def url(self) -> str:
+        """Адрес сервера для SHEETS_API_URL"""
+        return self.server.url
+    
+    def _read(self, range_name: str) -> List[List[str]]:
+        """Чтение диапазона с учетом конечной строки"""
+        a1 = re.sub(r'^.*!', '', range_name)
+        match = _RANGE_RE.match(a1)
+        first_row = int(match.group(2) or 1) if match else 1
+        last_row = int(match.group(4)) if match and match.group(4) else None
+        
+        if first_row == 1 and last_row == 1:
+            # Строка заголовков целиком, включая ячейки контрольной суммы
+            return [[str(value) for value in self.worksheet.row_values(1)]]
+        
+        values = self.worksheet.get(a1)
+        if last_row is not None:
+            values = values[:last_row - first_row + 1]
+        return values
+    
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        tail = request.match_info['tail']
+        body = json.loads(await request.text() or '{}')
+        
+        sheet_id, _, rest = tail.partition('/')
+        if not rest:
+            if sheet_id.endswith(':batchUpdate'):
+                return web.json_response({'spreadsheetId': sheet_id, 'replies': []})
+            return web.json_response({
+                'spreadsheetId': sheet_id,
+                'properties': {'title': 'RawThoughts', 'locale': 'ru_RU', 'timeZone': 'Europe/Moscow'},
+                'sheets': [{'properties': {
+                    'sheetId': 0, 'title': 'Sheet1', 'index': 0, 'sheetType': 'GRID',
+                    'gridProperties': {'rowCount': 1000000, 'columnCount': 26}
+                }}]
+            })
+        
+        if rest == 'values:batchGet':
+            ranges = request.query.getall('ranges', [])
+            return web.json_response({
+                'spreadsheetId': sheet_id,
+                'valueRanges': [
+                    {'range': range_name, 'majorDimension': 'ROWS', 'values': values}
+                    for range_name, values in zip(ranges, self.worksheet.batch_get(
+                        [re.sub(r'^.*!', '', range_name) for range_name in ranges]
+                    ))
+                ]
+            })
+        
+        if rest == 'values:batchUpdate':
+            self.worksheet.batch_update(body.get('data', []))
+            return web.json_response({'spreadsheetId': sheet_id})
+        
+        range_name = rest[len('values/'):]
+        if range_name.endswith(':append'):
+            response = self.worksheet.append_rows(body.get('values', []))
+            return web.json_response({'spreadsheetId': sheet_id, **response})
+        
+        if request.method == 'PUT':
+            self.worksheet.update(re.sub(r'^.*!', '', range_name), body.get('values', []))
+            return web.json_response({'spreadsheetId': sheet_id, 'updatedRange': range_name})
+        
+        values = self._read(range_name)
+        response = {'range': range_name, 'majorDimension': 'ROWS'}
+        if values:
+            response['values'] = values
+        return web.json_response(response)
@@ -0,0 +1,208 @@
+"""
+Имитация листа Google Sheets в памяти
+Используется в тестовых скриптах и бенчмарках вместо настоящей таблицы
+"""
+
+import re
+import threading
+import struct
+import time
+from typing import Any, Dict, List, Optional
+
+from gspread.utils import a1_to_rowcol
+
+from services.google_sheets import CELL_HASH_MODULUS, CHECKSUM_MODULUS, ROW_WEIGHT_MODULUS
+from services.storage import PROBLEM_FIELDS
+
+
+class FakeWorksheet:
+    """
+    Лист в памяти с подмножеством API gspread.Worksheet,
+    которое использует GoogleSheetsService
+    
+    Считает вызовы каждого метода, чтобы проверять количество запросов к API.
+    Значения читаются строками, как FORMATTED_VALUE в настоящем API, а ячейка
+    контрольной суммы вычисляется по данным так же, как CHECKSUM_FORMULA.
+    """
+    
+    def __init__(self, records: Optional[List[List[Any]]] = None, latency: float = 0.0):
+        """
+        Инициализация листа
+        
+        Args:
+            records: Строки данных без заголовка
+            latency: Задержка каждого вызова в секундах (имитация сети)
+        """
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._rows: List[List[Any]] = [list(PROBLEM_FIELDS)]
+        self._rows.extend(list(row) for row in records or [])
+    
+    @classmethod
+    def generate(cls, count: int, latency: float = 0.0) -> "FakeWorksheet":
+        """
+        Лист с заданным количеством одобренных проблем
+        
+        Args:
+            count: Количество строк
+            latency: Задержка каждого вызова в секундах
+        """
+        return cls(
+            [
+                [problem_id, f"Проблема {problem_id}", problem_id % 100, 'approved', '2024-01-01 00:00:00']
+                for problem_id in range(1, count + 1)
+            ],
+            latency=latency
+        )
+    
+    def _call(self, method: str):
+        """Учет вызова и имитация задержки сети"""
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def _range(self, first_row: int, last_row: int) -> Dict[str, Any]:
+        """Ответ API с диапазоном измененных строк"""
+        return {'updates': {'updatedRange': f"'Sheet1'!A{first_row}:E{last_row}"}}
+    
+    def row_values(self, row: int) -> List[Any]:
+        self._call('row_values')
+        with self._lock:
+            return list(self._rows[row - 1]) if row <= len(self._rows) else []
+    
+    def update(self, range_name, values, **kwargs):
+        self._call('update')
+        # gspread 6 принимает аргументы в любом порядке
+        if not isinstance(range_name, str):
+            range_name, values = values, range_name
+        row, col = a1_to_rowcol(range_name.split(':')[0])
+        with self._lock:
+            for offset, values_row in enumerate(values):
+                self._set_row(row + offset, col, values_row)
+    
+    def _checksum(self) -> str:
+        """
+        Значение CHECKSUM_FORMULA для данных, вызывается под блокировкой
+        
+        Повторяет формулу по шагам: для непустой ячейки A2:E - сумма
+        UNICODE(MID(v, i, 1)) * i по символам UTF-16 по модулю, умноженная
+        на вес строки и номер столбца; итог - сумма по модулю.
+        """
+        total = 0
+        for row, data_row in enumerate(self._rows[1:], 2):
+            for col, value in enumerate(data_row[:len(PROBLEM_FIELDS)], 1):
+                text = str(value)
+                if not len(text):
+                    continue
+                data = text.encode('utf-16-le')
+                codes = struct.unpack(f'<{len(data) // 2}H', data)
+                text_hash = sum(code * i for i, code in enumerate(codes, 1)) % CELL_HASH_MODULUS
+                total += (row % ROW_WEIGHT_MODULUS + 1) * col * text_hash
+        return str(total % CHECKSUM_MODULUS)
+    
+    def _get(self, range_name: str) -> List[List[str]]:
+        """Чтение диапазона вида "A5:E" или "G1", вызывается под блокировкой"""
+        if range_name == 'G1':
+            return [[self._checksum()]]
+        
+        row = a1_to_rowcol(range_name.split(':')[0])[0]
+        values = [
+            [str(value) for value in data_row[:len(PROBLEM_FIELDS)]]
+            for data_row in self._rows[row - 1:]
+        ]
+        # API не возвращает пустые ячейки в конце строк и пустые строки в конце
+        values = [data_row[:max((i + 1 for i, v in enumerate(data_row) if v != ''), default=0)]
+                  for data_row in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
+    
+    def get(self, range_name: str, **kwargs) -> List[List[str]]:
+        self._call('get')
+        with self._lock:
+            return self._get(range_name)
+    
+    def batch_get(self, ranges: List[str], **kwargs) -> List[List[List[str]]]:
+        self._call('batch_get')
+        with self._lock:
+            return [self._get(range_name) for range_name in ranges]
+    
+    def get_all_records(self) -> List[Dict[str, Any]]:
+        self._call('get_all_records')
+        with self._lock:
+            headers = self._rows[0]
+            return [dict(zip(headers, row)) for row in self._rows[1:]]
+    
+    def get_all_values(self) -> List[List[Any]]:
+        self._call('get_all_values')
+        with self._lock:
+            return [list(row) for row in self._rows]
+    
+    def col_values(self, col: int) -> List[Any]:
+        self._call('col_values')
+        with self._lock:
+            return [row[col - 1] for row in self._rows]
+    
+    def append_row(self, row: List[Any], **kwargs) -> Dict[str, Any]:
+        return self.append_rows([row], **kwargs)
+    
+    def append_rows(self, rows: List[List[Any]], **kwargs) -> Dict[str, Any]:
+        self._call('append_rows')
+        with self._lock:
+            first_row = len(self._rows) + 1
+            self._rows.extend(list(row) for row in rows)
+            return self._range(first_row, len(self._rows))
+    
+    def update_cell(self, row: int, col: int, value: Any):
+        self._call('update_cell')
+        with self._lock:
+            self._set_row(row, col, [value])
+    
+    def batch_update(self, data: List[Dict[str, Any]], **kwargs):
+        self._call('batch_update')
+        with self._lock:
+            for item in data:
+                row, col = a1_to_rowcol(re.sub(r"^.*!", '', item['range']).split(':')[0])
+                for offset, values_row in enumerate(item['values']):
+                    self._set_row(row + offset, col, values_row)
+    
+    def _set_row(self, row: int, col: int, values: List[Any]):
+        """Запись значений в строку начиная со столбца, вызывается под блокировкой"""
+        while len(self._rows) < row:
+            self._rows.append([''] * len(PROBLEM_FIELDS))
+        target = self._rows[row - 1]
+        target.extend([''] * (col - 1 + len(values) - len(target)))
+        for offset, value in enumerate(values):
+            target[col - 1 + offset] = value
+    
+    def edit(self, problem_id: int, field: str, value: Any):
+        """
+        Ручное изменение ячейки (как правка аналитика в таблице)
+        
+        Args:
+            problem_id: ID проблемы
+            field: Название столбца
+            value: Новое значение
+        """
+        index = PROBLEM_FIELDS.index(field)
+        with self._lock:
+            for row in self._rows[1:]:
+                if row[0] == problem_id:
+                    row[index] = value
+    
+    def cell(self, problem_id: int, field: str) -> Any:
+        """
+        Значение поля проблемы в листе (для проверок в тестах)
+        
+        Args:
+            problem_id: ID проблемы
+            field: Название столбца
+        """
+        index = PROBLEM_FIELDS.index(field)
+        with self._lock:
+            for row in self._rows[1:]:
+                if row[0] == problem_id:
+                    return row[index]
+        return None
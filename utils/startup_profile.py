@@ -0,0 +1,78 @@
+"""
+Профилирование запуска бота
+Замеряет время этапов от старта процесса до готовности принимать обновления
+"""
+
+import logging
+import time
+from typing import Awaitable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class StartupProfiler:
+    """
+    Отметки времени этапов запуска
+    
+    Последовательные этапы отмечаются через mark(), одновременные
+    (например, подключение к Telegram и к Google Sheets) - через track().
+    """
+    
+    def __init__(self, started: Optional[float] = None):
+        """
+        Инициализация профилировщика
+        
+        Args:
+            started: Значение time.perf_counter() в момент старта процесса
+        """
+        self.started = time.perf_counter() if started is None else started
+        self._last = self.started
+        self.phases: List[Tuple[str, float, float]] = []
+    
+    def _offset(self) -> float:
+        """Время с момента старта процесса"""
+        return time.perf_counter() - self.started
+    
+    def mark(self, name: str):
+        """
+        Завершение последовательного этапа, начавшегося после предыдущей отметки
+        
+        Args:
+            name: Название этапа
+        """
+        now = time.perf_counter()
+        self.phases.append((name, self._last - self.started, now - self.started))
+        self._last = now
+    
+    async def track(self, name: str, awaitable: Awaitable[T]) -> T:
+        """
+        Замер этапа, выполняемого одновременно с другими
+        
+        Args:
+            name: Название этапа
+            awaitable: Корутина этапа
+        
+        Returns:
+            Результат корутины
+        """
+        start = self._offset()
+        try:
+            return await awaitable
+        finally:
+            self.phases.append((name, start, self._offset()))
+            self._last = max(self._last, time.perf_counter())
+    
+    def report(self) -> str:
+        """
+        Таблица этапов запуска
+        
+        Returns:
+            Текст с началом, окончанием и длительностью каждого этапа
+        """
+        lines = ["Профиль запуска (секунды от старта процесса):"]
+        for name, start, end in self.phases:
+            lines.append(f"  {name:<28} {start:7.3f} → {end:7.3f}  ({end - start:.3f})")
+        lines.append(f"  {'Всего':<28} {self._offset():7.3f}")
+        return '\n'.join(lines)
@@ -0,0 +1,151 @@
+"""
+Запуск бота в режиме webhook
+Telegram присылает обновления на aiohttp-сервер вместо long polling
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+async def health_handler(request: web.Request) -> web.Response:
+    """Проверка работоспособности для балансировщика и Render"""
+    return web.json_response({'status': 'ok'})
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Метрики производительности в текстовом формате Prometheus"""
+    return web.Response(
+        text=registry.render(),
+        content_type='text/plain',
+        headers={'X-Prometheus-Format': '0.0.4'}
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Запуск HTTP-сервера только с /health и /metrics
+    
+    Метрики не отдаются публичным webhook-сервером: сервер метрик слушает
+    отдельный порт, по умолчанию только на localhost.
+    
+    Args:
+        host: Адрес для прослушивания
+        port: Порт для прослушивания
+    
+    Returns:
+        Запущенный AppRunner; остановка - await runner.cleanup()
+    """
+    app = web.Application()
+    app.router.add_get('/health', health_handler)
+    app.router.add_get('/metrics', metrics_handler)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, path: str,
+                       secret_token: Optional[str] = None) -> web.Application:
+    """
+    Создание aiohttp-приложения для приема обновлений
+    
+    Args:
+        dp: Диспетчер aiogram
+        bot: Экземпляр бота
+        path: Путь, на который Telegram отправляет обновления
+        secret_token: Секрет для проверки заголовка X-Telegram-Bot-Api-Secret-Token
+    
+    Returns:
+        Приложение aiohttp
+    """
+    app = web.Application()
+    app.router.add_get('/health', health_handler)
+    
+    # Обновления обрабатываются в фоне, Telegram сразу получает ответ 200
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, base_url: str, path: str = '/webhook',
+                      secret_token: Optional[str] = None,
+                      host: str = '0.0.0.0', port: int = 8080):
+    """
+    Регистрация webhook в Telegram и запуск HTTP-сервера
+    
+    Args:
+        dp: Диспетчер aiogram
+        bot: Экземпляр бота
+        base_url: Публичный адрес сервера (например, https://rawthoughts-bot.onrender.com)
+        path: Путь для приема обновлений
+        secret_token: Секрет для проверки запросов от Telegram
+        host: Адрес для прослушивания
+        port: Порт для прослушивания
+    """
+    app = create_webhook_app(dp, bot, path, secret_token)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Webhook-сервер запущен на {host}:{port}")
+    
+    try:
+        await bot.set_webhook(
+            url=f"{base_url.rstrip('/')}{path}",
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logger.info(f"Webhook зарегистрирован: {base_url.rstrip('/')}{path}")
+        
+        # Работаем до остановки процесса
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_worker_server(dp: Dispatcher, bot: Bot, path: str, secret_token: str,
+                            host: str = '127.0.0.1', port: int = 8100):
+    """
+    Прием обновлений от основного процесса (режим нескольких процессов)
+    
+    В отличие от run_webhook, webhook в Telegram не регистрируется:
+    обновления присылает основной процесс (cluster.py).
+    
+    Args:
+        dp: Диспетчер aiogram
+        bot: Экземпляр бота
+        path: Путь для приема обновлений
+        secret_token: Секрет для проверки запросов от основного процесса
+        host: Адрес для прослушивания
+        port: Порт для прослушивания
+    """
+    app = create_webhook_app(dp, bot, path, secret_token)
+    # Обработчик слушает только localhost, поэтому метрики отдаются на том же порту
+    app.router.add_get('/metrics', metrics_handler)
+    
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Обработчик принимает обновления на {host}:{port}")
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()